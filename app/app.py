@@ -3,7 +3,7 @@ French Motor Insurance GLM Analysis Dashboard
 A Streamlit app to visualize French Motor Insurance data with GLM pure premium predictions
 
 Features:
-- Interactive data exploration with 7 analysis tabs
+- Interactive data exploration with 9 analysis tabs
 - Excel-like pivot table functionality
 - 30+ interactive visualizations
 - Advanced filtering system
@@ -14,10 +14,37 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import time
 import os
+import threading
+import uuid
+
+import charts
+import chunked
+import columnar
+import cube
+import diagnostics
+import export
+import glm
+import one_way
+import paging
+import pivot
+import render_pool
+from filter_index import FilterIndex, Selection
+import schema
+import shared_data
+import snapshot
+import summaries
+import validation
+from filters import FilterSpec
+from incremental import IncrementalView
+from parallel import ParallelExecutor
+from result_cache import CachedView, ResultCache
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# 'memory' holds the frame (memory-mapped) in process; 'chunked' streams row blocks from disk;
+# 'parallel' scans row shards of the frame in a worker pool (see parallel.py)
+EXECUTION_MODE = os.environ.get('DASHBOARD_EXECUTION', 'memory')
 
 # Set page configuration
 st.set_page_config(
@@ -38,57 +65,47 @@ st.markdown('''
 </style>
 ''', unsafe_allow_html=True)
 
-# Data loading function
-@st.cache_data
-def load_data():
-    """Load the French Motor Insurance dataset from NPZ files in GitHub repository"""
-    
-    import json
-
-    data_dir_candidates = [
+def find_data_dir():
+    """Locate the directory holding the dataset files"""
+    return columnar.find_data_dir([
         Path(__file__).resolve().parent,
         Path.cwd(),
-    ]
-
-    try:
-        with st.spinner("📂 Loading dataset from repository..."):
-            st.sidebar.info('📦 Loading from NPZ files...')
+    ])
 
-            data_dir = next((candidate for candidate in data_dir_candidates if (candidate / 'data_metadata.json').exists()), None)
-            if data_dir is None:
-                raise FileNotFoundError('data_metadata.json')
+def dataset_columns():
+    """All columns of the dataset, including the GLM design matrix"""
+    return columnar.read_json(find_data_dir() / columnar.METADATA_FILE)['columns']
 
-            metadata_path = data_dir / 'data_metadata.json'
-            mappings_path = data_dir / 'category_mappings.json'
-            numeric_path = data_dir / 'data_numeric.npz'
-            categorical_path = data_dir / 'data_categorical.npz'
+# Data loading function
+@st.cache_resource(show_spinner=False)
+def load_data(columns=None):
+    """Load the French Motor Insurance dataset from the columnar store in the repository
 
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
+    Columns are memory-mapped, so only the requested ones are paged in and the
+    frame is shared by all sessions (st.cache_resource) instead of being
+    unpickled per session. The store is built from the NPZ files on first use.
+    By default the GLM design matrix columns are left on disk.
+    """
 
-            with open(mappings_path, 'r') as f:
-                category_mappings = json.load(f)
+    try:
+        with st.spinner("📂 Loading dataset from repository..."):
+            data_dir = find_data_dir()
 
-            numeric_data = np.load(numeric_path)['data']
-            numeric_df = pd.DataFrame(numeric_data, columns=metadata['numeric_columns'])
+            if columns is None:
+                metadata = columnar.read_json(data_dir / columnar.METADATA_FILE)
+                columns = [col for col in metadata['columns'] if not columnar.is_design_column(col)]
 
-            categorical_data = np.load(categorical_path)['data']
-            categorical_df = pd.DataFrame(categorical_data, columns=metadata['categorical_columns'])
-            
-            # Decode categorical data
-            for col in metadata['categorical_columns']:
-                col_idx = metadata['categorical_columns'].index(col)
-                codes = categorical_data[:, col_idx]
-                categories = category_mappings[col]
-                categorical_df[col] = pd.Categorical.from_codes(codes, categories=categories)
-            
-            # Combine dataframes in original column order
-            df = pd.DataFrame()
-            for col in metadata['columns']:
-                if col in numeric_df.columns:
-                    df[col] = numeric_df[col]
-                elif col in categorical_df.columns:
-                    df[col] = categorical_df[col]
+            try:
+                store = open_dataset_store()
+                if shared_data.SHARED_ROOT:
+                    st.sidebar.info(f'📦 Attached shared dataset {store.path.name} from {shared_data.SHARED_ROOT}')
+                else:
+                    st.sidebar.info('📦 Loading from columnar store...')
+                df = store.frame(columns)
+            except OSError:
+                # Read-only deployment without a prebuilt store: decode the NPZ files
+                st.sidebar.info('📦 Loading from NPZ files...')
+                df = columnar.load_npz_frame(data_dir, columns)
             
             st.sidebar.success(f"✅ Loaded {len(df):,} policies from repository!")
             return df
@@ -122,47 +139,397 @@ def load_data():
         4. Try redeploying on Streamlit Cloud
         """)
         st.stop()
-# Calculate metrics
-@st.cache_data
-def calculate_metrics(df):
-    """Calculate key metrics for the dashboard"""
-    metrics = {
-        'total_policies': len(df),
-        'total_claims': df['ClaimNb'].sum(),
-        'total_exposure': df['Exposure'].sum(),
-        'total_claim_amount': df['ClaimAmount'].sum(),
-        'avg_pure_premium': df['PurePremium'].mean(),
-        'avg_predicted_premium': df['Pred_GLMs'].mean(),
-        'claim_frequency': df['ClaimNb'].sum() / df['Exposure'].sum(),
-        'avg_claim_severity': df[df['ClaimAmount'] > 0]['ClaimAmount'].mean() if (df['ClaimAmount'] > 0).any() else 0
-    }
-    return metrics
+def show_memory_budget(df):
+    """Sidebar report of the frame's memory footprint against the declared dtypes"""
+    metadata = columnar.read_json(find_data_dir() / columnar.METADATA_FILE)
+    report = schema.memory_report(df, metadata['dtypes'])
+    total_bytes = report['Bytes'].sum()
+    declared_bytes = report['Declared Bytes'].sum()
+    
+    with st.sidebar.expander('💾 Memory Budget'):
+        st.metric('Frame Size', f'{total_bytes / 1e6:,.1f} MB',
+                  f'{(total_bytes - declared_bytes) / 1e6:,.1f} MB vs declared dtypes',
+                  delta_color='inverse')
+        st.caption(f'Declared dtypes: {declared_bytes / 1e6:,.1f} MB '
+                   f'({total_bytes / declared_bytes:.0%} of declared)')
+        st.dataframe(report, use_container_width=True, hide_index=True)
 
-# Pivot table helper functions
-def calculate_pivot_metric(group_df, metric_name):
-    """Calculate a metric for a grouped dataframe"""
+@st.cache_resource(show_spinner=False)
+def load_shared_store():
+    """The node's shared copy of the store (see shared_data.py), attached once per process"""
+    return shared_data.attach_or_publish(find_data_dir())
+
+def open_dataset_store(build=True):
+    """Columnar store of the dataset: the node's shared copy with DASHBOARD_SHARED_DATA, else the local one"""
+    if shared_data.SHARED_ROOT:
+        return load_shared_store()
+    return columnar.open_store(find_data_dir(), build=build)
+
+def prebuilt(load, *args):
+    """Derived index from the store's snapshot (see snapshot.py), or None to build it"""
+    try:
+        store = open_dataset_store(build=False)
+    except OSError:
+        return None
+    return load(store, *args)
+
+@st.cache_resource(show_spinner=False)
+def load_cube():
+    """Aggregation cube of the loaded dataset, mapped from the snapshot or built once and shared by all sessions"""
+    if EXECUTION_MODE == 'parallel':
+        return load_executor().build_cube()
+    data_cube = prebuilt(snapshot.load_cube)
+    return data_cube if data_cube is not None else cube.build_cube(load_data())
+
+@st.cache_resource(show_spinner=False)
+def load_executor():
+    """Worker pool over row shards of the loaded frame, for the parallel execution mode"""
     try:
-        if metric_name == 'Frequency':
-            result = group_df['ClaimNb'].sum() / group_df['Exposure'].sum() if group_df['Exposure'].sum() > 0 else 0
-        elif metric_name == 'AvgClaimAmount':
-            result = group_df['ClaimAmount'].sum() / group_df['ClaimNb'].sum() if group_df['ClaimNb'].sum() > 0 else 0
-        elif metric_name == 'AvgPremium':
-            result = group_df['Pred_GLMs'].mean()
-        elif metric_name == 'TotalExposure':
-            result = group_df['Exposure'].sum()
-        elif metric_name == 'TotalClaims':
-            result = group_df['ClaimNb'].sum()
-        elif metric_name == 'TotalClaimAmount':
-            result = group_df['ClaimAmount'].sum()
-        elif metric_name == 'PolicyCount':
-            result = len(group_df)
-        elif metric_name == 'ClaimRate':
-            result = (group_df['ClaimNb'] > 0).sum() / len(group_df) if len(group_df) > 0 else 0
+        store_path = open_dataset_store(build=False).path
+    except OSError:
+        store_path = None
+    return ParallelExecutor(load_data(), store_path=store_path)
+
+@st.cache_resource(show_spinner=False)
+def load_filter_index():
+    """Bitmap index of the sidebar filter columns, mapped from the snapshot or built once and shared by all sessions"""
+    filter_index = prebuilt(snapshot.load_filter_index, load_data())
+    return filter_index if filter_index is not None else FilterIndex(load_data())
+
+@st.cache_resource(show_spinner=False)
+def load_block_source():
+    """Row blocks streamed from disk, for the out-of-core execution mode"""
+    return chunked.BlockSource(find_data_dir(), int(os.environ.get('CHUNK_ROWS', chunked.BLOCK_ROWS)))
+
+@st.cache_resource(show_spinner=False)
+def load_chunked_cube():
+    """Aggregation cube merged block by block, without loading the frame"""
+    return chunked.build_cube(load_block_source())
+
+@st.cache_resource(show_spinner=False)
+def load_summaries():
+    """Quantile sketches and moment sums per categorical cell, for medians, box plots and correlations under filters"""
+    if EXECUTION_MODE == 'chunked':
+        data_cube = load_chunked_cube()
+        columns = summaries.CellSummaries(data_cube).columns_needed
+        return summaries.build_summaries(data_cube, load_block_source().blocks(columns))
+    return summaries.build_summaries(load_cube(), [load_data()])
+
+@st.cache_resource(show_spinner=False)
+def load_glm():
+    """GLM coefficients fitted from the category codes and continuous terms, and a scorer over all policies"""
+    frame = load_data(tuple(glm.model_columns(dataset_columns())))
+    return glm.GLMScorer(glm.fit_model(frame, glm.level_terms(dataset_columns())), frame)
+
+@st.cache_resource(show_spinner=False)
+def load_validation_book():
+    """Policies sorted once by Pred_GLMs (overall and per split), for lift, Gini and calibration"""
+    frame = load_data(('Pred_GLMs', 'Exposure', 'ClaimAmount', 'DataMajor'))
+    return validation.ValidationBook(frame['Pred_GLMs'].to_numpy(), frame['Exposure'].to_numpy(),
+                                     frame['ClaimAmount'].to_numpy(), frame['DataMajor'].array)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_challenger(adjustments):
+    """Challenger premiums of every policy (the GLM under adjustments) and their double-lift ranking"""
+    scores = load_glm().score(adjustments)
+    return scores, load_validation_book().challenger_ranking(scores)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_one_way_codes(binning, n_bins):
+    """Bin code of every policy for every rating factor, stacked, for one binning"""
+    return one_way.OneWayCodes.from_frame(load_data(), binning, n_bins)
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_sort_index(column):
+    """Argsort of one column over every policy, for the Data Explorer's sorted pages"""
+    return paging.SortIndex(paging.sort_values(load_data()[column]))
+
+@st.cache_resource(show_spinner=False)
+def load_id_index():
+    """IDpol sorted once, for looking policies up in the Data Explorer"""
+    return paging.IdIndex(load_data()['IDpol'].to_numpy())
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_adjusted_cube(adjustments):
+    """Cube with its premium sums re-scored under what-if adjustments"""
+    return glm.adjust_cube(load_cube(), adjustments)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_selection_cube(_spec, fingerprint):
+    """Cube of the policies matching a filter whose DrivAge/VehPower range splits a band of the
+    dataset's cube, aggregated from the selected rows under the same labels"""
+    columns = list(dict.fromkeys(list(cube.DIMENSIONS) + [col for col in cube.MEASURES.values() if col is not None]))
+    if EXECUTION_MODE == 'chunked':
+        return cube.build_blocks(load_block_source().filtered_blocks(_spec, columns), load_chunked_cube().labels)
+    if EXECUTION_MODE == 'parallel':
+        return load_executor().build_cube(_spec, load_cube().labels)
+    return cube.build_blocks([load_filter_index().select(_spec).frame(columns)], load_cube().labels)
+
+@st.cache_resource(show_spinner=False)
+def load_value_range(column):
+    """Smallest and largest value of an integer column over all policies, for the range sliders"""
+    if EXECUTION_MODE == 'chunked':
+        bounds = [(block[column].min(), block[column].max())
+                  for block in load_block_source().blocks([column]) if len(block)]
+        return int(min(low for low, _ in bounds)), int(max(high for _, high in bounds))
+    values = load_data()[column]
+    return int(values.min()), int(values.max())
+
+def slider_range(dim, selected, extent):
+    """Slider range with the ends at the data's extent opened to the cube's band edges (the same
+    policies), so an untouched slider lines up with the bands"""
+    low, high = selected
+    return (cube.BANDS[dim][0] if low <= extent[0] else low, cube.BAND_END if high >= extent[1] else high)
+
+def what_if_adjustments():
+    """Normalized what-if adjustments of the sidebar, () when none is active"""
+    return st.session_state.get('what_if_adjustments', ())
+
+def with_what_if(selection, columns):
+    """Selected rows of columns, with Pred_GLMs re-scored under the active what-if adjustments"""
+    frame = selection.frame(columns)
+    adjustments = what_if_adjustments()
+    if adjustments and 'Pred_GLMs' in frame:
+        frame = frame.assign(Pred_GLMs=load_glm().score(adjustments, selection.rows))
+    return frame
+
+def with_what_if_chunks(selection, chunks):
+    """Row blocks of selection.chunks(), with Pred_GLMs re-scored under the active what-if adjustments"""
+    adjustments = what_if_adjustments()
+    start = 0
+    for chunk in chunks:
+        if adjustments and 'Pred_GLMs' in chunk:
+            stop = start + len(chunk)
+            rows = np.arange(start, stop) if selection.rows is None else selection.rows[start:stop]
+            chunk = chunk.assign(Pred_GLMs=load_glm().score(adjustments, rows))
+        start += len(chunk)
+        yield chunk
+
+@st.cache_resource(show_spinner=False)
+def load_result_cache():
+    """Result cache shared by all sessions; its budget comes from RESULT_CACHE_MB"""
+    budget_mb = float(os.environ.get('RESULT_CACHE_MB', 256))
+    return ResultCache(int(budget_mb * 1024 ** 2))
+
+@st.cache_resource(show_spinner=False)
+def load_dataset_version():
+    if shared_data.SHARED_ROOT:
+        return load_shared_store().path.name
+    return columnar.dataset_version(find_data_dir())
+
+def cached_result(kind, spec, key, compute):
+    """compute() through the shared result cache, keyed by dataset version, filter state and key"""
+    cache_key = (load_dataset_version(), spec.fingerprint(), what_if_adjustments()) + tuple(key)
+    return load_result_cache().get_or_compute(kind, cache_key, compute)
+
+# Server-side reduced chart data, cached per filter state; in chunked mode each
+# is reduced block by block (what-if is not offered there), in parallel mode
+# the histograms and value counts are scanned over the executor's row shards
+CHUNKED_SAMPLE_ROWS = 100_000
+
+def scanned_in_parallel():
+    """Whether row scans go to the parallel executor (fitted premiums only: what-if re-scores rows)"""
+    return EXECUTION_MODE == 'parallel' and not what_if_adjustments()
+
+def column_histogram(selection, column, nbins):
+    """Histogram bins of one column over the filtered rows"""
+    def compute():
+        if not selection.in_memory:
+            return selection.histogram([column], lambda block: block[column].to_numpy(), nbins)
+        if scanned_in_parallel():
+            return load_executor().binned(selection.spec, column, nbins)
+        return charts.histogram(with_what_if(selection, [column])[column].to_numpy(), nbins)
+    return cached_result('chart', selection.spec, ('histogram', column, nbins), compute)
+
+def value_counts(selection, column):
+    """Policies per value of an integer column over the filtered rows, merged block by block"""
+    def compute():
+        if scanned_in_parallel():
+            counts = load_executor().bincount(selection.spec, column).astype(np.float64)
+            values = np.flatnonzero(counts)
+            return pd.Series(counts[values], index=values)
+        counts = np.zeros(0)
+        for chunk in selection.chunks([column]):
+            chunk_counts = np.bincount(chunk[column].to_numpy().astype(np.intp))
+            if len(chunk_counts) > len(counts):
+                counts = np.pad(counts, (0, len(chunk_counts) - len(counts)))
+            counts[:len(chunk_counts)] += chunk_counts
+        values = np.flatnonzero(counts)
+        return pd.Series(counts[values], index=values)
+    return cached_result('chart', selection.spec, ('counts', column), compute)
+
+def residual_histogram(selection, nbins):
+    """Histogram bins of the prediction error (%) of policies with a positive pure premium"""
+    def residual_pct(frame):
+        actual = frame['PurePremium'].to_numpy()
+        predicted = frame['Pred_GLMs'].to_numpy()
+        positive = actual > 0
+        return (actual[positive] - predicted[positive]) / actual[positive] * 100
+    
+    def compute():
+        if not selection.in_memory:
+            return selection.histogram(['PurePremium', 'Pred_GLMs'], residual_pct, nbins)
+        return charts.histogram(residual_pct(with_what_if(selection, ['PurePremium', 'Pred_GLMs'])), nbins)
+    return cached_result('chart', selection.spec, ('residuals', nbins), compute)
+
+def summary_cells(view):
+    """Summary cells holding exactly the view's policies, or None for a cube of the selected rows"""
+    def compute():
+        cell_summaries = load_summaries()
+        # A cube of the selected rows has cells of its own
+        if view.cube.codes is not cell_summaries.cube.codes:
+            return None
+        return cell_summaries.cells_of(view.cells)
+    return view.cached('summary_cells', (), compute)
+
+def cell_summary(view, column):
+    """ColumnSummary of a column over the view, merged from the per-cell sketches (fitted premiums), or None"""
+    cells = summary_cells(view)
+    if cells is None:
+        return None
+    return view.cached('summary', (column,), lambda: load_summaries().summary(column, cells))
+
+def split_box_stats(selection, view, column):
+    """Box plot statistics of one column per DataMajor split over the filtered rows
+
+    Without what-if adjustments and DrivAge/VehPower ranges they come from
+    the per-cell sketches of the view (quartiles and whiskers within 1%),
+    without gathering any row; in chunked mode the filtered blocks are
+    streamed into per-split sketches.
+    """
+    cells = None if what_if_adjustments() else summary_cells(view)
+    if cells is not None:
+        def from_sketches():
+            groups = load_summaries().group_summaries(column, cells, 'DataMajor')
+            return {split: charts.sketch_box_stats(summary) for split, summary in groups.items()}
+        return view.cached('chart', ('box', column), from_sketches)
+    
+    def compute():
+        if not selection.in_memory:
+            groups = selection.group_summaries(column, 'DataMajor')
+            return {split: charts.sketch_box_stats(summary) for split, summary in groups.items()}
+        frame = with_what_if(selection, ['DataMajor', column])
+        codes = frame['DataMajor'].cat.codes.to_numpy()
+        values = frame[column].to_numpy()
+        return {
+            split: charts.box_stats(values[codes == code])
+            for code, split in enumerate(frame['DataMajor'].cat.categories)
+            if (codes == code).any()
+        }
+    return cached_result('chart', selection.spec, ('box', column), compute)
+
+def one_way_tables(selection, binning, n_bins):
+    """One-way table of every rating factor over the filtered rows (premiums re-scored by what-if)"""
+    def compute():
+        codes = load_one_way_codes(binning, n_bins)
+        frame = with_what_if(selection, ['Exposure', 'ClaimNb', 'ClaimAmount', 'Pred_GLMs'])
+        return codes.table(codes.sums(one_way.measure_values(frame), selection.rows))
+    return cached_result('one_way', selection.spec, (binning, n_bins), compute)
+
+def actual_vs_predicted(selection, mode):
+    """Actual vs predicted pure premium of every policy with a claim, reduced for plotting
+
+    'Density heatmap' bins all pairs (log scale) and keeps the sparse points
+    exactly; 'Stratified sample' takes 10k rows evenly across PurePremium
+    quantiles so the tail is not lost. In chunked mode both start from a
+    uniform sample of up to CHUNKED_SAMPLE_ROWS policies with a claim.
+    """
+    def compute():
+        if not selection.in_memory:
+            frame = selection.sample(['PurePremium', 'Pred_GLMs'], CHUNKED_SAMPLE_ROWS,
+                                     keep=lambda block: block['PurePremium'].to_numpy() > 0)
         else:
-            result = 0
-        return result
-    except:
-        return 0
+            frame = with_what_if(selection, ['PurePremium', 'Pred_GLMs'])
+            frame = frame[frame['PurePremium'].to_numpy() > 0]
+        if mode == 'Density heatmap':
+            return charts.density_grid(frame['PurePremium'].to_numpy(), frame['Pred_GLMs'].to_numpy())
+        return frame.iloc[charts.stratified_sample(frame['PurePremium'].to_numpy(), 10000)]
+    return cached_result('chart', selection.spec, ('actual_vs_predicted', mode), compute)
+
+def rerun_stage(name):
+    """Time a block as a stage of this rerun's diagnostics"""
+    return st.session_state['diagnostics'].stage(name)
+
+def show_chart(fig, payload_bytes=None, timing=None):
+    """Show a Plotly figure, recording its payload size in this rerun's diagnostics"""
+    payload_bytes = st.session_state['diagnostics'].figure(fig, payload_bytes, timing)
+    st.plotly_chart(fig, use_container_width=True)
+    return payload_bytes
+
+def plot_reduced(fig, started, n_rows):
+    """Show a server-side reduced chart with its payload size and build time"""
+    build_ms = (time.perf_counter() - started) * 1000
+    payload_bytes = show_chart(fig)
+    st.caption(f'{n_rows:,} rows → {payload_bytes / 1024:,.1f} KB figure payload, '
+               f'built in {build_ms:,.0f} ms')
+
+# Concurrent figure construction: a tab submits its figures' builders up front
+# and shows the finished figures in layout order (see render_pool.py)
+@st.cache_resource(show_spinner=False)
+def load_render_pool():
+    """Figure-building thread pool shared by all sessions (DASHBOARD_RENDER_WORKERS)"""
+    return render_pool.RenderPool()
+
+def release_cached_resources():
+    """Drop every cached resource, shutting down the worker pools first so their threads and processes exit"""
+    if EXECUTION_MODE == 'parallel':
+        load_executor().close()
+    load_render_pool().close()
+    st.cache_resource.clear()
+
+def figure_batch():
+    """FigureBatch whose builders run under this session's context, so they can read its state"""
+    ctx = get_script_run_ctx()
+    return load_render_pool().batch(attach=lambda: add_script_run_ctx(ctx=ctx))
+
+def show_built(figures, name, n_rows=None):
+    """Show a figure of a FigureBatch with its timings; with n_rows, captioned like plot_reduced"""
+    fig, payload_bytes = figures.result(name)
+    timing = figures.timings[-1]
+    show_chart(fig, payload_bytes, timing)
+    if n_rows is not None:
+        st.caption(f'{n_rows:,} rows → {payload_bytes / 1024:,.1f} KB figure payload, '
+                   f'built in {timing["build_ms"]:,.0f} ms')
+
+def download_on_demand(label, key, identity, fmt, file_name, write):
+    """Serialize an export only when the user asks for it, then offer it for download
+
+    identity (e.g. filter fingerprint and columns) and the dataset version key
+    the on-disk export cache; write(path) streams the export into path on a
+    cache miss. The download button holds the whole file in memory, so it is
+    shown for one render only: the next rerun drops it instead of reading the
+    file again, and preparing the same export again is a cache hit.
+    """
+    export_id = export.export_key(load_dataset_version(), *identity, fmt)
+    if st.button(f'⚙️ Prepare {label}', key=f'{key}_prepare'):
+        with st.spinner('Preparing download...'), rerun_stage('export'):
+            st.session_state[key] = export.cached_export(export_id, fmt, write)
+    
+    path = st.session_state.pop(key, None)
+    if path is not None and path.name.startswith(f'export-{export_id}') and path.exists():
+        extension, mime = export.EXPORT_FORMATS[fmt]
+        with open(path, 'rb') as f:
+            st.download_button(f'📥 Download {label}', f, file_name + extension, mime, key=f'{key}_download')
+        st.caption(f'{path.stat().st_size / 1e6:,.1f} MB, held in memory until the next interaction '
+                   f'(prepare it again to download it later)')
+
+# Pivot table helper functions
+PIVOT_DIMENSIONS = ['Area', 'Region', 'VehBrand', 'VehGas', 'DataMajor']
+DEFAULT_PIVOT_ROWS = ['Area']
+DEFAULT_PIVOT_METRICS = ['Frequency', 'AvgPremium']
+
+def cached_pivot(view, row_dims, col_dims, metrics, margins, spec=None):
+    """Pivot of the view's group sums (metrics are ratios of them), through the result cache
+
+    In parallel mode, given the filter spec, the group sums are scanned over
+    the executor's row shards instead of summed from the cube.
+    """
+    def compute():
+        if spec is not None and scanned_in_parallel():
+            return load_executor().pivot(spec, row_dims, col_dims, metrics, margins)
+        sums = view.group_by(*(row_dims + col_dims), measures=pivot.PIVOT_MEASURES)
+        return pivot.pivot_table(sums, row_dims, col_dims, metrics, margins=margins)
+    return view.cached('pivot', (tuple(row_dims), tuple(col_dims), tuple(metrics), margins), compute)
 
 def format_pivot_value(value, metric_name):
     """Format a pivot table value"""
@@ -181,428 +548,898 @@ def format_pivot_value(value, metric_name):
     except:
         return str(value)
 
+# Dashboard tabs
+def render_overview(selection, view):
+    """Overview tab: key metrics, split/claims distribution and top regions"""
+    # plotly.express is imported on first use, after the sidebar has been sent
+    import plotly.express as px
+    view_metrics = cube.summary_metrics(view.totals())
+    
+    # Figures are built in the render pool while the metrics are laid out
+    def split_figure():
+        split_counts = view.group_by('DataMajor')['policies']
+        return px.pie(values=split_counts.values, names=split_counts.index, 
+                      title='Train/Valid/Test Split')
+    
+    def claims_figure():
+        claim_dist = value_counts(selection, 'ClaimNb')
+        return px.bar(x=claim_dist.index, y=claim_dist.values,
+                      labels={'x': 'Number of Claims', 'y': 'Count'})
+    
+    def regions_figure():
+        region_sums = view.group_by('Region')
+        region_stats = pd.DataFrame({
+            'Region': region_sums.index,
+            'Policies': region_sums['policies'].values,
+            'Avg Premium': (region_sums['pred_premium'] / region_sums['policies']).values,
+        })
+        region_stats = region_stats.sort_values('Policies', ascending=False).head(10)
+        return px.bar(region_stats, x='Region', y='Policies', color='Avg Premium',
+                      color_continuous_scale='Blues')
+    
+    figures = figure_batch()
+    figures.submit('split', split_figure)
+    figures.submit('claims', claims_figure)
+    figures.submit('regions', regions_figure)
+    
+    st.header('📊 Dataset Overview')
+    
+    # Key metrics
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    with col1:
+        st.metric('Total Policies', f"{view_metrics['total_policies']:,}")
+    
+    with col2:
+        st.metric('Total Claims', f"{int(view_metrics['total_claims']):,}")
+    
+    with col3:
+        st.metric('Total Exposure', f"{view_metrics['total_exposure']:,.2f}")
+    
+    with col4:
+        st.metric('Claim Frequency', f"{view_metrics['claim_frequency']:.4f}")
+    
+    with col5:
+        st.metric('Avg Predicted Premium', f"€{view_metrics['avg_predicted_premium']:,.2f}")
+    
+    st.markdown('---')
+    
+    # Charts
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader('Data Split Distribution')
+        show_built(figures, 'split')
+    
+    with col2:
+        st.subheader('Claims Distribution')
+        show_built(figures, 'claims')
+    
+    # Regional analysis
+    st.subheader('Top 10 Regions by Policy Count')
+    show_built(figures, 'regions')
+
+def render_glm_predictions(selection, view):
+    """GLM Predictions tab: premium distribution and actual vs predicted"""
+    view_metrics = cube.summary_metrics(view.totals())
+    n_with_claims = int(view.totals()['policies_with_amount'])
+    # The scatter mode radio is drawn after its figure is submitted, so its choice is read from its key
+    scatter_mode = st.session_state.get('scatter_mode', 'Density heatmap')
+    
+    def scatter_figure():
+        reduced = actual_vs_predicted(selection, scatter_mode)
+        if scatter_mode == 'Density heatmap':
+            return charts.density_figure(reduced, 'PurePremium', 'Pred_GLMs',
+                                         title=f'Actual vs Predicted (all {reduced["n"]:,} policies)')
+        return charts.scatter_figure(reduced['PurePremium'], reduced['Pred_GLMs'],
+                                     'PurePremium', 'Pred_GLMs',
+                                     title=f'Actual vs Predicted (stratified sample of {len(reduced):,})')
+    
+    # Figures are built in the render pool while the metrics are computed and laid out
+    figures = figure_batch()
+    figures.submit('premiums', lambda: charts.histogram_figure(column_histogram(selection, 'Pred_GLMs', 50),
+                                                               'Predicted Premium (€)'))
+    figures.submit('splits', lambda: charts.box_figure(split_box_stats(selection, view, 'Pred_GLMs'),
+                                                       'DataMajor', 'Predicted Premium (€)'))
+    if n_with_claims > 0:
+        figures.submit('actual vs predicted', scatter_figure)
+        figures.submit('residuals', lambda: charts.histogram_figure(residual_histogram(selection, 50), 'Residual_Pct',
+                                                                    title='Prediction Errors (%)'))
+    
+    st.header('🎯 GLM Model Predictions Analysis')
+    adjustments = what_if_adjustments()
+    summary = None if adjustments else cell_summary(view, 'Pred_GLMs')
+    if summary is not None:
+        # Merged from the per-cell sketches of the view: the median is within 1%, std and max are exact
+        median_premium, std_premium, max_premium = summary.quantile(0.5), summary.std, summary.max
+    elif selection.in_memory:
+        premiums = with_what_if(selection, ['Pred_GLMs'])['Pred_GLMs']
+        median_premium, std_premium, max_premium = premiums.median(), premiums.std(), premiums.max()
+    else:
+        # Streamed into a per-block ColumnSummary: the median is within 1%, std and max are exact
+        summary = cached_result('summary', selection.spec, ('Pred_GLMs',), lambda: selection.summary('Pred_GLMs'))
+        median_premium, std_premium, max_premium = summary.quantile(0.5), summary.std, summary.max
+    
+    def euros(value):
+        # Statistics of an empty selection are NaN
+        return f"€{value:,.2f}" if np.isfinite(value) else 'n/a'
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric('Mean Premium', euros(view_metrics['avg_predicted_premium']))
+    with col2:
+        st.metric('Median Premium', euros(median_premium))
+    with col3:
+        st.metric('Std Premium', euros(std_premium))
+    with col4:
+        st.metric('Max Premium', euros(max_premium))
+    
+    if adjustments:
+        # Re-score the whole portfolio to report what a slider step costs
+        scorer = load_glm()
+        started = time.perf_counter()
+        scorer.score(adjustments)
+        rescore_ms = (time.perf_counter() - started) * 1000
+        # The view's premium sums are already re-scored: its mean is the what-if mean
+        base_mean = selection.column('Pred_GLMs').mean()
+        change = view_metrics['avg_predicted_premium'] / base_mean - 1 if base_mean > 0 else np.nan
+        described = ', '.join(f'{factor} {level} ×{multiplier:.2f}' for factor, level, multiplier in adjustments)
+        st.info(f'🧮 What-if ({described}): mean premium of the filtered policies {change:+.2%} '
+                f'vs the fitted GLM. All {len(scorer.continuous_eta):,} policies re-scored in {rescore_ms:.0f} ms.')
+    
+    st.markdown('---')
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader('Distribution of Predicted Premiums')
+        show_built(figures, 'premiums', len(selection))
+    
+    with col2:
+        st.subheader('Premium by Data Split')
+        show_built(figures, 'splits', len(selection))
+    
+    # Actual vs Predicted
+    st.subheader('Actual vs Predicted Pure Premium')
+    
+    if n_with_claims > 0:
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.radio('Scatter mode', ['Density heatmap', 'Stratified sample'],
+                     horizontal=True, key='scatter_mode')
+            show_built(figures, 'actual vs predicted', n_with_claims)
+    
+        with col2:
+            show_built(figures, 'residuals', n_with_claims)
+
+def render_claims_analysis(selection, view):
+    """Claims Analysis tab: claim totals and frequency by region/area"""
+    import plotly.express as px
+    view_metrics = cube.summary_metrics(view.totals())
+    
+    st.header('📈 Claims Analysis')
+    
+    col1, col2, col3, col4 = st.columns(4)
+    total_claims = view_metrics['total_claims']
+    policies_with_claims = view_metrics['policies_with_claims']
+    total_claim_amount = view_metrics['total_claim_amount']
+    avg_claim_amount = view_metrics['avg_claim_severity']
+    
+    with col1:
+        st.metric('Total Claims', f"{int(total_claims):,}")
+    with col2:
+        st.metric('Policies with Claims', f"{policies_with_claims:,}")
+    with col3:
+        st.metric('Total Claim Amount', f"€{total_claim_amount:,.2f}")
+    with col4:
+        st.metric('Avg Claim Severity', f"€{avg_claim_amount:,.2f}")
+    
+    st.markdown('---')
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader('Claim Frequency by Region')
+        freq_by_region = cube.frequency_table(view, 'Region')
+        freq_by_region = freq_by_region.sort_values('Frequency', ascending=False).head(10)
+    
+        fig = px.bar(freq_by_region, x='Region', y='Frequency', color='Frequency',
+                    color_continuous_scale='Reds')
+        show_chart(fig)
+    
+    with col2:
+        st.subheader('Claim Frequency by Area')
+        freq_by_area = cube.frequency_table(view, 'Area')
+    
+        fig = px.bar(freq_by_area, x='Area', y='Frequency', color='Frequency',
+                    color_continuous_scale='Oranges')
+        show_chart(fig)
+
+def render_vehicle_features(selection, view):
+    """Vehicle Features tab: brands, fuel type and vehicle age"""
+    import plotly.express as px
+    view_totals = view.totals()
+    view_metrics = cube.summary_metrics(view_totals)
+    
+    st.header('🚗 Vehicle Features Analysis')
+    
+    brand_sums = view.group_by('VehBrand')
+    fuel_sums = view.group_by('VehGas')
+    policies = view_metrics['total_policies']
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric('Vehicle Brands', len(brand_sums))
+    with col2:
+        diesel_policies = fuel_sums['policies'].get('Diesel', 0)
+        diesel_pct = diesel_policies / policies * 100 if policies > 0 else np.nan
+        st.metric('Diesel Vehicles', f"{diesel_pct:.1f}%")
+    with col3:
+        avg_veh_age = view_totals['veh_age'] / policies if policies > 0 else np.nan
+        st.metric('Avg Vehicle Age', f"{avg_veh_age:.1f} years")
+    
+    st.markdown('---')
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader('Top 10 Vehicle Brands')
+        brand_counts = brand_sums['policies'].sort_values(ascending=False).head(10)
+        fig = px.bar(x=brand_counts.values, y=brand_counts.index, orientation='h')
+        show_chart(fig)
+    
+    with col2:
+        st.subheader('Fuel Type Distribution')
+        fuel_counts = fuel_sums['policies']
+        fig = px.pie(values=fuel_counts.values, names=fuel_counts.index)
+        show_chart(fig)
+
+def render_driver_demographics(selection, view):
+    """Driver Demographics tab: driver age and premium by age group"""
+    import plotly.express as px
+    view_totals = view.totals()
+    view_metrics = cube.summary_metrics(view_totals)
+    
+    st.header('👥 Driver Demographics Analysis')
+    
+    # The cube holds age bands; single ages are counted from the filtered rows
+    age_counts = value_counts(selection, 'DrivAge')
+    policies = view_metrics['total_policies']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        avg_age = view_totals['driver_age'] / policies if policies > 0 else np.nan
+        st.metric('Avg Driver Age', f"{avg_age:.1f} years")
+    with col2:
+        st.metric('Min Driver Age', f"{age_counts.index.min()} years" if len(age_counts) else 'n/a')
+    with col3:
+        st.metric('Max Driver Age', f"{age_counts.index.max()} years" if len(age_counts) else 'n/a')
+    with col4:
+        avg_bonus_malus = view_totals['bonus_malus'] / policies if policies > 0 else np.nan
+        st.metric('Avg Bonus-Malus', f"{avg_bonus_malus:.1f}")
+    
+    st.markdown('---')
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Policies per driver age are binned from the cached counts, not the rows
+        started = time.perf_counter()
+        hist = charts.histogram(age_counts.index, 50, weights=age_counts.values)
+        fig = charts.histogram_figure(hist, 'DrivAge', title='Distribution of Driver Age')
+        plot_reduced(fig, started, len(selection))
+    
+    with col2:
+        # Age groups are the cube's DrivAge bands
+        group_sums = view.group_by('DrivAge', measures=['pred_premium'])
+        group_summary = pd.DataFrame({
+            'AgeGroup': group_sums.index.astype(str),
+            'Pred_GLMs': (group_sums['pred_premium'] / group_sums['policies']).values,
+        })
+        fig = px.bar(group_summary, x='AgeGroup', y='Pred_GLMs', 
+                    title='Average Premium by Age Group',
+                    color='Pred_GLMs', color_continuous_scale='Viridis')
+        show_chart(fig)
+
+ONE_WAY_METRICS = {
+    'Frequency': (['Frequency'], 'Claims per unit of exposure'),
+    'Severity': (['Severity'], 'Average claim amount (€)'),
+    'Pure Premium': (['Observed PP', 'Predicted PP'], 'Pure premium per unit of exposure (€)'),
+    'Actual / Expected': (['A/E'], 'Actual / expected loss'),
+}
+
+def render_one_way(selection, view):
+    """One-Way Analysis tab: exposure, frequency, severity and A/E per level of every rating factor"""
+    st.header('📐 One-Way Analysis')
+    if not selection.in_memory:
+        st.info('One-way analysis bins every policy in memory and is not available in chunked execution.')
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        binning = st.radio('Continuous factors', one_way.BINNINGS, horizontal=True, key='one_way_binning',
+                           format_func=lambda binning: f'{binning.title()} bins')
+    with col2:
+        n_bins = st.slider('Bins', 4, 20, one_way.DEFAULT_BINS, key='one_way_bins')
+    with col3:
+        metric = st.selectbox('Metric', list(ONE_WAY_METRICS), key='one_way_metric')
+    
+    with rerun_stage('one-way'):
+        tables = one_way_tables(selection, binning, n_bins)
+    
+    factor = st.selectbox('Rating factor', list(one_way.FACTORS), key='one_way_factor')
+    table = tables[tables['Factor'] == factor].drop(columns='Factor')
+    lines, y_label = ONE_WAY_METRICS[metric]
+    fig = charts.one_way_figure(table, factor, lines, y_label, title=f'{metric} by {factor}')
+    show_chart(fig)
+    st.dataframe(table.style.format({
+        'Policies': '{:,.0f}', 'Exposure': '{:,.1f}', 'Claims': '{:,.0f}', 'ClaimAmount': '€{:,.0f}',
+        'Expected': '€{:,.0f}', 'Frequency': '{:.4f}', 'Severity': '€{:,.0f}', 'Observed PP': '€{:,.2f}',
+        'Predicted PP': '€{:,.2f}', 'A/E': '{:.3f}', 'Exposure Share': '{:.1%}',
+    }), hide_index=True, use_container_width=True)
+    
+    with st.expander('All factors'):
+        # Spread of each factor's levels: a wide A/E range points at a factor the model under-fits
+        spread = tables.groupby('Factor', sort=False).agg(
+            Levels=('Level', 'size'),
+            Frequency_min=('Frequency', 'min'), Frequency_max=('Frequency', 'max'),
+            AE_min=('A/E', 'min'), AE_max=('A/E', 'max'),
+        ).rename(columns={'Frequency_min': 'Min Frequency', 'Frequency_max': 'Max Frequency',
+                          'AE_min': 'Min A/E', 'AE_max': 'Max A/E'})
+        st.dataframe(spread, use_container_width=True)
+        st.download_button('📥 Download one-way tables (CSV)', tables.to_csv(index=False),
+                           'one_way_tables.csv', 'text/csv', key='one_way_download')
+
+def render_model_validation(selection, view):
+    """Model Validation tab: lift, Lorenz curve and Gini, calibration per split and double lift"""
+    import plotly.express as px
+    
+    st.header('✅ Model Validation')
+    if not selection.in_memory:
+        st.info('Model validation ranks every policy in memory and is not available in chunked execution.')
+        return
+    
+    book = load_validation_book()
+    mask = None if selection.rows is None else selection.mask
+    with rerun_stage('validation'):
+        # Validates the fitted Pred_GLMs: what-if adjustments are compared in the double lift below
+        report = load_result_cache().get_or_compute(
+            'validation', (load_dataset_version(), selection.spec.fingerprint()), lambda: book.report(mask))
+    lift = report['lift']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric('Gini (actual loss)', f"{report['gini']:.3f}")
+    with col2:
+        st.metric('Gini (predicted loss)', f"{report['predicted_gini']:.3f}")
+    with col3:
+        calibration = report['calibration']
+        overall_ae = calibration['Actual'].sum() / calibration['Predicted'].sum() if len(calibration) else np.nan
+        st.metric('Actual / Expected', f'{overall_ae:.3f}')
+    with col4:
+        lift_ratio = lift['Actual Rate'].iloc[-1] / lift['Actual Rate'].iloc[0] if len(lift) > 1 else np.nan
+        st.metric('Top / Bottom Decile', f'{lift_ratio:.2f}x')
+    
+    st.markdown('---')
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader('Lift by Exposure Decile')
+        rates = lift.melt(id_vars='Decile', value_vars=['Predicted Rate', 'Actual Rate'],
+                          var_name='Pure Premium', value_name='Rate')
+        fig = px.bar(rates, x='Decile', y='Rate', color='Pure Premium', barmode='group',
+                     labels={'Rate': 'Loss per Unit of Exposure (€)'})
+        show_chart(fig)
+    
+    with col2:
+        st.subheader('Lorenz Curve')
+        curves = report['lorenz'].melt(id_vars='Exposure Share', var_name='Loss', value_name='Loss Share')
+        fig = px.line(curves, x='Exposure Share', y='Loss Share', color='Loss')
+        fig.add_shape(type='line', x0=0, y0=0, x1=1, y1=1, line=dict(dash='dot', color='gray'))
+        show_chart(fig)
+    
+    st.subheader('Calibration by Data Split')
+    st.dataframe(calibration.style.format({'Exposure': '{:,.0f}', 'Predicted': '€{:,.0f}', 'Actual': '€{:,.0f}',
+                                           'A/E': '{:.3f}', 'Gini': '{:.3f}'}),
+                 use_container_width=True, hide_index=True)
+    deciles = report['calibration_deciles']
+    if len(deciles):
+        fig = px.line(deciles, x='Decile', y='A/E', color='Split', markers=True,
+                      title='Actual / Expected by Exposure Decile')
+        show_chart(fig)
+    
+    # Double lift: policies ranked by challenger / fitted premium
+    st.subheader('Double Lift')
+    model = load_glm().model
+    challengers = {f'GLM without {factor}': model.without_factor(factor) for factor in glm.FACTORS}
+    adjustments = what_if_adjustments()
+    if adjustments:
+        challengers = {'What-if rating': adjustments, **challengers}
+    challenger_name = st.selectbox('Challenger', list(challengers), key='validation_challenger')
+    challenger_adjustments = challengers[challenger_name]
+    with rerun_stage('double lift'):
+        scores, ranking = load_challenger(challenger_adjustments)
+        double_lift = load_result_cache().get_or_compute(
+            'validation', (load_dataset_version(), selection.spec.fingerprint(), challenger_adjustments),
+            lambda: book.double_lift(scores, ranking, mask))
+    rates = double_lift.melt(id_vars='Decile', value_vars=['Actual', 'Base', 'Challenger'],
+                             var_name='Loss', value_name='Relative Rate')
+    fig = px.line(rates, x='Decile', y='Relative Rate', color='Loss', markers=True,
+                  title=f'Pred_GLMs vs {challenger_name}, by decile of challenger / Pred_GLMs')
+    show_chart(fig)
+
+FILE_ORDER = '(file order)'
+PAGE_SIZES = [25, 50, 100, 500]
+
+def show_row_pages(selection):
+    """Page through the filtered rows in the order of any column, or look policies up by IDpol
+
+    Sort orders and the IDpol index are built once per process; only the
+    rows of the visible page are gathered.
+    """
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
+    with col1:
+        sort_column = st.selectbox('Sort by', [FILE_ORDER] + list(selection.columns), key='explorer_sort')
+    with col2:
+        descending = st.radio('Order', ['Descending', 'Ascending'], key='explorer_order',
+                              disabled=sort_column == FILE_ORDER) == 'Descending'
+    with col3:
+        page_size = st.selectbox('Rows per page', PAGE_SIZES, index=1, key='explorer_page_size')
+    with col4:
+        search = st.text_input('Find IDpol', key='explorer_search', placeholder='e.g. 1, 3, 5')
+    
+    started = time.perf_counter()
+    mask = None if selection.rows is None else selection.mask
+    if search.strip():
+        ids, invalid = paging.parse_ids(search)
+        positions = load_id_index().find(ids)
+        n_found = len(positions)
+        if mask is not None:
+            positions = positions[mask[positions]]
+        page = selection.df.take(positions)
+        gather_ms = (time.perf_counter() - started) * 1000
+        st.dataframe(page, use_container_width=True)
+        notes = [f'{len(positions):,} of {len(ids):,} ids in the filtered rows']
+        if n_found > len(positions):
+            notes.append(f'{n_found - len(positions):,} excluded by the filters')
+        if invalid:
+            notes.append(f'ignored {", ".join(invalid)}')
+        st.caption(f'{"; ".join(notes)}, found in {gather_ms:,.1f} ms')
+        return
+    
+    n_rows = len(selection)
+    n_pages = max(1, -(-n_rows // page_size))
+    # Keyed by filter state, order and page size, so any change goes back to the first page
+    page_number = st.number_input(f'Page (of {n_pages:,})', min_value=1, max_value=n_pages, value=1,
+                                  key=f'explorer_page_{selection.spec.fingerprint()}_{sort_column}_{descending}_{page_size}')
+    start = (page_number - 1) * page_size
+    stop = min(start + page_size, n_rows)
+    if sort_column == FILE_ORDER:
+        positions = paging.file_order_rows(selection.rows, n_rows, start, stop)
+    else:
+        positions = load_sort_index(sort_column).rows(start, stop, mask, descending)
+    page = selection.df.take(positions)
+    gather_ms = (time.perf_counter() - started) * 1000
+    st.dataframe(page, use_container_width=True)
+    order = '' if sort_column == FILE_ORDER else f', by {sort_column} {"descending" if descending else "ascending"}'
+    st.caption(f'Rows {start + 1 if n_rows else 0:,}–{stop:,} of {n_rows:,}{order}, '
+               f'served in {gather_ms:,.1f} ms')
+
+def render_data_explorer(selection, view):
+    """Data Explorer tab: sample rows, download and correlation matrix"""
+    import plotly.express as px
+    
+    st.header('📋 Data Explorer')
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f'**Rows:** {len(selection):,}')
+        st.write(f'**Columns:** {len(selection.columns)}')
+    with col2:
+        for split, count in view.group_by('DataMajor')['policies'].astype(int).items():
+            pct = count / len(selection) * 100
+            st.write(f'**{split}:** {count:,} ({pct:.1f}%)')
+    
+    st.markdown('---')
+    
+    # Browse: one page of the filtered rows, sorted and searched server-side
+    st.subheader('Browse Rows')
+    if selection.in_memory:
+        show_row_pages(selection)
+    else:
+        st.info('Sorting, paging and IDpol search need the in-memory or parallel execution mode; '
+                'showing the first 100 filtered rows.')
+        st.dataframe(selection.head(100), use_container_width=True)
+    
+    # Download: serialized only on request, streamed in chunks and cached per filter state
+    st.subheader('Download')
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        all_columns = dataset_columns()
+        export_columns = st.multiselect('Columns to export', all_columns,
+                                        default=[col for col in all_columns if not columnar.is_design_column(col)])
+    with col2:
+        export_format = st.radio('Format', export.available_formats(), key='data_export_format')
+    
+    if export_columns:
+        def write_data_export(path):
+            # Streamed selections read the blocks from disk themselves
+            source = load_data(tuple(all_columns)) if selection.in_memory else None
+            chunks = with_what_if_chunks(selection, selection.chunks(export_columns, source=source))
+            export.write_chunks(path, chunks, export_format)
+        
+        download_on_demand('Filtered Data', 'data_export',
+                           (selection.spec.fingerprint(), export_columns, what_if_adjustments()), export_format,
+                           'insurance_data', write_data_export)
+    
+    # Correlation matrix
+    st.subheader('Correlation Matrix')
+    # Merged from per-cell cross-products of the view's cells (exact, fitted premiums), or
+    # accumulated over the filtered rows when a DrivAge/VehPower range splits the cells
+    cells = summary_cells(view)
+    if cells is not None:
+        corr_matrix = view.cached('correlation', (), lambda: load_summaries().correlation(cells))
+    else:
+        corr_matrix = cached_result('correlation', selection.spec, (), lambda: summaries.block_correlation(
+            selection.chunks(summaries.CORRELATION_COLUMNS)))
+    
+    fig = px.imshow(corr_matrix, text_auto='.2f', aspect='auto',
+                   title='Correlation Matrix', color_continuous_scale='RdBu_r')
+    show_chart(fig)
+
+def render_pivot_table(selection, view):
+    """Pivot Table tab: custom pivots over the filtered policies"""
+    import plotly.express as px
+    
+    st.header('🔄 Pivot Table Explorer')
+    st.markdown('**Create custom pivot tables with calculated metrics**')
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.subheader('📊 Rows')
+        row_dims = st.multiselect('Row Dimensions', PIVOT_DIMENSIONS, default=DEFAULT_PIVOT_ROWS)
+    
+    with col2:
+        st.subheader('📊 Columns (Optional)')
+        col_dims = st.multiselect('Column Dimensions',
+                                  [dim for dim in PIVOT_DIMENSIONS if dim not in row_dims])
+    
+    with col3:
+        st.subheader('📈 Metrics')
+        metrics_list = list(pivot.PIVOT_METRICS)
+        selected_metrics = st.multiselect('Select Metrics', metrics_list, 
+                                        default=DEFAULT_PIVOT_METRICS)
+        show_margins = st.checkbox('Show subtotals and totals')
+    
+    st.markdown('---')
+    
+    if row_dims and selected_metrics:
+        with st.spinner('Creating pivot table...'):
+            # Group sums of the filtered policies come from the cube
+            with rerun_stage('pivot'):
+                pivot_result = cached_pivot(view, row_dims, col_dims, selected_metrics, show_margins,
+                                            selection.spec)
+        
+            if not col_dims:
+                pivot_result = pivot_result.reset_index()
+            
+                # Format values
+                display_df = pivot_result.copy()
+                for metric in selected_metrics:
+                    display_df[metric] = pivot_result[metric].apply(
+                        lambda x: format_pivot_value(x, metric)
+                    )
+            
+                st.subheader('📊 Pivot Table Results')
+                st.dataframe(display_df, use_container_width=True, height=400)
+            
+                # Download
+                download_on_demand('Pivot Table', 'pivot_export',
+                                   (selection.spec.fingerprint(), what_if_adjustments(), row_dims, col_dims,
+                                    selected_metrics, show_margins),
+                                   'CSV', 'pivot_table',
+                                   lambda path: export.write_export(path, pivot_result))
+            
+                # Visualization of the groups (without subtotal rows)
+                viz_metric = st.selectbox('Visualize Metric:', selected_metrics)
+                is_margin = (pivot_result[row_dims] == pivot.MARGIN_LABEL).any(axis=1)
+                chart_df = pivot_result[~is_margin].copy()
+                group_label = ' / '.join(row_dims)
+                chart_df[group_label] = chart_df[row_dims].astype(str).agg(' / '.join, axis=1)
+            
+                col1, col2 = st.columns(2)
+            
+                with col1:
+                    top_20 = chart_df.sort_values(viz_metric, ascending=False).head(20)
+                    fig = px.bar(top_20, x=group_label, y=viz_metric,
+                               title=f'{viz_metric} by {group_label}',
+                               color=viz_metric)
+                    show_chart(fig)
+            
+                with col2:
+                    top_10 = chart_df.sort_values(viz_metric, ascending=False).head(10)
+                    fig = px.pie(top_10, values=viz_metric, names=group_label,
+                               title=f'Top 10: {viz_metric} Distribution')
+                    show_chart(fig)
+            else:
+                # Pivot with column dimensions: one table and heatmap per metric
+                row_label = ' / '.join(row_dims)
+                col_label = ' / '.join(col_dims)
+                for metric in selected_metrics:
+                    st.subheader(f'📊 {metric}')
+                    pivot_table = pivot_result[metric]
+                    st.dataframe(pivot_table, use_container_width=True)
+                
+                    heatmap = pivot_table.copy()
+                    heatmap.index = [' / '.join(map(str, np.atleast_1d(key))) for key in heatmap.index]
+                    heatmap.columns = [' / '.join(map(str, np.atleast_1d(key))) for key in heatmap.columns]
+                    fig = px.imshow(heatmap, 
+                                  title=f'{metric}: {row_label} × {col_label}',
+                                  color_continuous_scale='RdYlGn', aspect='auto')
+                    show_chart(fig)
+    else:
+        st.info('👆 Select at least one row dimension and one metric to create a pivot table.')
+
+# Tab label -> render function, in display order
+TABS = {
+    '📊 Overview': render_overview,
+    '🎯 GLM Predictions': render_glm_predictions,
+    '📈 Claims Analysis': render_claims_analysis,
+    '🚗 Vehicle Features': render_vehicle_features,
+    '👥 Driver Demographics': render_driver_demographics,
+    '📐 One-Way Analysis': render_one_way,
+    '✅ Model Validation': render_model_validation,
+    '📋 Data Explorer': render_data_explorer,
+    '🔄 Pivot Table': render_pivot_table,
+}
+
+def show_diagnostics(rerun):
+    """Sidebar panel with the stages, figure payloads, cache activity and profile of this rerun"""
+    with st.sidebar.expander('🩺 Diagnostics'):
+        st.caption(f'Rerun {rerun.total_ms:,.0f} ms, '
+                   f'{sum(figure["bytes"] for figure in rerun.figures) / 1024:,.0f} KB of figures')
+        first_render_ms = st.session_state.get('first_render_ms')
+        if first_render_ms is not None:
+            st.caption(f'Time to first render of this session: {first_render_ms:,.0f} ms')
+        st.dataframe(rerun.stage_frame(), hide_index=True, use_container_width=True)
+        if rerun.figures:
+            st.dataframe(rerun.figure_frame(), hide_index=True, use_container_width=True)
+        if rerun.cache:
+            st.dataframe(rerun.cache_frame(), hide_index=True, use_container_width=True)
+        if rerun.profiling:
+            st.markdown('**Profile** (cumulative time)')
+            st.dataframe(rerun.profile_frame(), hide_index=True, use_container_width=True)
+        else:
+            st.caption(f'Add ?{diagnostics.PROFILE_PARAM}=1 to the URL to profile reruns')
+        if diagnostics.LOG_PATH:
+            st.caption(f'Logged to {diagnostics.LOG_PATH}')
+
+# Cold start: indexes are mapped from the snapshot; from the first script run of
+# the process, the default view's results are computed in the background
+def default_filter_spec():
+    """Filter state of an untouched sidebar (every value, full slider ranges)"""
+    return FilterSpec.from_sidebar('All', ['All'], ['All'], ['All'],
+                                   (cube.BANDS['DrivAge'][0], cube.BAND_END),
+                                   (cube.BANDS['VehPower'][0], cube.BAND_END))
+
+def warm_default_view(data_cube, result_cache, version):
+    """Fill the result cache with the totals, group-bys and pivot every tab asks of the default view"""
+    spec = default_filter_spec()
+    view = CachedView(data_cube.query(spec), result_cache, (version, spec.fingerprint(), ()))
+    view.totals()
+    for dim in cube.DIMENSIONS:
+        view.group_by(dim)
+    cached_pivot(view, DEFAULT_PIVOT_ROWS, [], DEFAULT_PIVOT_METRICS, False)
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up(_data_cube, _result_cache, version):
+    """Warm the default view once per process in a daemon thread (and prefetch the store's pages)"""
+    def warm_up():
+        # A shared store already lives in memory
+        if not shared_data.SHARED_ROOT:
+            try:
+                columnar.prefetch(columnar.open_store(find_data_dir(), build=False))
+            except OSError:
+                pass
+        warm_default_view(_data_cube, _result_cache, version)
+    thread = threading.Thread(target=warm_up, name='dashboard-warm-up', daemon=True)
+    thread.start()
+    return thread
+
 # Main app
 def main():
+    # Diagnostics: every stage of this rerun is timed and logged; ?profile=1 adds cProfile
+    session_id = st.session_state.setdefault('diagnostics_session', uuid.uuid4().hex)
+    rerun = diagnostics.Rerun(session_id, profile=st.query_params.get(diagnostics.PROFILE_PARAM) == '1')
+    st.session_state['diagnostics'] = rerun
+    
+    # Shared data: a newly published dataset is picked up by dropping this process's cached resources
+    if shared_data.SHARED_ROOT and shared_data.current_version() not in (None, load_dataset_version()):
+        release_cached_resources()
+    
     st.title('🚗 French Motor Insurance GLM Analysis Dashboard')
     st.markdown('**Analyze GLM pure premium predictions for French motor insurance policies**')
     
-    # Load data
-    with st.spinner('Loading data...'):
-        df = load_data()
-        metrics = calculate_metrics(df)
+    # Load data. In chunked mode (DASHBOARD_EXECUTION=chunked) only the cube is held in
+    # memory and rows are streamed from disk per query; in parallel mode filters scan
+    # row shards in a worker pool instead of using the bitmap index
+    chunked_mode = EXECUTION_MODE == 'chunked'
+    parallel_mode = EXECUTION_MODE == 'parallel'
+    with st.spinner('Loading data...'), rerun_stage('load'):
+        if chunked_mode:
+            source = load_block_source()
+            data_cube = load_chunked_cube()
+            n_total = len(source)
+        else:
+            df = load_data()
+            data_cube = load_cube()
+            if parallel_mode:
+                executor = load_executor()
+            else:
+                filter_index = load_filter_index()
+            n_total = len(df)
+    # Streamlit runs no app code before the first session connects: the process's
+    # first script run starts the warm-up as soon as the cube is loaded
+    start_warm_up(data_cube, load_result_cache(), load_dataset_version())
+    
+    if chunked_mode:
+        st.sidebar.info(f'🧱 Chunked execution: streaming {source.block_rows:,}-row blocks from disk')
+    else:
+        show_memory_budget(df)
+    if parallel_mode:
+        st.sidebar.info(f'🧵 Parallel execution: {executor.workers} {executor.kind} workers')
     
     # Sidebar filters
     st.sidebar.header('📊 Data Filters')
     
+    # Filter options come from the cube: the values present in the data
+    full_view = data_cube.query(FilterSpec())
+    
     # Data split filter
-    data_splits = ['All'] + sorted(df['DataMajor'].unique().tolist())
+    data_splits = ['All'] + sorted(full_view.group_by('DataMajor').index.tolist())
     selected_split = st.sidebar.selectbox('Data Split', data_splits)
     
     # Region filter
-    regions = ['All'] + sorted(df['Region'].unique().tolist())
+    regions = ['All'] + sorted(full_view.group_by('Region').index.tolist())
     selected_region = st.sidebar.multiselect('Region', regions, default=['All'])
     
     # Area filter
-    areas = ['All'] + sorted(df['Area'].unique().tolist())
+    areas = ['All'] + sorted(full_view.group_by('Area').index.tolist())
     selected_area = st.sidebar.multiselect('Area', areas, default=['All'])
     
     # Vehicle Brand filter
-    brands = ['All'] + sorted(df['VehBrand'].unique().tolist())
+    brands = ['All'] + sorted(full_view.group_by('VehBrand').index.tolist())
     selected_brand = st.sidebar.multiselect('Vehicle Brand', brands, default=['All'])
     
     # Age range filter
-    min_age, max_age = int(df['DrivAge'].min()), int(df['DrivAge'].max())
+    min_age, max_age = load_value_range('DrivAge')
     age_range = st.sidebar.slider('Driver Age Range', min_age, max_age, (min_age, max_age))
+    age_range = slider_range('DrivAge', age_range, (min_age, max_age))
     
     # Vehicle Power filter
-    min_power, max_power = int(df['VehPower'].min()), int(df['VehPower'].max())
+    min_power, max_power = load_value_range('VehPower')
     power_range = st.sidebar.slider('Vehicle Power Range', min_power, max_power, (min_power, max_power))
+    power_range = slider_range('VehPower', power_range, (min_power, max_power))
     
-    # Apply filters
-    filtered_df = df.copy()
+    # Apply filters: one bitwise pass over the index; tabs gather the columns they need.
+    # Ranges lining up with the cube's bands are answered from its cells; a range
+    # splitting a band is answered from a cube of the selected rows
+    filter_spec = FilterSpec.from_sidebar(selected_split, selected_region, selected_area,
+                                          selected_brand, age_range, power_range)
+    banded = data_cube.covers(filter_spec)
+    with rerun_stage('filter'):
+        if chunked_mode:
+            if banded:
+                n_selected = int(data_cube.query(filter_spec).totals()['policies'])
+            else:
+                row_cube = load_selection_cube(filter_spec, filter_spec.fingerprint())
+                n_selected = int(row_cube.measures['policies'].sum())
+            selection = chunked.ChunkedSelection(source, filter_spec, n_selected)
+        elif parallel_mode:
+            restricted = filter_spec.categories or filter_spec.ranges
+            selection = Selection(df, executor.select(filter_spec) if restricted else None, filter_spec)
+        else:
+            selection = filter_index.select(filter_spec)
     
-    if selected_split != 'All':
-        filtered_df = filtered_df[filtered_df['DataMajor'] == selected_split]
+    st.sidebar.markdown(f'**Filtered Records:** {len(selection):,} / {n_total:,}')
     
-    if 'All' not in selected_region:
-        filtered_df = filtered_df[filtered_df['Region'].isin(selected_region)]
+    # What-if rating: scale the GLM relativity of some levels of one factor; premiums,
+    # metrics and pivots are re-scored from the category codes
+    # (not offered in chunked mode, where the scorer's per-row arrays are not kept)
+    adjustments = ()
+    if not chunked_mode:
+        with st.sidebar.expander('🧮 What-if Rating'):
+            factor = st.selectbox('Rating Factor', glm.FACTORS, key='what_if_factor')
+            levels = st.multiselect('Levels', full_view.group_by(factor).index.tolist(), key='what_if_levels')
+            change = st.slider('Relativity Change (%)', -50, 50, 0, key='what_if_change')
+            adjustments = glm.normalize_adjustments({factor: {level: 1 + change / 100 for level in levels}})
+            if adjustments:
+                st.caption(f'GLM coefficients recovered from the category codes '
+                           f'(max log error {load_glm().model.fit_error:.1e})')
+    st.session_state['what_if_adjustments'] = adjustments
+    if adjustments:
+        with rerun_stage('what-if cube'):
+            data_cube = load_adjusted_cube(adjustments)
     
-    if 'All' not in selected_area:
-        filtered_df = filtered_df[filtered_df['Area'].isin(selected_area)]
+    # Additive statistics of the filtered policies, answered from the cube. In
+    # incremental mode the previous state's aggregates are updated by the changed cells
+    incremental = st.sidebar.toggle('🔁 Incremental aggregates', value=True,
+                                    help='Update the previous filter state\'s sums by the cells that '
+                                         'entered or left the selection instead of re-aggregating')
+    previous = st.session_state.get('incremental_view')
+    with rerun_stage('aggregates'):
+        if not banded:
+            row_cube = load_selection_cube(filter_spec, filter_spec.fingerprint())
+            view = glm.adjust_cube(row_cube, adjustments).query(FilterSpec())
+        elif not incremental:
+            view = data_cube.query(filter_spec)
+        elif previous is not None and previous.cube is data_cube:
+            view = previous.advance(filter_spec)
+        else:
+            view = IncrementalView(data_cube, data_cube.cell_mask(filter_spec), filter_spec)
+    st.session_state['incremental_view'] = view if incremental and banded else None
+    if not banded:
+        st.sidebar.caption(f'Aggregates: {view.cube.n_cells:,} cells of the selected rows '
+                           f'(the age or power range splits a band of the cube)')
+    elif incremental:
+        st.sidebar.caption(f"Aggregates: {view.stats['mode']} update over "
+                           f"{view.stats['changed_cells']:,} of {data_cube.n_cells:,} cells")
     
-    if 'All' not in selected_brand:
-        filtered_df = filtered_df[filtered_df['VehBrand'].isin(selected_brand)]
+    # Views already computed by any session are served from the shared result cache
+    result_cache = load_result_cache()
+    cache_before = result_cache.counters()
+    view = CachedView(view, result_cache, (load_dataset_version(), filter_spec.fingerprint(), adjustments))
     
-    filtered_df = filtered_df[
-        (filtered_df['DrivAge'] >= age_range[0]) &
-        (filtered_df['DrivAge'] <= age_range[1]) &
-        (filtered_df['VehPower'] >= power_range[0]) &
-        (filtered_df['VehPower'] <= power_range[1])
-    ]
+    # Tabs: in lazy mode only the active view is computed, otherwise every tab runs
+    lazy_tabs = st.sidebar.toggle('⚡ Render only the active tab', value=True,
+                                  help='Compute only the selected view on each rerun instead of every tab')
+    tab_timings = st.session_state.setdefault('tab_timings', {})
     
-    st.sidebar.markdown(f'**Filtered Records:** {len(filtered_df):,} / {len(df):,}')
+    if lazy_tabs:
+        active_tab = st.radio('View', list(TABS), horizontal=True, key='active_tab',
+                              label_visibility='collapsed')
+        rendered = [active_tab]
+        with rerun_stage('tabs'), rerun_stage(active_tab) as record:
+            TABS[active_tab](selection, view)
+        tab_timings[active_tab] = record['ms'] / 1000
+    else:
+        rendered = list(TABS)
+        with rerun_stage('tabs'):
+            for tab, label in zip(st.tabs(list(TABS)), TABS):
+                with tab, rerun_stage(label) as record:
+                    TABS[label](selection, view)
+                tab_timings[label] = record['ms'] / 1000
     
-    # Create tabs
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
-        '📊 Overview',
-        '🎯 GLM Predictions',
-        '📈 Claims Analysis',
-        '🚗 Vehicle Features',
-        '👥 Driver Demographics',
-        '📋 Data Explorer',
-        '🔄 Pivot Table'
-    ])
+    # Time to first render: the session's first rerun up to its rendered tabs, with the
+    # server process's uptime (for the first session of a fresh replica, its cold start)
+    if 'first_render_ms' not in st.session_state:
+        st.session_state['first_render_ms'] = rerun.elapsed_ms()
+        rerun.context['ttfr_ms'] = st.session_state['first_render_ms']
+        rerun.context['process_uptime_s'] = diagnostics.process_uptime()
     
-    # Tab 1: Overview
-    with tab1:
-        st.header('📊 Dataset Overview')
-        
-        # Key metrics
-        col1, col2, col3, col4, col5 = st.columns(5)
-        
-        with col1:
-            st.metric('Total Policies', f"{len(filtered_df):,}")
-        
-        with col2:
-            st.metric('Total Claims', f"{int(filtered_df['ClaimNb'].sum()):,}")
-        
-        with col3:
-            total_exposure = filtered_df['Exposure'].sum()
-            st.metric('Total Exposure', f"{total_exposure:,.2f}")
-        
-        with col4:
-            claim_freq = filtered_df['ClaimNb'].sum() / total_exposure if total_exposure > 0 else 0
-            st.metric('Claim Frequency', f"{claim_freq:.4f}")
-        
-        with col5:
-            avg_premium = filtered_df['Pred_GLMs'].mean()
-            st.metric('Avg Predicted Premium', f"€{avg_premium:,.2f}")
-        
-        st.markdown('---')
-        
-        # Charts
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader('Data Split Distribution')
-            split_counts = filtered_df['DataMajor'].value_counts()
-            fig = px.pie(values=split_counts.values, names=split_counts.index, 
-                        title='Train/Valid/Test Split')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader('Claims Distribution')
-            claim_dist = filtered_df['ClaimNb'].value_counts().sort_index()
-            fig = px.bar(x=claim_dist.index, y=claim_dist.values,
-                        labels={'x': 'Number of Claims', 'y': 'Count'})
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Regional analysis
-        st.subheader('Top 10 Regions by Policy Count')
-        region_stats = filtered_df.groupby('Region').agg({
-            'IDpol': 'count',
-            'Pred_GLMs': 'mean'
-        }).reset_index()
-        region_stats.columns = ['Region', 'Policies', 'Avg Premium']
-        region_stats = region_stats.sort_values('Policies', ascending=False).head(10)
-        
-        fig = px.bar(region_stats, x='Region', y='Policies', color='Avg Premium',
-                    color_continuous_scale='Blues')
-        st.plotly_chart(fig, use_container_width=True)
+    with st.sidebar.expander('⏱️ Tab Timings'):
+        for label, seconds in tab_timings.items():
+            marker = '' if label in rendered else ' (not run this time)'
+            st.write(f'**{label}:** {seconds * 1000:,.0f} ms{marker}')
     
-    # Tab 2: GLM Predictions
-    with tab2:
-        st.header('🎯 GLM Model Predictions Analysis')
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric('Mean Premium', f"€{filtered_df['Pred_GLMs'].mean():,.2f}")
-        with col2:
-            st.metric('Median Premium', f"€{filtered_df['Pred_GLMs'].median():,.2f}")
-        with col3:
-            st.metric('Std Premium', f"€{filtered_df['Pred_GLMs'].std():,.2f}")
-        with col4:
-            st.metric('Max Premium', f"€{filtered_df['Pred_GLMs'].max():,.2f}")
-        
-        st.markdown('---')
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader('Distribution of Predicted Premiums')
-            fig = px.histogram(filtered_df, x='Pred_GLMs', nbins=50,
-                             labels={'Pred_GLMs': 'Predicted Premium (€)'})
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader('Premium by Data Split')
-            fig = px.box(filtered_df, x='DataMajor', y='Pred_GLMs', color='DataMajor',
-                        labels={'Pred_GLMs': 'Predicted Premium (€)'})
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Actual vs Predicted
-        st.subheader('Actual vs Predicted Pure Premium')
-        comparison_df = filtered_df[filtered_df['PurePremium'] > 0].copy()
-        
-        if len(comparison_df) > 0:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                sample_size = min(10000, len(comparison_df))
-                sample_df = comparison_df.sample(n=sample_size, random_state=42)
-                
-                fig = px.scatter(sample_df, x='PurePremium', y='Pred_GLMs',
-                               title=f'Actual vs Predicted (Sample of {sample_size:,})',
-                               opacity=0.5)
-                max_val = max(sample_df['PurePremium'].max(), sample_df['Pred_GLMs'].max())
-                fig.add_trace(go.Scatter(x=[0, max_val], y=[0, max_val],
-                                       mode='lines', name='Perfect Prediction',
-                                       line=dict(color='red', dash='dash')))
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                comparison_df['Residual_Pct'] = ((comparison_df['PurePremium'] - comparison_df['Pred_GLMs']) 
-                                                / comparison_df['PurePremium']) * 100
-                fig = px.histogram(comparison_df, x='Residual_Pct', nbins=50,
-                                 title='Prediction Errors (%)')
-                st.plotly_chart(fig, use_container_width=True)
-    
-    # Tab 3: Claims Analysis
-    with tab3:
-        st.header('📈 Claims Analysis')
-        
-        col1, col2, col3, col4 = st.columns(4)
-        total_claims = filtered_df['ClaimNb'].sum()
-        policies_with_claims = (filtered_df['ClaimNb'] > 0).sum()
-        total_claim_amount = filtered_df['ClaimAmount'].sum()
-        avg_claim_amount = filtered_df[filtered_df['ClaimAmount'] > 0]['ClaimAmount'].mean() if (filtered_df['ClaimAmount'] > 0).any() else 0
-        
-        with col1:
-            st.metric('Total Claims', f"{int(total_claims):,}")
-        with col2:
-            st.metric('Policies with Claims', f"{policies_with_claims:,}")
-        with col3:
-            st.metric('Total Claim Amount', f"€{total_claim_amount:,.2f}")
-        with col4:
-            st.metric('Avg Claim Severity', f"€{avg_claim_amount:,.2f}")
-        
-        st.markdown('---')
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader('Claim Frequency by Region')
-            freq_by_region = filtered_df.groupby('Region').agg({
-                'ClaimNb': 'sum', 'Exposure': 'sum'
-            }).reset_index()
-            freq_by_region['Frequency'] = freq_by_region['ClaimNb'] / freq_by_region['Exposure']
-            freq_by_region = freq_by_region.sort_values('Frequency', ascending=False).head(10)
-            
-            fig = px.bar(freq_by_region, x='Region', y='Frequency', color='Frequency',
-                        color_continuous_scale='Reds')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader('Claim Frequency by Area')
-            freq_by_area = filtered_df.groupby('Area').agg({
-                'ClaimNb': 'sum', 'Exposure': 'sum'
-            }).reset_index()
-            freq_by_area['Frequency'] = freq_by_area['ClaimNb'] / freq_by_area['Exposure']
-            
-            fig = px.bar(freq_by_area, x='Area', y='Frequency', color='Frequency',
-                        color_continuous_scale='Oranges')
-            st.plotly_chart(fig, use_container_width=True)
+    with st.sidebar.expander('🗃️ Result Cache'):
+        st.caption(f'{len(result_cache):,} entries, {result_cache.nbytes / 1e6:,.1f} / '
+                   f'{result_cache.max_bytes / 1e6:,.0f} MB')
+        st.dataframe(result_cache.stats(), hide_index=True, use_container_width=True)
     
-    # Tab 4: Vehicle Features
-    with tab4:
-        st.header('🚗 Vehicle Features Analysis')
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric('Vehicle Brands', filtered_df['VehBrand'].nunique())
-        with col2:
-            diesel_pct = (filtered_df['VehGas'] == 'Diesel').sum() / len(filtered_df) * 100
-            st.metric('Diesel Vehicles', f"{diesel_pct:.1f}%")
-        with col3:
-            st.metric('Avg Vehicle Age', f"{filtered_df['VehAge'].mean():.1f} years")
-        
-        st.markdown('---')
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader('Top 10 Vehicle Brands')
-            brand_counts = filtered_df['VehBrand'].value_counts().head(10)
-            fig = px.bar(x=brand_counts.values, y=brand_counts.index, orientation='h')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader('Fuel Type Distribution')
-            fuel_counts = filtered_df['VehGas'].value_counts()
-            fig = px.pie(values=fuel_counts.values, names=fuel_counts.index)
-            st.plotly_chart(fig, use_container_width=True)
-    
-    # Tab 5: Driver Demographics
-    with tab5:
-        st.header('👥 Driver Demographics Analysis')
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric('Avg Driver Age', f"{filtered_df['DrivAge'].mean():.1f} years")
-        with col2:
-            st.metric('Min Driver Age', f"{filtered_df['DrivAge'].min()} years")
-        with col3:
-            st.metric('Max Driver Age', f"{filtered_df['DrivAge'].max()} years")
-        with col4:
-            st.metric('Avg Bonus-Malus', f"{filtered_df['BonusMalus'].mean():.1f}")
-        
-        st.markdown('---')
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            fig = px.histogram(filtered_df, x='DrivAge', nbins=50,
-                             title='Distribution of Driver Age')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            age_groups = pd.cut(filtered_df['DrivAge'], 
-                              bins=[0, 25, 35, 45, 55, 65, 100],
-                              labels=['<25', '25-35', '35-45', '45-55', '55-65', '65+'])
-            age_group_stats = filtered_df.copy()
-            age_group_stats['AgeGroup'] = age_groups
-            
-            group_summary = age_group_stats.groupby('AgeGroup')['Pred_GLMs'].mean().reset_index()
-            fig = px.bar(group_summary, x='AgeGroup', y='Pred_GLMs', 
-                        title='Average Premium by Age Group',
-                        color='Pred_GLMs', color_continuous_scale='Viridis')
-            st.plotly_chart(fig, use_container_width=True)
-    
-    # Tab 6: Data Explorer
-    with tab6:
-        st.header('📋 Data Explorer')
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.write(f'**Rows:** {len(filtered_df):,}')
-            st.write(f'**Columns:** {len(filtered_df.columns)}')
-        with col2:
-            for split, count in filtered_df['DataMajor'].value_counts().items():
-                pct = count / len(filtered_df) * 100
-                st.write(f'**{split}:** {count:,} ({pct:.1f}%)')
-        
-        st.markdown('---')
-        
-        # Display sample data
-        st.subheader('Data Sample')
-        st.dataframe(filtered_df.head(100), use_container_width=True)
-        
-        # Download button
-        csv = filtered_df.to_csv(index=False)
-        st.download_button('📥 Download Filtered Data', csv, 'insurance_data.csv', 'text/csv')
-        
-        # Correlation matrix
-        st.subheader('Correlation Matrix')
-        corr_cols = ['VehPower', 'VehAge', 'DrivAge', 'BonusMalus', 'Density', 'ClaimNb', 'Pred_GLMs']
-        corr_cols = [col for col in corr_cols if col in filtered_df.columns]
-        corr_matrix = filtered_df[corr_cols].corr()
-        
-        fig = px.imshow(corr_matrix, text_auto='.2f', aspect='auto',
-                       title='Correlation Matrix', color_continuous_scale='RdBu_r')
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # Tab 7: Pivot Table Explorer
-    with tab7:
-        st.header('🔄 Pivot Table Explorer')
-        st.markdown('**Create custom pivot tables with calculated metrics**')
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.subheader('📊 Rows')
-            row_dim = st.selectbox('Row Dimension', 
-                                  ['Area', 'Region', 'VehBrand', 'VehGas', 'DataMajor'])
-        
-        with col2:
-            st.subheader('📊 Columns (Optional)')
-            col_dim = st.selectbox('Column Dimension', 
-                                  ['None', 'Area', 'VehGas', 'DataMajor'])
-        
-        with col3:
-            st.subheader('📈 Metrics')
-            metrics_list = ['Frequency', 'AvgPremium', 'PolicyCount', 'TotalClaims', 'ClaimRate']
-            selected_metrics = st.multiselect('Select Metrics', metrics_list, 
-                                            default=['Frequency', 'AvgPremium'])
-        
-        st.markdown('---')
-        
-        if row_dim and selected_metrics:
-            with st.spinner('Creating pivot table...'):
-                # Create pivot table
-                if col_dim == 'None':
-                    # Simple aggregation
-                    pivot_result = filtered_df.groupby(row_dim).apply(
-                        lambda x: pd.Series({
-                            metric: calculate_pivot_metric(x, metric) 
-                            for metric in selected_metrics
-                        })
-                    ).reset_index()
-                    
-                    # Format values
-                    for metric in selected_metrics:
-                        pivot_result[f'{metric}_fmt'] = pivot_result[metric].apply(
-                            lambda x: format_pivot_value(x, metric)
-                        )
-                    
-                    st.subheader('📊 Pivot Table Results')
-                    display_cols = [row_dim] + [f'{m}_fmt' for m in selected_metrics]
-                    display_df = pivot_result[display_cols].copy()
-                    display_df.columns = [row_dim] + selected_metrics
-                    st.dataframe(display_df, use_container_width=True, height=400)
-                    
-                    # Download
-                    csv = pivot_result[[row_dim] + selected_metrics].to_csv(index=False)
-                    st.download_button('📥 Download Pivot Table', csv, 'pivot_table.csv', 'text/csv')
-                    
-                    # Visualization
-                    if selected_metrics:
-                        viz_metric = st.selectbox('Visualize Metric:', selected_metrics)
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            top_20 = pivot_result.sort_values(viz_metric, ascending=False).head(20)
-                            fig = px.bar(top_20, x=row_dim, y=viz_metric,
-                                       title=f'{viz_metric} by {row_dim}',
-                                       color=viz_metric)
-                            st.plotly_chart(fig, use_container_width=True)
-                        
-                        with col2:
-                            top_10 = pivot_result.sort_values(viz_metric, ascending=False).head(10)
-                            fig = px.pie(top_10, values=viz_metric, names=row_dim,
-                                       title=f'Top 10: {viz_metric} Distribution')
-                            st.plotly_chart(fig, use_container_width=True)
-                else:
-                    # 2D pivot
-                    pivot_result = filtered_df.groupby([row_dim, col_dim]).apply(
-                        lambda x: pd.Series({
-                            metric: calculate_pivot_metric(x, metric)
-                            for metric in selected_metrics
-                        })
-                    ).reset_index()
-                    
-                    for metric in selected_metrics:
-                        st.subheader(f'📊 {metric}')
-                        pivot_table = pivot_result.pivot(index=row_dim, columns=col_dim, 
-                                                        values=metric).fillna(0)
-                        st.dataframe(pivot_table, use_container_width=True)
-                        
-                        fig = px.imshow(pivot_table, 
-                                      title=f'{metric}: {row_dim} × {col_dim}',
-                                      color_continuous_scale='RdYlGn', aspect='auto')
-                        st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info('👆 Select row dimension and at least one metric to create a pivot table.')
+    rerun.context.update({
+        'execution_mode': EXECUTION_MODE,
+        'filter': filter_spec.fingerprint(),
+        'rows_selected': len(selection),
+        'tabs': rendered,
+        'what_if': adjustments,
+    })
+    rerun.finish(cache_before, result_cache.counters())
+    show_diagnostics(rerun)
+    rerun.write_log()
 
 if __name__ == '__main__':
     main()
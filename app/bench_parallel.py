@@ -0,0 +1,105 @@
+"""
+Parallel aggregation benchmark: cube build, filter, pivot, value counts and
+histogram over row shards at 1/2/4/8 workers, on the dataset and on an
+upscaled copy
+
+Speedups are relative to one worker of the first pool, so run it on a
+machine with at least as many cores as the largest worker count; the core
+count is printed and written with the results (--out) for comparison.
+
+Usage:
+    python bench_parallel.py [--data-dir DIR] [--scale 1 10] [--workers 1 2 4 8] [--pool thread process]
+                             [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import columnar
+import cube
+from bench_pivot import best_time
+from filters import FilterSpec
+from parallel import ParallelExecutor
+
+COLUMNS = list(dict.fromkeys(list(cube.DIMENSIONS) + [col for col in cube.MEASURES.values() if col is not None]))
+SPEC = FilterSpec.from_selection({'Area': ['C', 'D', 'E']}, {'DrivAge': (25, 64)})
+
+
+def upscaled_store(store, scale, out_dir):
+    """Columnar store with the benchmarked columns of store repeated scale times"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = dict(store.manifest, n_rows=store.n_rows * scale, column_order=COLUMNS,
+                    columns={col: store.manifest['columns'][col] for col in COLUMNS})
+    for col in COLUMNS:
+        np.save(out_dir / manifest['columns'][col]['file'], np.tile(np.asarray(store.array(col)), scale))
+    with open(out_dir / columnar.MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f)
+    return columnar.ColumnStore(out_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--data-dir', type=Path, default=Path(__file__).resolve().parent)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--pool', nargs='+', default=['thread', 'process'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', type=Path, help='write the timings as JSON to this file')
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    print(f'{cores} cores')
+    if max(args.workers) > cores:
+        print(f'Warning: more workers than cores; speedups past {cores} workers only measure contention')
+    results = {'cores': cores, 'runs': []}
+
+    store = columnar.open_store(args.data_dir)
+    tmp_dir = Path(tempfile.mkdtemp(prefix='bench_parallel-'))
+    try:
+        for scale in args.scale:
+            scaled = store if scale == 1 else upscaled_store(store, scale, tmp_dir / f'x{scale}')
+            df = scaled.frame(COLUMNS)
+            print(f'\n{len(df):,} rows (x{scale})')
+            print(f'{"pool":<8} {"workers":>7} {"cube ms":>9} {"filter ms":>10} {"pivot ms":>9} '
+                  f'{"counts ms":>10} {"hist ms":>8} {"speedup":>8}')
+            baseline = None
+            for kind in args.pool:
+                for workers in args.workers:
+                    executor = ParallelExecutor(df, workers, kind, store_path=scaled.path)
+                    try:
+                        executor.select(SPEC)    # start the workers before timing
+                        cube_time, _ = best_time(executor.build_cube, args.repeat)
+                        filter_time, _ = best_time(lambda: executor.select(SPEC), args.repeat)
+                        pivot_time, _ = best_time(
+                            lambda: executor.pivot(SPEC, ['Region', 'VehBrand'], ['DataMajor']), args.repeat)
+                        counts_time, _ = best_time(lambda: executor.bincount(SPEC, 'DrivAge'), args.repeat)
+                        hist_time, _ = best_time(lambda: executor.binned(SPEC, 'Pred_GLMs', 50), args.repeat)
+                    finally:
+                        executor.close()
+                    total = cube_time + filter_time + pivot_time + counts_time + hist_time
+                    baseline = baseline or total
+                    print(f'{kind:<8} {workers:>7} {cube_time * 1000:>9.1f} {filter_time * 1000:>10.1f} '
+                          f'{pivot_time * 1000:>9.1f} {counts_time * 1000:>10.1f} {hist_time * 1000:>8.1f} '
+                          f'{baseline / total:>7.2f}x')
+                    results['runs'].append({
+                        'rows': len(df), 'pool': kind, 'workers': workers, 'cube_s': cube_time,
+                        'filter_s': filter_time, 'pivot_s': pivot_time, 'counts_s': counts_time,
+                        'histogram_s': hist_time, 'speedup': baseline / total,
+                    })
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nWrote {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Headless benchmark of the dashboard's hot paths
+
+Times each stage the dashboard runs on a rerun, without a browser: loading
+(NPZ decode, store conversion, memory-mapped open), building the cube and the
+filter index, filtering, metrics, pivots and chart construction. Each stage
+records its best wall-clock time and its peak traced allocation. Runs on the
+dataset next to the script, or on synthetic books generated at the requested
+sizes, and writes machine-readable JSON so runs can be compared. With several
+sizes it ends with the cube's cell count, the memory of the cube and of its
+per-cell summaries, and the query latencies per size: the cells are bounded
+by the dimension cardinalities, so memory and latencies level off while the
+row scans grow with the book.
+
+Usage:
+    python benchmark.py [--data-dir DIR | --rows 100000 1000000 ...] [--repeat N] [--out results.json]
+"""
+
+import argparse
+import json
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import charts
+import columnar
+import cube
+import pivot
+import summaries
+import synthetic_data
+from filter_index import FilterIndex
+from filters import FilterSpec
+
+SPECS = {
+    'all': FilterSpec(),
+    'one_region': FilterSpec.from_selection({'Region': ['R24']}),
+    'mixed': FilterSpec.from_selection({'Region': ['R11', 'R24', 'R82'], 'Area': ['C', 'D']},
+                                       {'DrivAge': (26, 65), 'VehPower': (6, 9)}),
+}
+PIVOT_CASES = {
+    'region': (['Region'], []),
+    'region_brand_by_split': (['Region', 'VehBrand'], ['DataMajor']),
+}
+
+
+def measure(fn, repeat):
+    """Best time of fn over repeat runs, the peak traced bytes of one run, and its result"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def legacy_metrics(df):
+    """Row-scan version of the dashboard metrics (the former calculate_metrics)"""
+    return {
+        'total_policies': len(df),
+        'total_claims': df['ClaimNb'].sum(),
+        'total_exposure': df['Exposure'].sum(),
+        'avg_predicted_premium': df['Pred_GLMs'].mean(),
+        'avg_claim_severity': df.loc[df['ClaimAmount'] > 0, 'ClaimAmount'].mean(),
+    }
+
+
+def run(data_dir, repeat):
+    """Stage results for the dataset in data_dir"""
+    stages = []
+
+    def stage(name, fn, n=repeat):
+        seconds, peak, result = measure(fn, n)
+        stages.append({'stage': name, 'seconds': seconds, 'peak_bytes': peak})
+        print(f'  {name:<40} {seconds * 1000:>10.1f} ms {peak / 1e6:>10.1f} MB')
+        return result
+
+    metadata = columnar.read_json(Path(data_dir) / columnar.METADATA_FILE)
+    columns = [col for col in metadata['columns'] if not columnar.is_design_column(col)]
+
+    # Loading
+    stage('load/npz_decode', lambda: columnar.load_npz_frame(data_dir, columns), 1)
+    stage('load/store_convert', lambda: columnar.convert_npz(data_dir), 1)
+    store = columnar.open_store(data_dir)
+    df = stage('load/store_open', lambda: columnar.ColumnStore(store.path).frame(columns))
+
+    # Derived indexes
+    data_cube = stage('build/cube', lambda: cube.build_cube(df), 1)
+    index = stage('build/filter_index', lambda: FilterIndex(df), 1)
+    cell_summaries = stage('build/summaries', lambda: summaries.build_summaries(data_cube, [df]), 1)
+    sizes = {'cells': data_cube.n_cells, 'cube_bytes': data_cube.nbytes, 'summaries_bytes': cell_summaries.nbytes}
+
+    # Filters: bitmap index against the former mask-and-copy chain
+    for name, spec in SPECS.items():
+        stage(f'filter/{name}/index', lambda: index.select(spec))
+        stage(f'filter/{name}/cube', lambda: data_cube.query(spec))
+        stage(f'filter/{name}/row_copy', lambda: df[spec.row_mask(df)].copy())
+
+    # Metrics
+    spec = SPECS['mixed']
+    selection = index.select(spec)
+    stage('metrics/cube', lambda: cube.summary_metrics(data_cube.query(spec).totals()))
+    stage('metrics/rows', lambda: legacy_metrics(selection.frame()))
+
+    # Pivots
+    view = data_cube.query(spec)
+    for name, (rows, cols) in PIVOT_CASES.items():
+        stage(f'pivot/{name}/cube', lambda: pivot.pivot_table(
+            view.group_by(*(rows + cols), measures=pivot.PIVOT_MEASURES), rows, cols))
+        stage(f'pivot/{name}/rows', lambda: pivot.pivot(selection.frame(), rows, cols))
+
+    # Charts: server-side binning against shipping the rows to Plotly
+    def binned_histogram():
+        fig = charts.histogram_figure(charts.histogram(selection.column('Pred_GLMs').to_numpy()), 'Pred_GLMs')
+        return charts.payload_bytes(fig)
+
+    def raw_histogram():
+        fig = px.histogram(selection.frame(['Pred_GLMs']), x='Pred_GLMs', nbins=50)
+        return charts.payload_bytes(fig)
+
+    binned_bytes = stage('chart/histogram/binned', binned_histogram)
+    raw_bytes = stage('chart/histogram/raw_rows', raw_histogram, 1)
+    stages[-2]['payload_bytes'] = binned_bytes
+    stages[-1]['payload_bytes'] = raw_bytes
+    return len(df), sizes, stages
+
+
+CUBE_STAGES = ('filter/mixed/cube', 'metrics/cube', 'pivot/region_brand_by_split/cube', 'pivot/region_brand_by_split/rows')
+
+
+def print_scaling(runs):
+    """Cube cells, cube and summaries memory and query latencies against the number of rows, one line per run"""
+    print(f'\n{"rows":>12} {"cells":>8} {"cube":>10} {"summaries":>10} '
+          + ' '.join(f'{name:>34}' for name in CUBE_STAGES))
+    for run_result in runs:
+        seconds = {stage['stage']: stage['seconds'] for stage in run_result['stages']}
+        print(f'{run_result["rows"]:>12,} {run_result["cells"]:>8,} {run_result["cube_bytes"] / 1e6:>7.1f} MB '
+              f'{run_result["summaries_bytes"] / 1e6:>7.1f} MB '
+              + ' '.join(f'{seconds[name] * 1000:>31.2f} ms' for name in CUBE_STAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--data-dir', type=Path, help='dataset to benchmark (default: the one next to the script)')
+    parser.add_argument('--rows', type=int, nargs='+', help='benchmark synthetic books of these sizes instead')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', type=Path, help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'runs': [],
+    }
+    tmp_dir = Path(tempfile.mkdtemp(prefix='dashboard-benchmark-'))
+    try:
+        if args.rows:
+            datasets = []
+            for n_rows in args.rows:
+                print(f'Generating {n_rows:,} synthetic rows...')
+                datasets.append(('synthetic', synthetic_data.write_dataset(tmp_dir / str(n_rows), n_rows, args.seed)))
+        else:
+            data_dir = args.data_dir or Path(__file__).resolve().parent
+            # Work on a copy so the store conversion does not touch the served dataset
+            copy_dir = tmp_dir / 'dataset'
+            copy_dir.mkdir()
+            for name in columnar.SOURCE_FILES:
+                shutil.copy(Path(data_dir) / name, copy_dir)
+            datasets = [(str(data_dir), copy_dir)]
+
+        for source, data_dir in datasets:
+            print(f'\n{source}:')
+            n_rows, sizes, stages = run(data_dir, args.repeat)
+            results['runs'].append(dict({'source': source, 'rows': n_rows, 'stages': stages}, **sizes))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if len(results['runs']) > 1:
+        print_scaling(results['runs'])
+    results['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nWrote {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Server-side chart data reduction
+
+Histograms and box plots used to ship every selected row to the browser inside
+the Plotly figure JSON. These helpers reduce the rows with NumPy first (bin
+counts, quartiles, whiskers and a bounded sample of outliers) and build
+pre-aggregated go.Bar / go.Box traces whose size does not depend on the
+number of rows.
+"""
+
+import numpy as np
+import plotly.colors
+import plotly.graph_objects as go
+
+MAX_OUTLIER_POINTS = 200
+DENSITY_BINS = 80
+SCATTER_STRATA = 20
+
+
+def histogram(values, nbins=50, weights=None):
+    """Bin edges and counts of values over nbins equal-width bins
+
+    weights lets pre-aggregated data (e.g. policy counts per DrivAge from the
+    cube) be binned without expanding it back to rows.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[finite]
+    values = values[finite]
+    if len(values) == 0:
+        return {'edges': np.zeros(0), 'counts': np.zeros(0)}
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    counts, edges = np.histogram(values, bins=nbins, range=(low, high), weights=weights)
+    return {'edges': edges, 'counts': counts}
+
+
+def histogram_figure(hist, x_label, title=None):
+    """go.Bar figure of a histogram() result, bars spanning their bins"""
+    edges, counts = hist['edges'], hist['counts']
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2 if len(edges) else [],
+        y=counts,
+        width=np.diff(edges) if len(edges) else None,
+        marker_line_width=0,
+        name='count',
+        hovertemplate=f'{x_label}: %{{x:,.2f}}<br>count: %{{y:,.0f}}<extra></extra>',
+    ))
+    fig.update_layout(title=title, bargap=0, xaxis_title=x_label, yaxis_title='count')
+    return fig
+
+
+def box_stats(values, max_outliers=MAX_OUTLIER_POINTS):
+    """Quartiles, 1.5 IQR whiskers and a bounded sample of outliers of values
+
+    Matches Plotly's default box plot (linear quartiles, whiskers at the most
+    extreme points within 1.5 IQR). When there are more than max_outliers
+    outliers an evenly spaced subset of the sorted outliers is kept, which
+    always includes the most extreme ones.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = np.sort(values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)])
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).round().astype(int)]
+    return {
+        'q1': q1, 'median': median, 'q3': q3, 'mean': values.mean(),
+        'lowerfence': inside.min(), 'upperfence': inside.max(),
+        'outliers': outliers, 'n': len(values),
+    }
+
+
+def sketch_box_stats(summary, max_outliers=MAX_OUTLIER_POINTS):
+    """box_stats() of a sketches.ColumnSummary instead of the values themselves
+
+    Quartiles, whiskers and outliers are bucket values of the quantile
+    sketch, so within its relative accuracy; the extreme points and the mean
+    are exact.
+    """
+    if summary.count == 0:
+        return None
+    sketch = summary.sketch
+    q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    values, counts = sketch.bucket_values()
+    # The extreme buckets hold the exact min and max
+    values[0], values[-1] = sketch.min, sketch.max
+    within = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    inside = values[within] if within.any() else np.array([median])
+    outlier_values, outlier_counts = values[~within], counts[~within]
+    n_outliers = int(outlier_counts.sum())
+    outliers = np.zeros(0)
+    if n_outliers:
+        # Evenly spaced ranks of the sorted outliers, mapped back to their buckets
+        ranks = np.linspace(0, n_outliers - 1, min(n_outliers, max_outliers)).round()
+        outliers = outlier_values[np.searchsorted(np.cumsum(outlier_counts), ranks, 'right')]
+    return {
+        'q1': q1, 'median': median, 'q3': q3, 'mean': summary.mean,
+        'lowerfence': inside.min(), 'upperfence': inside.max(),
+        'outliers': outliers, 'n': summary.count,
+    }
+
+
+def box_figure(stats_by_group, x_label, y_label):
+    """One precomputed go.Box per group plus its sampled outliers, one color per group"""
+    fig = go.Figure()
+    colors = plotly.colors.qualitative.Plotly
+    for i, (group, stats) in enumerate(stats_by_group.items()):
+        if stats is None:
+            continue
+        color = colors[i % len(colors)]
+        fig.add_trace(go.Box(
+            x=[group], q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+            lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']], mean=[stats['mean']],
+            name=str(group), marker_color=color, legendgroup=str(group),
+        ))
+        if len(stats['outliers']):
+            fig.add_trace(go.Scatter(
+                x=[group] * len(stats['outliers']), y=stats['outliers'], mode='markers',
+                marker=dict(color=color, size=4), name=str(group), legendgroup=str(group),
+                showlegend=False,
+            ))
+    fig.update_layout(xaxis_title=x_label, yaxis_title=y_label, legend_title_text=x_label)
+    return fig
+
+
+def density_grid(x, y, nbins=DENSITY_BINS, max_outliers=MAX_OUTLIER_POINTS):
+    """2-D log-spaced bin counts of positive (x, y) pairs and the exact sparse points
+
+    Every pair is binned, not a sample. Points in cells holding a single pair
+    are returned exactly as outliers (the most extreme max_outliers by
+    |log(y / x)|), so the tail stays visible on top of the heatmap.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = (x > 0) & (y > 0) & np.isfinite(x) & np.isfinite(y)
+    log_x, log_y = np.log10(x[keep]), np.log10(y[keep])
+    if len(log_x) == 0:
+        return None
+    low = min(log_x.min(), log_y.min())
+    high = max(log_x.max(), log_y.max())
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, nbins + 1)
+    counts, _, _ = np.histogram2d(log_x, log_y, bins=(edges, edges))
+
+    cell_x = np.clip(np.searchsorted(edges, log_x, side='right') - 1, 0, nbins - 1)
+    cell_y = np.clip(np.searchsorted(edges, log_y, side='right') - 1, 0, nbins - 1)
+    sparse = np.flatnonzero(counts[cell_x, cell_y] == 1)
+    if len(sparse) > max_outliers:
+        distance = np.abs(log_y[sparse] - log_x[sparse])
+        sparse = sparse[np.argsort(distance)[-max_outliers:]]
+    return {
+        'edges': edges, 'counts': counts, 'n': len(log_x),
+        'outlier_x': 10 ** log_x[sparse], 'outlier_y': 10 ** log_y[sparse],
+    }
+
+
+def stratified_sample(values, n, strata=SCATTER_STRATA, seed=42):
+    """Row positions of a sample of about n rows with equal shares per quantile stratum of values
+
+    A uniform sample keeps almost nothing of the upper tail; taking the same
+    number of rows from each quantile band of values keeps it.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) <= n:
+        return np.arange(len(values))
+    rng = np.random.default_rng(seed)
+    order = np.argsort(values, kind='stable')
+    per_stratum = max(n // strata, 1)
+    positions = []
+    for band in np.array_split(order, strata):
+        positions.append(band if len(band) <= per_stratum else rng.choice(band, per_stratum, replace=False))
+    return np.concatenate(positions)
+
+
+def density_figure(grid, x_label, y_label, title=None):
+    """Log-count heatmap of a density_grid() result with its exact outliers and the y = x line"""
+    edges = grid['edges']
+    centers = 10 ** ((edges[:-1] + edges[1:]) / 2)
+    counts = grid['counts'].T
+    with np.errstate(divide='ignore'):
+        log_counts = np.where(counts > 0, np.log10(counts), np.nan)
+    fig = go.Figure(go.Heatmap(
+        x=centers, y=centers, z=log_counts, colorscale='Viridis',
+        colorbar=dict(title='log10 count'), customdata=counts,
+        hovertemplate=f'{x_label}: %{{x:,.0f}}<br>{y_label}: %{{y:,.0f}}<br>'
+                      'policies: %{customdata:,.0f}<extra></extra>',
+    ))
+    fig.add_trace(go.Scatter(
+        x=grid['outlier_x'], y=grid['outlier_y'], mode='markers', name='Sparse points',
+        marker=dict(color='white', size=4, line=dict(color='black', width=0.5)),
+    ))
+    diagonal = [centers[0], centers[-1]]
+    fig.add_trace(go.Scatter(x=diagonal, y=diagonal, mode='lines', name='Perfect Prediction',
+                             line=dict(color='red', dash='dash')))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label)
+    fig.update_xaxes(type='log')
+    fig.update_yaxes(type='log')
+    return fig
+
+
+def scatter_figure(x, y, x_label, y_label, title=None):
+    """Plain scatter with the y = x line, for an already reduced set of points"""
+    fig = go.Figure(go.Scattergl(x=x, y=y, mode='markers', marker=dict(opacity=0.5), name='Policies'))
+    max_val = max(np.max(x), np.max(y)) if len(x) else 1
+    fig.add_trace(go.Scatter(x=[0, max_val], y=[0, max_val], mode='lines', name='Perfect Prediction',
+                             line=dict(color='red', dash='dash')))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label)
+    return fig
+
+
+def one_way_figure(table, factor, lines, y_label, title=None):
+    """Exposure bars (right axis) with one line per metric column of a one-way table (left axis)"""
+    fig = go.Figure(go.Bar(
+        x=table['Level'], y=table['Exposure'], name='Exposure',
+        marker_color='lightgrey', hovertemplate='%{x}<br>exposure: %{y:,.0f}<extra></extra>',
+    ))
+    # The lines sit on the overlaying axis, so they are drawn over the bars
+    for column in lines:
+        fig.add_trace(go.Scatter(x=table['Level'], y=table[column], mode='lines+markers', name=column, yaxis='y2',
+                                 hovertemplate=f'%{{x}}<br>{column}: %{{y:,.4g}}<extra></extra>'))
+    fig.update_layout(
+        title=title, xaxis=dict(title=factor, type='category'),
+        yaxis=dict(title='Exposure', side='right', showgrid=False),
+        yaxis2=dict(title=y_label, side='left', overlaying='y', rangemode='tozero'),
+        legend=dict(orientation='h', y=1.1),
+    )
+    return fig
+
+
+def payload_bytes(fig):
+    """Size of the figure JSON sent to the browser"""
+    return len(fig.to_json())
@@ -0,0 +1,265 @@
+"""
+Out-of-core chunked execution
+
+For books too large to hold as one frame, BlockSource streams row blocks
+straight from disk: slices of the memory-mapped columnar store, or, when
+there is no store, the NPZ matrices decompressed member by member without
+ever inflating a whole matrix. Everything the dashboard needs is merged from
+per-block partials:
+
+- the aggregation cube (partial cells of each block, merged by cell key),
+  which answers every count, sum and group-by of the tabs;
+- ChunkedSelection, a drop-in for filter_index.Selection that applies the
+  sidebar filters block by block and gathers only the filtered values of the
+  columns a chart asks for;
+- per-column summaries (count, mean, std, min, max and a QuantileSketch) for
+  the median and quartiles, histograms binned block by block on shared
+  edges, and uniform samples for scatter plots, none of which hold the
+  filtered rows at once.
+
+Peak memory is one block of the requested columns plus the merged partials,
+whose size depends on the cardinality of the dimensions, not on the number
+of policies.
+"""
+
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import cube
+from sketches import ColumnSummary
+
+BLOCK_ROWS = 200_000
+# Decompress NPZ members in pieces of this size (zipfile copies whatever it is asked for)
+READ_BYTES = 4 * 1024 ** 2
+
+
+@contextmanager
+def _npz_member(path):
+    """Open the single array of an NPZ file for streaming: yields (file object, shape, dtype)"""
+    with zipfile.ZipFile(path) as archive, archive.open(archive.namelist()[0]) as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+        if fortran_order:
+            raise ValueError(f'{path} stores a Fortran-ordered array, which cannot be streamed by rows')
+        yield member, shape, dtype
+
+
+def _read_rows(member, n_rows, shape, dtype):
+    n_bytes = n_rows * shape[1] * dtype.itemsize
+    buffer = bytearray(n_bytes)
+    view = memoryview(buffer)
+    read = 0
+    while read < n_bytes:
+        chunk = member.readinto(view[read:read + READ_BYTES])
+        if not chunk:
+            raise EOFError('NPZ member ended before its declared shape')
+        read += chunk
+    return np.frombuffer(buffer, dtype=dtype).reshape(n_rows, shape[1])
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[np.isfinite(values)]
+
+
+class BlockSource:
+    """Row blocks of the dataset read from disk, never the whole frame"""
+
+    def __init__(self, data_dir, block_rows=BLOCK_ROWS):
+        self.data_dir = Path(data_dir)
+        self.block_rows = block_rows
+        self.metadata = columnar.read_json(self.data_dir / columnar.METADATA_FILE)
+        self.category_mappings = columnar.read_json(self.data_dir / columnar.MAPPINGS_FILE)
+        self.columns = list(self.metadata['columns'])
+        try:
+            self.store = columnar.open_store(self.data_dir, build=False)
+            self.n_rows = self.store.n_rows
+        except OSError:
+            self.store = None
+            with _npz_member(self.data_dir / columnar.NUMERIC_FILE) as (_, shape, _):
+                self.n_rows = shape[0]
+
+    def __len__(self):
+        return self.n_rows
+
+    def blocks(self, columns):
+        """DataFrames of successive row blocks restricted to columns"""
+        columns = [col for col in self.columns if col in set(columns)]
+        if self.store is not None:
+            yield from self._store_blocks(columns)
+        else:
+            yield from self._npz_blocks(columns)
+
+    def _store_blocks(self, columns):
+        for start in range(0, self.n_rows, self.block_rows):
+            stop = min(start + self.block_rows, self.n_rows)
+            data = {}
+            for col in columns:
+                values = np.array(self.store.array(col)[start:stop])
+                if self.store.is_categorical(col):
+                    values = pd.Categorical.from_codes(values, categories=self.store.categories(col))
+                data[col] = values
+            yield pd.DataFrame(data, copy=False)
+
+    def _npz_blocks(self, columns):
+        numeric_columns = self.metadata['numeric_columns']
+        categorical_columns = self.metadata['categorical_columns']
+        with _npz_member(self.data_dir / columnar.NUMERIC_FILE) as (numeric, numeric_shape, numeric_dtype), \
+                _npz_member(self.data_dir / columnar.CATEGORICAL_FILE) as (categorical, categorical_shape,
+                                                                           categorical_dtype):
+            for start in range(0, self.n_rows, self.block_rows):
+                n_rows = min(self.block_rows, self.n_rows - start)
+                numeric_rows = _read_rows(numeric, n_rows, numeric_shape, numeric_dtype)
+                categorical_rows = _read_rows(categorical, n_rows, categorical_shape, categorical_dtype)
+                data = {}
+                for col in columns:
+                    if col in numeric_columns:
+                        data[col] = numeric_rows[:, numeric_columns.index(col)]
+                    else:
+                        data[col] = pd.Categorical.from_codes(categorical_rows[:, categorical_columns.index(col)],
+                                                              categories=self.category_mappings[col])
+                yield pd.DataFrame(data, copy=False)
+
+    def filtered_blocks(self, spec, columns):
+        """Blocks of columns restricted to the rows matching a FilterSpec"""
+        filter_columns = [col for col, _ in spec.categories] + [col for col, _, _ in spec.ranges]
+        needed = list(dict.fromkeys(list(columns) + filter_columns))
+        for block in self.blocks(needed):
+            mask = spec.row_mask(block)
+            yield block.loc[mask, list(columns)].reset_index(drop=True)
+
+
+def build_cube(source):
+    """Aggregation cube built block by block
+
+    Categorical labels come from the store's mappings and bands are fixed, so
+    every block is coded in the same cell key space and its partial cells are
+    merged into the running cells in one pass.
+    """
+    labels = {dim: list(source.category_mappings[dim]) for dim in cube.CATEGORY_DIMENSIONS}
+    labels.update({dim: cube.band_labels(dim) for dim in cube.BANDED_DIMENSIONS})
+
+    columns = list(cube.DIMENSIONS) + [col for col in cube.MEASURES.values() if col is not None]
+    cells = None
+    for block in source.blocks(columns):
+        partial = cube.partial_cells(block, labels)
+        cells = partial if cells is None else cube.merge_cells([cells, partial])
+    return cube.cube_from_cells(labels, *cells)
+
+
+class ChunkedSelection:
+    """Rows of the on-disk dataset matching a FilterSpec, read block by block
+
+    Offers the Selection interface the tabs use (len, columns, spec, frame,
+    column, head, chunks) plus summary(), group_summaries(), histogram() and
+    sample(), which reduce the filtered blocks one at a time instead of
+    gathering them.
+    """
+
+    in_memory = False
+    rows = None
+
+    def __init__(self, source, spec, n_rows):
+        self.source = source
+        self.spec = spec
+        self.n_rows = n_rows
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def columns(self):
+        """Dashboard columns of the dataset (the GLM design matrix is left out, as in memory mode)"""
+        return pd.Index([col for col in self.source.columns if not columnar.is_design_column(col)])
+
+    def chunks(self, columns=None, source=None):
+        """Filtered row blocks of columns (source is ignored: blocks come from disk)
+
+        Blocks without a matching row are yielded empty, so writers always see the columns.
+        """
+        columns = list(self.columns) if columns is None else list(columns)
+        yield from self.source.filtered_blocks(self.spec, columns)
+
+    def frame(self, columns=None):
+        """Filtered rows of columns, gathered block by block"""
+        columns = list(self.columns) if columns is None else list(columns)
+        return pd.concat(list(self.chunks(columns)), ignore_index=True)
+
+    def column(self, name):
+        return self.frame([name])[name]
+
+    def head(self, n=5, columns=None):
+        """First n filtered rows, reading only as many blocks as needed"""
+        columns = list(self.columns) if columns is None else list(columns)
+        blocks, found = [], 0
+        for block in self.chunks(columns):
+            blocks.append(block.head(n - found))
+            found += len(blocks[-1])
+            if found >= n:
+                break
+        return pd.concat(blocks, ignore_index=True)
+
+    def summary(self, column):
+        """ColumnSummary of the filtered values of column, merged from per-block summaries"""
+        summary = ColumnSummary()
+        for block in self.chunks([column]):
+            summary.merge(ColumnSummary().add(block[column].to_numpy()))
+        return summary
+
+    def group_summaries(self, column, by):
+        """{label: ColumnSummary} of the filtered values of column per category of by, merged from per-block summaries"""
+        summaries, labels = {}, []
+        for block in self.chunks([by, column]):
+            labels = list(block[by].cat.categories)
+            codes = block[by].cat.codes.to_numpy()
+            values = block[column].to_numpy()
+            for code in np.unique(codes):
+                summaries.setdefault(code, ColumnSummary()).merge(ColumnSummary().add(values[codes == code]))
+        return {labels[code]: summaries[code] for code in sorted(summaries)}
+
+    def histogram(self, columns, values, nbins=50):
+        """charts.histogram() bins of values(block) over the filtered blocks of columns
+
+        A first pass finds the range of the values, so the second bins every
+        block on the same edges and adds up their counts.
+        """
+        low, high = np.inf, -np.inf
+        for block in self.chunks(columns):
+            block_values = _finite(values(block))
+            if len(block_values):
+                low, high = min(low, block_values.min()), max(high, block_values.max())
+        if low > high:
+            return {'edges': np.zeros(0), 'counts': np.zeros(0)}
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        edges = np.linspace(low, high, nbins + 1)
+        counts = np.zeros(nbins, dtype=np.int64)
+        for block in self.chunks(columns):
+            counts += np.histogram(_finite(values(block)), bins=edges)[0]
+        return {'edges': edges, 'counts': counts}
+
+    def sample(self, columns, n, keep=None, seed=42):
+        """Uniform sample of up to n filtered rows of columns (those keep(block) selects, if given)
+
+        Every row draws a random key and the rows with the n smallest keys
+        are kept across blocks, so at most one block plus n rows are held.
+        """
+        rng = np.random.default_rng(seed)
+        sample, keys = None, np.zeros(0)
+        for block in self.chunks(columns):
+            if keep is not None:
+                block = block[keep(block)]
+            sample = block if sample is None else pd.concat([sample, block], ignore_index=True)
+            keys = np.concatenate([keys, rng.random(len(block))])
+            if len(keys) > n:
+                smallest = np.sort(np.argpartition(keys, n)[:n])
+                sample, keys = sample.iloc[smallest].reset_index(drop=True), keys[smallest]
+        return sample
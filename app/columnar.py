@@ -0,0 +1,247 @@
+"""
+Columnar dataset store for the French Motor Insurance dashboard
+
+The store is a directory holding one uncompressed ``.npy`` file per column plus
+a ``manifest.json``. Columns are memory-mapped on access, so a view only pages
+in the columns it actually reads and every process on the host shares the same
+page cache instead of decompressing its own copy of the NPZ matrices.
+
+Convert the NPZ/JSON files once with:
+
+    python columnar.py [data_dir]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+STORE_DIRNAME = 'columns'
+MANIFEST_NAME = 'manifest.json'
+STORE_FORMAT_VERSION = 3
+
+METADATA_FILE = 'data_metadata.json'
+MAPPINGS_FILE = 'category_mappings.json'
+NUMERIC_FILE = 'data_numeric.npz'
+CATEGORICAL_FILE = 'data_categorical.npz'
+SOURCE_FILES = (METADATA_FILE, MAPPINGS_FILE, NUMERIC_FILE, CATEGORICAL_FILE)
+
+# GLM design matrix terms stored next to the raw columns (never shown in the dashboard)
+DESIGN_TERMS = ('Intercept', 'log_Exposure', 'cnt')
+
+
+def is_design_column(name):
+    """True for GLM design matrix columns such as 'Region[T.R21]' or 'VehAge.1'"""
+    return name in DESIGN_TERMS or '[T.' in name or name.endswith('.1')
+
+
+def find_data_dir(candidates):
+    """Return the first candidate directory containing the dataset metadata"""
+    data_dir = next((Path(c) for c in candidates if (Path(c) / METADATA_FILE).exists()), None)
+    if data_dir is None:
+        raise FileNotFoundError(2, 'No such file or directory', METADATA_FILE)
+    return data_dir
+
+
+def read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def source_fingerprint(data_dir):
+    """Size and mtime of the NPZ/JSON sources, used to detect a stale store"""
+    fingerprint = {}
+    for name in SOURCE_FILES:
+        stat = (Path(data_dir) / name).stat()
+        fingerprint[name] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def dataset_version(data_dir):
+    """Short digest of the source files, identifying the dataset in cached results"""
+    try:
+        fingerprint = source_fingerprint(data_dir)
+    except FileNotFoundError:
+        # Only the store was deployed: it records the sources it was built from
+        fingerprint = read_json(Path(data_dir) / STORE_DIRNAME / MANIFEST_NAME)['source']
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def code_dtype(n_categories):
+    """Smallest signed integer dtype able to hold the categorical codes"""
+    return np.int8 if n_categories <= np.iinfo(np.int8).max else np.int16
+
+
+def _write_column(out_dir, position, values):
+    file_name = f'{position:03d}.npy'
+    np.save(out_dir / file_name, np.ascontiguousarray(values), allow_pickle=False)
+    return file_name
+
+
+def convert_npz(data_dir, out_dir=None):
+    """Convert data_numeric.npz/data_categorical.npz into a columnar store
+
+    Numeric columns are written in their compact dtype (see schema.py), with
+    the dtype declared in data_metadata.json kept in the manifest, and
+    categorical columns as integer codes with their categories. The store is built in a temporary directory and moved into
+    place at the end, so readers never see a half-written store.
+    """
+    data_dir = Path(data_dir)
+    out_dir = Path(out_dir) if out_dir is not None else data_dir / STORE_DIRNAME
+
+    metadata = read_json(data_dir / METADATA_FILE)
+    category_mappings = read_json(data_dir / MAPPINGS_FILE)
+    numeric_data = np.load(data_dir / NUMERIC_FILE)['data']
+    categorical_data = np.load(data_dir / CATEGORICAL_FILE)['data']
+
+    tmp_dir = out_dir.with_name(f'{out_dir.name}.tmp-{os.getpid()}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    columns = {}
+    for position, col in enumerate(metadata['columns']):
+        if col in metadata['numeric_columns']:
+            col_idx = metadata['numeric_columns'].index(col)
+            values = schema.downcast(numeric_data[:, col_idx])
+            columns[col] = {'file': _write_column(tmp_dir, position, values), 'dtype': values.dtype.name}
+        else:
+            col_idx = metadata['categorical_columns'].index(col)
+            categories = category_mappings[col]
+            values = categorical_data[:, col_idx].astype(code_dtype(len(categories)))
+            columns[col] = {'file': _write_column(tmp_dir, position, values), 'dtype': 'category',
+                            'categories': categories}
+        columns[col]['declared_dtype'] = metadata['dtypes'].get(col, 'float64')
+
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'n_rows': len(numeric_data),
+        'column_order': metadata['columns'],
+        'columns': columns,
+        'source': source_fingerprint(data_dir),
+    }
+    with open(tmp_dir / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return ColumnStore(out_dir)
+
+
+class ColumnStore:
+    """Read-only view over a columnar store directory"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = read_json(self.path / MANIFEST_NAME)
+        self.n_rows = self.manifest['n_rows']
+        self.columns = list(self.manifest['column_order'])
+        self._arrays = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def is_categorical(self, name):
+        return self.manifest['columns'][name]['dtype'] == 'category'
+
+    def categories(self, name):
+        return self.manifest['columns'][name]['categories']
+
+    @property
+    def declared_dtypes(self):
+        """Column dtypes as declared in data_metadata.json"""
+        return {col: info['declared_dtype'] for col, info in self.manifest['columns'].items()}
+
+    def array(self, name):
+        """Memory-mapped values (codes for categorical columns) of one column"""
+        if name not in self._arrays:
+            info = self.manifest['columns'][name]
+            self._arrays[name] = np.load(self.path / info['file'], mmap_mode='r')
+        return self._arrays[name]
+
+    def series(self, name):
+        values = self.array(name)
+        if self.is_categorical(name):
+            # The codes were range-checked when the store was written; validating would copy them
+            values = pd.Categorical.from_codes(values, categories=self.categories(name), validate=False)
+        return pd.Series(values, name=name, copy=False)
+
+    def frame(self, columns=None):
+        """DataFrame over the requested columns, in store order, without copying numeric data"""
+        wanted = self.columns if columns is None else [c for c in self.columns if c in set(columns)]
+        return pd.DataFrame({col: self.series(col) for col in wanted}, copy=False)
+
+
+def prefetch(store):
+    """Ask the OS to read the column files into the page cache ahead of use (where supported)"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for info in store.manifest['columns'].values():
+        fd = os.open(store.path / info['file'], os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+
+def is_stale(store_dir, data_dir):
+    """True when the store is missing or was built from different source files"""
+    manifest_path = Path(store_dir) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return True
+    manifest = read_json(manifest_path)
+    if manifest.get('format_version') != STORE_FORMAT_VERSION:
+        return True
+    try:
+        return manifest.get('source') != source_fingerprint(data_dir)
+    except FileNotFoundError:
+        # Only the store was deployed: nothing to compare against
+        return False
+
+
+def open_store(data_dir, build=True):
+    """Open the columnar store next to the NPZ files, converting them first if needed"""
+    store_dir = Path(data_dir) / STORE_DIRNAME
+    if is_stale(store_dir, data_dir):
+        if not build:
+            raise FileNotFoundError(2, 'No such file or directory', str(store_dir / MANIFEST_NAME))
+        return convert_npz(data_dir, store_dir)
+    return ColumnStore(store_dir)
+
+
+def load_npz_frame(data_dir, columns=None):
+    """Decode the NPZ files directly into a compact DataFrame (fallback for read-only deployments)
+
+    Each column is converted straight to its compact dtype and the frame is
+    constructed once from the finished arrays, instead of growing it column by
+    column.
+    """
+    data_dir = Path(data_dir)
+    metadata = read_json(data_dir / METADATA_FILE)
+    category_mappings = read_json(data_dir / MAPPINGS_FILE)
+    numeric_data = np.load(data_dir / NUMERIC_FILE)['data']
+    categorical_data = np.load(data_dir / CATEGORICAL_FILE)['data']
+
+    wanted = metadata['columns'] if columns is None else [c for c in metadata['columns'] if c in set(columns)]
+    data = {}
+    for col in wanted:
+        if col in metadata['numeric_columns']:
+            col_idx = metadata['numeric_columns'].index(col)
+            data[col] = schema.downcast(numeric_data[:, col_idx])
+        else:
+            col_idx = metadata['categorical_columns'].index(col)
+            data[col] = pd.Categorical.from_codes(categorical_data[:, col_idx],
+                                                  categories=category_mappings[col])
+    return pd.DataFrame(data, copy=False)
+
+
+if __name__ == '__main__':
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent
+    store = convert_npz(target)
+    print(f'Wrote {len(store.columns)} columns x {store.n_rows:,} rows to {store.path}')
@@ -0,0 +1,324 @@
+"""
+Aggregation cube of additive statistics
+
+Every group-by and metric in the dashboard needs only additive statistics
+(policy counts and sums of claims, exposure, amounts and premiums). The cube
+holds those sums once per occupied combination of the categorical dimensions
+and the DrivAge/VehPower bands of the charts, so any categorical filter, any
+age or power range made of whole bands and any of these charts is answered
+by summing cells instead of scanning rows. A range that splits a band is
+answered by a cube of the selected rows (build_blocks()), aggregated once
+per filter state. The number of occupied cells is bounded by the dimension
+cardinalities (a few tens of thousands of cells at most), not by the number
+of policies. Claim counts are measures, not a dimension: the claims and
+policies_with_claims sums answer every claim metric.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Dimensions of the cube: categoricals, then integer columns binned into bands
+CATEGORY_DIMENSIONS = ('DataMajor', 'Region', 'Area', 'VehBrand', 'VehGas')
+# Lower bound of each band; a band runs up to the next bound, the last one up to BAND_END.
+# The DrivAge bands are the age groups of the Driver Demographics tab, pd.cut's
+# right-closed bins (0, 25], (25, 35], ..., (65, 100], under their original labels
+BANDS = {
+    'DrivAge': (0, 26, 36, 46, 56, 66),
+    'VehPower': (0, 6, 8, 10, 12),
+}
+BAND_LABELS = {
+    'DrivAge': ('<25', '25-35', '35-45', '45-55', '55-65', '65+'),
+}
+BAND_END = 999
+BANDED_DIMENSIONS = tuple(BANDS)
+DIMENSIONS = CATEGORY_DIMENSIONS + BANDED_DIMENSIONS
+
+# Measure name -> source column (summed per cell); None counts policies
+MEASURES = {
+    'policies': None,
+    'claims': 'ClaimNb',
+    'exposure': 'Exposure',
+    'claim_amount': 'ClaimAmount',
+    'pred_premium': 'Pred_GLMs',
+    'pure_premium': 'PurePremium',
+    'veh_age': 'VehAge',
+    'bonus_malus': 'BonusMalus',
+    'driver_age': 'DrivAge',
+}
+# Count measures of policies satisfying a condition on one column
+COUNT_MEASURES = {
+    'policies_with_claims': 'ClaimNb',
+    'policies_with_amount': 'ClaimAmount',
+}
+
+
+def band_bounds(dim):
+    """Inclusive (lows, highs) of the bands of a banded dimension"""
+    lows = np.asarray(BANDS[dim])
+    return lows, np.append(lows[1:] - 1, BAND_END)
+
+
+def band_labels(dim):
+    """Labels of the bands of a banded dimension (BAND_LABELS, or '<6', '6-7', ..., '12+')"""
+    if dim in BAND_LABELS:
+        return list(BAND_LABELS[dim])
+    lows, highs = band_bounds(dim)
+    labels = [f'{low}-{high}' for low, high in zip(lows, highs)]
+    labels[0], labels[-1] = f'<{lows[1]}', f'{lows[-1]}+'
+    return labels
+
+
+def band_range(dim, first, last):
+    """Inclusive (low, high) of the values from band label first to band label last"""
+    lows, highs = band_bounds(dim)
+    labels = band_labels(dim)
+    return int(lows[labels.index(first)]), int(highs[labels.index(last)])
+
+
+def band_mask(dim, low, high):
+    """Bands of dim within [low, high], or None when the range splits a band (its cells cannot answer it)"""
+    lows, highs = band_bounds(dim)
+    inside = (lows >= low) & (highs <= high)
+    if ((lows <= high) & (highs >= low) & ~inside).any():
+        return None
+    return inside
+
+
+def dimension_codes(df, dim, labels=None):
+    """Integer codes and labels of one cube dimension for every row of df
+
+    Banded dimensions are coded by band. Other integer columns are coded as
+    offsets from their minimum; pass the labels of the whole dataset to code
+    a block of rows consistently.
+    """
+    values = df[dim]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.intp), list(values.cat.categories)
+    values = values.to_numpy()
+    if dim in BANDS:
+        codes = np.searchsorted(BANDS[dim], values, side='right') - 1
+        return np.maximum(codes, 0).astype(np.intp), band_labels(dim)
+    if labels is None:
+        low, high = int(values.min()), int(values.max())
+        labels = list(range(low, high + 1))
+    return values.astype(np.intp) - labels[0], labels
+
+
+def measure_values(df, name):
+    """Per-row values summed into one measure"""
+    if name in COUNT_MEASURES:
+        return (df[COUNT_MEASURES[name]].to_numpy() > 0).astype(np.float64)
+    column = MEASURES[name]
+    if column is None:
+        return None
+    return df[column].to_numpy().astype(np.float64, copy=False)
+
+
+class Cube:
+    """Per-cell sums of the measures over the occupied cells of the dimensions"""
+
+    def __init__(self, labels, codes, measures):
+        self.labels = labels          # dim -> list of labels
+        self.codes = codes            # dim -> code of each cell
+        self.measures = measures      # measure -> sum for each cell
+        self.n_cells = len(measures['policies'])
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.codes.values()) + sum(a.nbytes for a in self.measures.values())
+
+    def covers(self, spec):
+        """True when every range of a FilterSpec selects whole bands, so the cells answer it exactly"""
+        return all(band_mask(col, low, high) is not None for col, low, high in spec.ranges)
+
+    def cell_mask(self, spec):
+        """Boolean mask over the cells matching a FilterSpec, or None when a range splits a band"""
+        mask = np.ones(self.n_cells, dtype=bool)
+        for col, values in spec.categories:
+            allowed = np.isin(np.asarray(self.labels[col], dtype=object), list(values))
+            mask &= allowed[self.codes[col]]
+        for col, low, high in spec.ranges:
+            bands = band_mask(col, low, high)
+            if bands is None:
+                return None
+            mask &= bands[self.codes[col]]
+        return mask
+
+    def group_arrays(self, cells, dims, names):
+        """Dense per-group sums of the measures names over the given cell positions"""
+        codes = [self.codes[dim][cells] for dim in dims]
+        measures = {name: self.measures[name][cells] for name in names}
+        return grouped_arrays(codes, [self.labels[dim] for dim in dims], measures)
+
+    def query(self, spec):
+        """CubeView of the cells matching a FilterSpec the cube covers (see covers())"""
+        mask = self.cell_mask(spec)
+        if mask is None:
+            raise ValueError(f'{spec.ranges} split a band of the cube; aggregate the selected rows '
+                             f'with build_blocks() instead')
+        return CubeView(self, mask)
+
+
+class CubeView:
+    """Cells of a cube selected by a filter, answering totals and group-bys"""
+
+    def __init__(self, cube, mask):
+        self.cube = cube
+        self.cells = np.flatnonzero(mask)
+        self._totals = None
+
+    def totals(self):
+        """Sum of every measure over the selected cells (computed once per view)"""
+        if self._totals is None:
+            self._totals = pd.Series({name: values[self.cells].sum() for name, values in self.cube.measures.items()})
+        return self._totals
+
+    def group_by(self, *dims, measures=None):
+        """Measure sums per combination of dims, indexed by their labels
+
+        measures restricts the result to those measures ('policies' is always
+        included). Combinations without any selected policy are dropped,
+        matching groupby(observed=True) on the rows.
+        """
+        names = measure_names(self.cube, measures)
+        sums = self.cube.group_arrays(self.cells, dims, names)
+        return grouped_frame(sums, [self.cube.labels[dim] for dim in dims], dims)
+
+    def remember(self, totals=None, group_by=None):
+        """Keep results of this view computed elsewhere (e.g. served from a result cache)
+
+        group_by is (dims, measures, frame); a plain view keeps only the totals.
+        """
+        if totals is not None and self._totals is None:
+            self._totals = totals
+
+
+def measure_names(cube, measures=None):
+    """Measures of a group-by: all of them, or 'policies' plus the requested ones"""
+    if measures is None:
+        return list(cube.measures)
+    return ['policies'] + [m for m in measures if m != 'policies']
+
+
+def grouped_arrays(codes, labels, measures):
+    """Sum each measure array per combination of integer codes
+
+    codes[i] holds the code of each element on the i-th dimension (indexing
+    labels[i]); a measure of None counts elements. The codes are raveled into
+    one group code and every measure is accumulated with a single np.bincount
+    into a dense array over every combination of labels.
+    """
+    shape = tuple(len(dim_labels) for dim_labels in labels)
+    n_groups = int(np.prod(shape))
+    group_codes = np.ravel_multi_index(codes, shape) if codes else np.zeros(0, dtype=np.intp)
+    return {
+        name: np.bincount(group_codes, weights=values, minlength=n_groups).astype(np.float64)
+        for name, values in measures.items()
+    }
+
+
+def grouped_frame(sums, labels, dims):
+    """DataFrame of dense grouped_arrays() sums, without the empty combinations"""
+    index = pd.MultiIndex.from_product(labels, names=list(dims))
+    if len(dims) == 1:
+        index = index.get_level_values(0)
+    result = pd.DataFrame(sums, index=index)
+    return result[result['policies'] > 0]
+
+
+def grouped_sums(codes, labels, dims, measures):
+    """Sum each measure array per combination of integer codes, as a DataFrame"""
+    return grouped_frame(grouped_arrays(codes, labels, measures), labels, dims)
+
+
+def partial_cells(df, labels):
+    """Occupied cell keys of the rows of df and the sums of every measure per cell
+
+    labels gives the labels of each dimension over the whole dataset, so the
+    partial cells of separate row blocks share one key space and can be
+    merged with merge_cells().
+    """
+    row_codes = [dimension_codes(df, dim, labels[dim])[0] for dim in DIMENSIONS]
+    shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+    keys = np.ravel_multi_index(row_codes, shape)
+    cell_keys, row_cells = np.unique(keys, return_inverse=True)
+    measures = {
+        name: np.bincount(row_cells, weights=measure_values(df, name), minlength=len(cell_keys))
+        for name in list(MEASURES) + list(COUNT_MEASURES)
+    }
+    return cell_keys, measures
+
+
+def merge_cells(parts):
+    """Merge (cell keys, measure sums) pairs of disjoint row blocks into one"""
+    parts = list(parts)
+    keys = np.concatenate([cell_keys for cell_keys, _ in parts])
+    cell_keys, cells = np.unique(keys, return_inverse=True)
+    measures = {
+        name: np.bincount(cells, weights=np.concatenate([sums[name] for _, sums in parts]),
+                          minlength=len(cell_keys))
+        for name in parts[0][1]
+    }
+    return cell_keys, measures
+
+
+def cube_from_cells(labels, cell_keys, measures):
+    """Cube of the merged partial cells"""
+    shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+    cell_codes = np.unravel_index(cell_keys, shape)
+    codes = {
+        dim: cell_codes[i].astype(np.min_scalar_type(shape[i] - 1))
+        for i, dim in enumerate(DIMENSIONS)
+    }
+    return Cube(labels, codes, measures)
+
+
+def build_cube(df):
+    """Aggregate the rows of df into a Cube"""
+    labels = {dim: dimension_codes(df, dim)[1] for dim in DIMENSIONS}
+    return cube_from_cells(labels, *partial_cells(df, labels))
+
+
+def build_blocks(blocks, labels):
+    """Cube of the rows of blocks (e.g. the chunks of a selection), coded with the labels of a whole-book cube
+
+    This answers filters a cube cannot, such as a DrivAge range that splits a
+    band: the rows are aggregated once, and every group-by of the selection is
+    then read from the cells.
+    """
+    parts = [partial_cells(block, labels) for block in blocks]
+    if not parts:
+        parts = [(np.zeros(0, dtype=np.intp), {name: np.zeros(0) for name in list(MEASURES) + list(COUNT_MEASURES)})]
+    return cube_from_cells(labels, *merge_cells(parts))
+
+
+def summary_metrics(totals):
+    """Dashboard metrics derived from the measure totals of a view"""
+    policies = totals['policies']
+    exposure = totals['exposure']
+    return {
+        'total_policies': int(policies),
+        'total_claims': totals['claims'],
+        'total_exposure': exposure,
+        'total_claim_amount': totals['claim_amount'],
+        'policies_with_claims': int(totals['policies_with_claims']),
+        'avg_pure_premium': totals['pure_premium'] / policies if policies > 0 else np.nan,
+        'avg_predicted_premium': totals['pred_premium'] / policies if policies > 0 else np.nan,
+        'claim_frequency': totals['claims'] / exposure if exposure > 0 else 0,
+        'avg_claim_severity': (totals['claim_amount'] / totals['policies_with_amount']
+                               if totals['policies_with_amount'] > 0 else 0),
+    }
+
+
+FREQUENCY_MEASURES = ('claims', 'exposure', 'claim_amount', 'policies_with_claims')
+
+
+def frequency_table(view, *dims):
+    """Policies, claims, exposure, amounts, claim frequency and policy share per combination of dims of a view"""
+    table = view.group_by(*dims, measures=FREQUENCY_MEASURES).reset_index().rename(columns={
+        'policies': 'Policies', 'claims': 'Claims', 'exposure': 'Exposure', 'claim_amount': 'ClaimAmount',
+        'policies_with_claims': 'PoliciesWithClaims'})
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['Frequency'] = table['Claims'] / table['Exposure']
+        table['Share'] = table['Policies'] / table['Policies'].sum()
+    return table
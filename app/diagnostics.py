@@ -0,0 +1,222 @@
+"""
+Per-rerun diagnostics
+
+A Rerun records what one execution of the script spent its time on: wall
+time and resident-memory delta of every stage (load, filter, aggregates,
+each tab, pivot, export), the serialized size of every Plotly figure sent
+to the browser (with its build, serialize and wait times when it was built
+in the render pool), and the result-cache hits and misses of the rerun. Stages
+nest, so 'tabs/🔄 Pivot Table/pivot' is the pivot computed inside the pivot
+tab. With profiling on (the ?profile=1 query parameter) the rerun also runs
+under cProfile; only the script thread is profiled, not pool workers.
+
+Every rerun is appended as one JSON object per line to the diagnostics log
+(DASHBOARD_DIAGNOSTICS_LOG, empty to disable), and profiles are dumped next
+to it as .prof files for pstats or snakeviz. Once the log reaches
+DASHBOARD_DIAGNOSTICS_LOG_MB (default 10) it is rotated like a
+RotatingFileHandler's: log.1, log.2, ... up to LOG_BACKUPS old files are kept.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+import charts
+
+LOG_PATH = os.environ.get('DASHBOARD_DIAGNOSTICS_LOG',
+                          str(Path(tempfile.gettempdir()) / 'motor_dashboard_diagnostics.jsonl'))
+LOG_MAX_BYTES = int(float(os.environ.get('DASHBOARD_DIAGNOSTICS_LOG_MB', 10)) * 1024 ** 2)
+LOG_BACKUPS = 3
+PROFILE_PARAM = 'profile'
+PROFILE_TOP = 25
+
+_log_lock = threading.Lock()
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_uptime():
+    """Seconds since this process started, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def rotate_log(path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+    """Shift path to path.1 (path.1 to path.2, ...) once it holds max_bytes; the oldest backup is dropped"""
+    path = Path(path)
+    try:
+        if path.stat().st_size < max_bytes:
+            return
+    except FileNotFoundError:
+        return
+    for i in range(backups - 1, 0, -1):
+        older = path.with_name(f'{path.name}.{i}')
+        if older.exists():
+            os.replace(older, path.with_name(f'{path.name}.{i + 1}'))
+    if backups > 0:
+        os.replace(path, path.with_name(f'{path.name}.1'))
+    else:
+        path.unlink()
+
+
+def cache_delta(before, after):
+    """Hits and misses per kind between two ResultCache.counters() snapshots"""
+    delta = {}
+    for kind, counters in after.items():
+        previous = before.get(kind, {})
+        hits = counters['hits'] - previous.get('hits', 0)
+        misses = counters['misses'] - previous.get('misses', 0)
+        if hits or misses:
+            delta[kind] = {'hits': hits, 'misses': misses}
+    return delta
+
+
+class Rerun:
+    """Stage timings, memory deltas, figure payloads and cache activity of one rerun"""
+
+    def __init__(self, session_id, profile=False):
+        self.session_id = session_id
+        self.started = time.time()
+        self.stages = []
+        self.figures = []
+        self.cache = {}
+        self.context = {}
+        self.profile_path = None
+        self.total_ms = None
+        self._path = []
+        self._start = time.perf_counter()
+        self._profiler = None
+        if profile:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Another session is being profiled (one profiler per process on Python 3.12+)
+                self._profiler = None
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as a (nested) stage; yields its record, filled in on exit"""
+        self._path.append(name)
+        record = {'stage': '/'.join(self._path)}
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['ms'] = (time.perf_counter() - start) * 1000
+            rss_after = rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                record['rss_mb'] = rss_after / 1e6
+                record['rss_delta_mb'] = (rss_after - rss_before) / 1e6
+            self._path.pop()
+            self.stages.append(record)
+
+    def figure(self, fig, payload_bytes=None, timing=None):
+        """Record the serialized size of a figure shown in the current stage
+
+        timing holds the build, serialize and wait times of a figure built in
+        the render pool (see render_pool.FigureBatch).
+        """
+        if payload_bytes is None:
+            payload_bytes = charts.payload_bytes(fig)
+        self.figures.append({'stage': '/'.join(self._path), 'bytes': payload_bytes,
+                             'traces': len(fig.data), **(timing or {})})
+        return payload_bytes
+
+    def finish(self, cache_before, cache_after):
+        """Stop profiling and record the cache activity; returns the log record"""
+        self.total_ms = self.elapsed_ms()
+        self.cache = cache_delta(cache_before, cache_after)
+        if self._profiler is not None:
+            self._profiler.disable()
+        return self.record()
+
+    def record(self):
+        rss = rss_bytes()
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'session': self.session_id,
+            **self.context,
+            'total_ms': self.total_ms,
+            'rss_mb': None if rss is None else rss / 1e6,
+            'stages': self.stages,
+            'figures': self.figures,
+            'cache': self.cache,
+            'profile': self.profile_path,
+        }
+
+    def stage_frame(self):
+        """Stages in completion order, nested stages indented under their parent"""
+        rows = [{'Stage': '  ' * record['stage'].count('/') + record['stage'].rsplit('/', 1)[-1],
+                 'ms': record['ms'], 'RSS Δ MB': record.get('rss_delta_mb')} for record in self.stages]
+        return pd.DataFrame(rows, columns=['Stage', 'ms', 'RSS Δ MB'])
+
+    def figure_frame(self):
+        rows = [{'Stage': figure['stage'], 'Figure': figure.get('figure'), 'Traces': figure['traces'],
+                 'KB': figure['bytes'] / 1024, 'Build ms': figure.get('build_ms'),
+                 'Serialize ms': figure.get('serialize_ms'), 'Wait ms': figure.get('wait_ms')}
+                for figure in self.figures]
+        return pd.DataFrame(rows, columns=['Stage', 'Figure', 'Traces', 'KB', 'Build ms', 'Serialize ms',
+                                           'Wait ms'])
+
+    def cache_frame(self):
+        rows = [{'Kind': kind, 'Hits': counts['hits'], 'Misses': counts['misses'],
+                 'Hit Rate': counts['hits'] / (counts['hits'] + counts['misses'])}
+                for kind, counts in sorted(self.cache.items())]
+        return pd.DataFrame(rows, columns=['Kind', 'Hits', 'Misses', 'Hit Rate'])
+
+    def profile_frame(self, top=PROFILE_TOP):
+        """Functions with the largest cumulative time in the profile"""
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows = []
+        for (file_name, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({'Function': f'{function} ({Path(file_name).name}:{line})', 'Calls': calls,
+                         'Own ms': own * 1000, 'Cumulative ms': cumulative * 1000})
+        frame = pd.DataFrame(rows, columns=['Function', 'Calls', 'Own ms', 'Cumulative ms'])
+        return frame.sort_values('Cumulative ms', ascending=False).head(top)
+
+    def write_log(self, path=LOG_PATH):
+        """Append the rerun to the JSON-lines log, rotated at LOG_MAX_BYTES (and dump its profile next to it)"""
+        if not path:
+            return
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self._profiler is not None:
+            stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+            self.profile_path = str(path.with_name(f'profile-{stamp}-{self.session_id[:8]}.prof'))
+            self._profiler.dump_stats(self.profile_path)
+        line = json.dumps(self.record(), default=str)
+        with _log_lock:
+            rotate_log(path)
+            with open(path, 'a') as f:
+                f.write(line + '\n')
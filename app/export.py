@@ -0,0 +1,124 @@
+"""
+On-demand data export
+
+Exports are serialized only when requested, streamed chunk by chunk into a
+file (never one giant in-memory string), and kept in a small on-disk cache
+keyed by what was exported: dataset version, filter fingerprint, what-if
+adjustments, columns and format. Repeated requests for the same view, from
+any session, reuse the file.
+"""
+
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from pathlib import Path
+
+EXPORT_DIR = Path(tempfile.gettempdir()) / 'motor_dashboard_exports'
+EXPORT_CHUNK_ROWS = 50_000
+MAX_CACHED_EXPORTS = 16
+
+# Format label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def parquet_available():
+    """Parquet export needs pyarrow, which is an optional dependency"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'Parquet' or parquet_available()]
+
+
+def iter_chunks(frame, rows=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Successive row blocks of frame (restricted to the row positions rows)"""
+    n_rows = len(frame) if rows is None else len(rows)
+    for start in range(0, n_rows, chunk_rows):
+        if rows is None:
+            yield frame.iloc[start:start + chunk_rows]
+        else:
+            yield frame.take(rows[start:start + chunk_rows])
+
+
+def write_csv(path, chunks, compress=False):
+    """Write row blocks as one CSV file, the header taken from the first block"""
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=i == 0)
+
+
+def write_parquet(path, chunks):
+    """Write one Parquet row group per block"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_chunks(path, chunks, fmt='CSV'):
+    """Stream row blocks (DataFrames with the same columns) into path in the given format"""
+    if fmt == 'Parquet':
+        write_parquet(path, chunks)
+    else:
+        write_csv(path, chunks, compress=fmt == 'CSV (gzip)')
+
+
+def write_export(path, frame, rows=None, fmt='CSV', chunk_rows=EXPORT_CHUNK_ROWS):
+    """Stream the selected rows of frame into path in the given format"""
+    # A leading empty block carries the header even when no row is selected
+    write_chunks(path, itertools.chain([frame.head(0)], iter_chunks(frame, rows, chunk_rows)), fmt)
+
+
+def export_key(*parts):
+    """Stable digest identifying an export (filter fingerprint, columns, format, ...)"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def _prune(keep):
+    files = sorted(EXPORT_DIR.glob('export-*'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in files[keep:]:
+        stale.unlink(missing_ok=True)
+
+
+def cached_export(key, fmt, write):
+    """Path of the export identified by key, calling write(path) only on a cache miss
+
+    The file is written under a temporary name and renamed into place, so
+    concurrent sessions never read a partial export.
+    """
+    extension = EXPORT_FORMATS[fmt][0]
+    path = EXPORT_DIR / f'export-{key}{extension}'
+    if path.exists():
+        os.utime(path)
+        return path
+
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = EXPORT_DIR / f'tmp-{key}-{os.getpid()}{extension}'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    _prune(MAX_CACHED_EXPORTS)
+    return path
@@ -0,0 +1,164 @@
+"""
+Bitmap filter index
+
+Holds one packed bitset per value of the categorical sidebar filters and, for
+the integer range filters, one cumulative bitset per value (rows with a value
+<= v). A FilterSpec is resolved with a handful of bitwise operations on
+n_rows / 8 bytes each, into a Selection of row positions. Tabs gather only the
+columns (or rows) they need from the selection instead of copying the frame.
+"""
+
+import numpy as np
+
+from filters import CATEGORY_FILTERS, RANGE_FILTERS
+
+
+def pack(mask):
+    return np.packbits(mask)
+
+
+class FilterIndex:
+    """Packed bitsets over the rows of a frame for the sidebar filter columns"""
+
+    def __init__(self, df, categorical=CATEGORY_FILTERS, ranges=RANGE_FILTERS):
+        self.df = df
+        self.n_rows = len(df)
+        self.value_bits = {}     # col -> {label: bitset of rows with that label}
+        self.range_bits = {}     # col -> (low, cumulative bitsets: rows with value <= low + i)
+
+        for col in categorical:
+            values = df[col]
+            codes = values.cat.codes.to_numpy()
+            self.value_bits[col] = {
+                label: pack(codes == code) for code, label in enumerate(values.cat.categories)
+            }
+
+        for col in ranges:
+            values = df[col].to_numpy()
+            low, high = int(values.min()), int(values.max())
+            counts = np.bincount(values.astype(np.intp) - low, minlength=high - low + 1)
+            order = np.argsort(values, kind='stable')
+            cumulative = []
+            below = np.zeros(self.n_rows, dtype=bool)
+            start = 0
+            for count in counts:
+                below[order[start:start + count]] = True
+                start += count
+                cumulative.append(pack(below))
+            self.range_bits[col] = (low, cumulative)
+
+    @classmethod
+    def from_bitsets(cls, df, value_bits, range_bits):
+        """Index over df from prebuilt bitsets (see snapshot.py) instead of scanning its rows"""
+        index = cls.__new__(cls)
+        index.df = df
+        index.n_rows = len(df)
+        index.value_bits = value_bits
+        index.range_bits = range_bits
+        return index
+
+    @property
+    def nbytes(self):
+        value_bytes = sum(bits.nbytes for col in self.value_bits.values() for bits in col.values())
+        range_bytes = sum(bits.nbytes for _, col in self.range_bits.values() for bits in col)
+        return value_bytes + range_bytes
+
+    def _range(self, col, low, high):
+        """Bitset of rows with low <= value <= high, or None when it covers every row"""
+        first, cumulative = self.range_bits[col]
+        last = first + len(cumulative) - 1
+        if low <= first and high >= last:
+            return None
+        if high < first or low > last or low > high:
+            return np.zeros_like(cumulative[0])
+        bits = cumulative[min(high, last) - first].copy()
+        if low > first:
+            bits &= ~cumulative[low - 1 - first]
+        return bits
+
+    def bits(self, spec):
+        """Packed bitset of the rows matching a FilterSpec, or None for every row"""
+        result = None
+        for col, values in spec.categories:
+            col_bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for value in values:
+                if value in self.value_bits[col]:
+                    col_bits |= self.value_bits[col][value]
+            result = col_bits if result is None else result & col_bits
+        for col, low, high in spec.ranges:
+            col_bits = self._range(col, low, high)
+            if col_bits is not None:
+                result = col_bits if result is None else result & col_bits
+        return result
+
+    def select(self, spec):
+        """Selection of the rows matching a FilterSpec"""
+        bits = self.bits(spec)
+        if bits is None:
+            return Selection(self.df, spec=spec)
+        rows = np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+        return Selection(self.df, rows, spec)
+
+
+class Selection:
+    """Rows of a frame picked by a filter; columns are gathered on demand
+
+    rows is None when every row is selected, in which case columns are
+    returned without gathering. spec is the FilterSpec the rows came from.
+    """
+
+    in_memory = True
+
+    def __init__(self, df, rows=None, spec=None):
+        self.df = df
+        self.rows = rows
+        self.spec = spec
+
+    def __len__(self):
+        return len(self.df) if self.rows is None else len(self.rows)
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    @property
+    def mask(self):
+        """Boolean mask over all rows of the frame"""
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[slice(None) if self.rows is None else self.rows] = True
+        return mask
+
+    def column(self, name):
+        """Values of one column for the selected rows"""
+        values = self.df[name]
+        if self.rows is None:
+            return values
+        return values.take(self.rows)
+
+    def frame(self, columns=None):
+        """DataFrame of the selected rows, restricted to columns"""
+        df = self.df if columns is None else self.df[list(columns)]
+        if self.rows is None:
+            return df
+        return df.take(self.rows)
+
+    def chunks(self, columns=None, source=None, chunk_rows=50_000):
+        """Selected rows of columns in blocks, read from source (default: the selection's frame)
+
+        The first block is always yielded, even when empty, so writers see the columns.
+        """
+        df = self.df if source is None else source
+        df = df if columns is None else df[list(columns)]
+        n_rows = len(self)
+        for start in range(0, max(n_rows, 1), chunk_rows):
+            if self.rows is None:
+                yield df.iloc[start:start + chunk_rows]
+            else:
+                yield df.take(self.rows[start:start + chunk_rows])
+
+    def head(self, n=5, columns=None):
+        """First n selected rows, gathering only those"""
+        df = self.df if columns is None else self.df[list(columns)]
+        if self.rows is None:
+            return df.head(n)
+        return df.take(self.rows[:n])
@@ -0,0 +1,81 @@
+"""
+Sidebar filter state
+
+FilterSpec is the normalized, hashable form of the sidebar selections. Every
+engine that answers a filtered query (row masks, the aggregation cube, ...)
+takes one of these instead of reading widget values directly.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+# Categorical sidebar filters and the integer range sliders, in sidebar order
+CATEGORY_FILTERS = ('DataMajor', 'Region', 'Area', 'VehBrand')
+RANGE_FILTERS = ('DrivAge', 'VehPower')
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """Normalized filter state
+
+    categories: ((column, (value, ...)), ...) for each restricted categorical column
+    ranges: ((column, low, high), ...) inclusive bounds for each range filter
+    Columns that are not listed are not restricted ('All').
+    """
+    categories: tuple = ()
+    ranges: tuple = ()
+
+    @classmethod
+    def from_selection(cls, categories=None, ranges=None):
+        """Build a spec from {column: values} and {column: (low, high)}
+
+        A selection that is empty or contains 'All' leaves the column
+        unrestricted; values are sorted so equal selections compare equal.
+        """
+        normalized_categories = []
+        for col, values in (categories or {}).items():
+            values = [values] if isinstance(values, str) else list(values)
+            if not values or 'All' in values:
+                continue
+            normalized_categories.append((col, tuple(sorted(set(values)))))
+
+        normalized_ranges = []
+        for col, bounds in (ranges or {}).items():
+            if bounds is None:
+                continue
+            low, high = bounds
+            normalized_ranges.append((col, int(low), int(high)))
+
+        return cls(tuple(sorted(normalized_categories)), tuple(sorted(normalized_ranges)))
+
+    @classmethod
+    def from_sidebar(cls, split, regions, areas, brands, age_range, power_range):
+        """Spec for the dashboard sidebar widgets"""
+        return cls.from_selection(
+            {'DataMajor': split, 'Region': regions, 'Area': areas, 'VehBrand': brands},
+            {'DrivAge': age_range, 'VehPower': power_range},
+        )
+
+    def to_dict(self):
+        """Plain {'column': [values] or [low, high]} form of the spec"""
+        spec = {col: list(values) for col, values in self.categories}
+        spec.update({col: [low, high] for col, low, high in self.ranges})
+        return spec
+
+    def fingerprint(self):
+        """Short stable digest of the spec, for keying cached results"""
+        payload = json.dumps(self.to_dict(), sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    def row_mask(self, df):
+        """Boolean row mask of the rows of df matching the spec"""
+        mask = np.ones(len(df), dtype=bool)
+        for col, values in self.categories:
+            mask &= df[col].isin(values).to_numpy()
+        for col, low, high in self.ranges:
+            col_values = df[col].to_numpy()
+            mask &= (col_values >= low) & (col_values <= high)
+        return mask
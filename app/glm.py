@@ -0,0 +1,217 @@
+"""
+GLM re-scoring from categorical codes
+
+The dataset stores the GLM design matrix densely (an intercept, one dummy
+column per non-base level of Area/VehBrand/VehGas/Region and the continuous
+'.1' terms) next to its prediction Pred_GLMs = exp(x'b); log_Exposure is the
+offset of Pred_GLMs_e = Pred_GLMs * Exposure. The coefficients are recovered
+once by least squares of log(Pred_GLMs) on the design, whose normal
+equations are accumulated from the category codes (one bincount per pair of
+factors) and the continuous terms, without loading or building the dummy
+columns. A prediction then needs only one coefficient lookup per factor,
+indexed by the category codes, plus the continuous terms. What-if adjustments multiply the
+relativity of single levels; re-scoring the portfolio is a few gathers and
+one exp over the rows.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from cube import Cube
+
+FACTORS = ('Area', 'VehBrand', 'VehGas', 'Region')
+CONTINUOUS_TERMS = ('VehPower', 'VehAge', 'DrivAge', 'BonusMalus')
+PREDICTION = 'Pred_GLMs'
+FIT_ROWS = 100_000
+
+_LEVEL_TERM = re.compile(r'^(?P<factor>\w+)\[T\.(?P<level>.+)\]$')
+
+
+def model_columns(columns):
+    """Columns needed to fit and score the GLM: factors, continuous design terms and the prediction"""
+    return list(FACTORS) + [f'{term}.1' for term in CONTINUOUS_TERMS] + [PREDICTION]
+
+
+def level_terms(columns):
+    """{factor: levels with a dummy column} among the design columns; the other level is the base"""
+    terms = {factor: [] for factor in FACTORS}
+    for col in columns:
+        match = _LEVEL_TERM.match(col)
+        if match and match['factor'] in terms:
+            terms[match['factor']].append(match['level'])
+    return terms
+
+
+def normalize_adjustments(adjustments):
+    """Hashable form of what-if adjustments: sorted (factor, level, multiplier) triples
+
+    adjustments is {factor: {level: multiplier}}; multipliers of 1 are dropped.
+    """
+    return tuple(sorted(
+        (factor, level, float(multiplier))
+        for factor, levels in (adjustments or {}).items()
+        for level, multiplier in levels.items()
+        if multiplier != 1
+    ))
+
+
+class GLMModel:
+    """Log-linear GLM: intercept, per-level log relativities and continuous slopes"""
+
+    def __init__(self, intercept, relativities, slopes):
+        self.intercept = intercept
+        self.relativities = relativities    # factor -> pd.Series of log coefficients per level (base 0)
+        self.slopes = slopes                # continuous column -> coefficient
+        self.fit_error = None               # max |log score - log Pred_GLMs| over all rows
+
+    def table(self, factor, adjustments=()):
+        """Log coefficient of every level of factor, in category order, with adjustments applied"""
+        coefficients = self.relativities[factor].to_numpy().copy()
+        levels = self.relativities[factor].index
+        for adjusted_factor, level, multiplier in adjustments:
+            if adjusted_factor == factor:
+                coefficients[levels.get_loc(level)] += np.log(multiplier)
+        return coefficients
+
+    def without_factor(self, factor):
+        """What-if adjustments that set every level of factor to the base relativity"""
+        return normalize_adjustments({factor: {level: np.exp(-coef) for level, coef in self.relativities[factor].items()}})
+
+    def relativity_frame(self):
+        """Relativities exp(coefficient) of every factor level, for display"""
+        return pd.DataFrame([
+            {'Factor': factor, 'Level': level, 'Relativity': np.exp(coef)}
+            for factor, coefficients in self.relativities.items()
+            for level, coef in coefficients.items()
+        ])
+
+
+def _offsets(blocks, continuous):
+    sizes = [len(kept) for _, _, kept in blocks] + [continuous.shape[1]]
+    return np.concatenate([[0], np.cumsum(sizes)])
+
+
+def gram_matrix(blocks, continuous):
+    """XᵀX of a design of one-hot blocks and dense continuous columns
+
+    blocks are (codes, n_levels, kept levels) triples: the dummy columns of
+    the kept levels of one categorical, given by the code of every row. The
+    cross-products of two blocks are the counts of their code pairs (one
+    bincount), those of a block and a continuous column its sums per level,
+    so no dummy column is ever materialized.
+    """
+    offsets = _offsets(blocks, continuous)
+    xtx = np.zeros((offsets[-1], offsets[-1]))
+    for i, (codes_i, n_i, kept_i) in enumerate(blocks):
+        rows_i = slice(offsets[i], offsets[i + 1])
+        for j, (codes_j, n_j, kept_j) in enumerate(blocks[:i + 1]):
+            pairs = np.bincount(codes_i * n_j + codes_j, minlength=n_i * n_j).reshape(n_i, n_j)
+            xtx[rows_i, offsets[j]:offsets[j + 1]] = pairs[np.ix_(kept_i, kept_j)]
+        for k, values in enumerate(continuous.T):
+            xtx[offsets[-2] + k, rows_i] = np.bincount(codes_i, weights=values, minlength=n_i)[kept_i]
+    xtx[offsets[-2]:, offsets[-2]:] = continuous.T @ continuous
+    # Only the lower triangle was filled
+    return np.tril(xtx) + np.tril(xtx, -1).T
+
+
+def design_dot(blocks, continuous, z):
+    """Xᵀz of the design of gram_matrix(): sums of z per kept level, then dot products with the continuous columns"""
+    sums = [np.bincount(codes, weights=z, minlength=n_levels)[kept] for codes, n_levels, kept in blocks]
+    return np.concatenate(sums + [continuous.T @ z])
+
+
+def design_times(blocks, continuous, coefficients):
+    """Xb of the design of gram_matrix(): one coefficient lookup per block plus the continuous terms"""
+    offsets = _offsets(blocks, continuous)
+    eta = continuous @ coefficients[offsets[-2]:]
+    for i, (codes, n_levels, kept) in enumerate(blocks):
+        table = np.zeros(n_levels)
+        table[kept] = coefficients[offsets[i]:offsets[i + 1]]
+        eta += table[codes]
+    return eta
+
+
+def fit_model(df, terms=None, fit_rows=FIT_ROWS, seed=0):
+    """Recover the GLM coefficients from the category codes, continuous terms and Pred_GLMs of df
+
+    terms gives the levels of each factor that have a dummy column (see
+    level_terms(); by default the design columns of df). The relationship is
+    exact, so a random subset of fit_rows rows is enough; the fit is then
+    checked against every row (GLMModel.fit_error).
+    """
+    if terms is None:
+        terms = level_terms(df.columns)
+    rows = np.arange(len(df))
+    if len(df) > fit_rows:
+        rows = np.sort(np.random.default_rng(seed).choice(len(df), fit_rows, replace=False))
+
+    # The intercept is a one-level block kept whole
+    blocks = [(np.zeros(len(rows), dtype=np.intp), 1, [0])]
+    for factor in FACTORS:
+        levels = df[factor].cat.categories
+        blocks.append((df[factor].cat.codes.to_numpy()[rows].astype(np.intp), len(levels),
+                       [levels.get_loc(level) for level in terms[factor]]))
+    continuous_columns = [f'{term}.1' for term in CONTINUOUS_TERMS]
+    continuous = np.column_stack([df[col].to_numpy()[rows].astype(np.float64) for col in continuous_columns])
+    z = np.log(df[PREDICTION].to_numpy()[rows].astype(np.float64))
+    xtx = gram_matrix(blocks, continuous)
+    solution = np.linalg.lstsq(xtx, design_dot(blocks, continuous, z), rcond=None)[0]
+    # Solving the normal equations squares the condition number: one refinement
+    # step on the residuals restores the accuracy of a direct least squares
+    residuals = z - design_times(blocks, continuous, solution)
+    solution += np.linalg.lstsq(xtx, design_dot(blocks, continuous, residuals), rcond=None)[0]
+
+    design = ['Intercept'] + [f'{factor}[T.{level}]' for factor in FACTORS for level in terms[factor]]
+    coefficients = dict(zip(design + continuous_columns, solution))
+
+    relativities = {}
+    for factor in FACTORS:
+        levels = df[factor].cat.categories
+        relativities[factor] = pd.Series(
+            [coefficients.get(f'{factor}[T.{level}]', 0.0) for level in levels], index=levels)
+    slopes = {f'{term}.1': coefficients[f'{term}.1'] for term in CONTINUOUS_TERMS}
+    model = GLMModel(coefficients['Intercept'], relativities, slopes)
+
+    scored = GLMScorer(model, df).score()
+    model.fit_error = float(np.abs(np.log(scored) - np.log(df[PREDICTION].to_numpy())).max())
+    return model
+
+
+class GLMScorer:
+    """Scores the rows of a frame from their category codes and continuous terms
+
+    The continuous part of the linear predictor does not change with what-if
+    adjustments, so it is computed once.
+    """
+
+    def __init__(self, model, df):
+        self.model = model
+        self.codes = {factor: df[factor].cat.codes.to_numpy() for factor in FACTORS}
+        eta = np.full(len(df), model.intercept)
+        for col, slope in model.slopes.items():
+            eta += slope * df[col].to_numpy()
+        self.continuous_eta = eta
+
+    def score(self, adjustments=(), rows=None):
+        """Predicted premium of every row (or of the row positions rows)"""
+        eta = self.continuous_eta if rows is None else self.continuous_eta[rows]
+        eta = eta.copy()
+        for factor, codes in self.codes.items():
+            eta += self.model.table(factor, adjustments)[codes if rows is None else codes[rows]]
+        return np.exp(eta)
+
+
+def adjust_cube(data_cube, adjustments):
+    """Cube with the predicted premium sums re-scored by what-if adjustments
+
+    Every adjusted factor is a cube dimension, so the premium multiplier is
+    constant within a cell and scaling the cell sums is exact.
+    """
+    multiplier = np.ones(data_cube.n_cells)
+    for factor, level, factor_multiplier in adjustments:
+        level_code = list(data_cube.labels[factor]).index(level)
+        multiplier[data_cube.codes[factor] == level_code] *= factor_multiplier
+    measures = dict(data_cube.measures, pred_premium=data_cube.measures['pred_premium'] * multiplier)
+    return Cube(data_cube.labels, data_cube.codes, measures)
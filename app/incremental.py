@@ -0,0 +1,96 @@
+"""
+Incremental evaluation of cube views across filter changes
+
+Adding one region or nudging a range slider changes only a small part of the
+selected cells. An IncrementalView remembers the additive aggregates
+(totals and every group-by asked for) of the previous filter state; the next
+state is reached by XOR-ing the two cell masks and adding the sums of the
+cells that entered minus those that left, so each step costs in proportion
+to the change rather than to the view. When the change is more than half the
+size of the new view the aggregates are simply recomputed. Aggregates served
+from the shared result cache are handed back to the view (remember()), so a
+cache hit does not leave the next step without a state to update.
+
+Only additive statistics are maintained this way. Non-additive ones (median,
+std, quantiles) come from the mergeable per-cell summaries (summaries.py),
+or from the selected rows when a band range splits their cells.
+"""
+
+import numpy as np
+import pandas as pd
+
+from cube import CubeView, grouped_frame, measure_names
+
+# Dense group-by arrays larger than this are not kept between filter states
+MAX_KEPT_GROUPS = 200_000
+
+
+class IncrementalView(CubeView):
+    """CubeView that keeps its aggregates so the next filter state can be derived from them"""
+
+    def __init__(self, cube, mask, spec=None):
+        super().__init__(cube, mask)
+        self.mask = mask
+        self.spec = spec
+        self._groups = {}        # (dims, names) -> dense per-group sums
+        self.stats = {'mode': 'full', 'changed_cells': int(mask.sum())}
+
+    def group_by(self, *dims, measures=None):
+        names = tuple(measure_names(self.cube, measures))
+        key = (dims, names)
+        sums = self._groups.get(key)
+        if sums is None:
+            sums = self.cube.group_arrays(self.cells, dims, names)
+            if len(sums['policies']) <= MAX_KEPT_GROUPS:
+                self._groups[key] = sums
+        return grouped_frame(sums, [self.cube.labels[dim] for dim in dims], dims)
+
+    def remember(self, totals=None, group_by=None):
+        super().remember(totals)
+        if group_by is None:
+            return
+        dims, measures, frame = group_by
+        names = tuple(measure_names(self.cube, measures))
+        labels = [self.cube.labels[dim] for dim in dims]
+        shape = tuple(len(dim_labels) for dim_labels in labels)
+        if (dims, names) in self._groups or int(np.prod(shape)) > MAX_KEPT_GROUPS:
+            return
+        # Back from the frame of occupied groups to the dense arrays kept between states
+        index = frame.index if len(dims) > 1 else pd.MultiIndex.from_arrays([frame.index])
+        codes = [pd.Index(dim_labels).get_indexer(index.get_level_values(i)) for i, dim_labels in enumerate(labels)]
+        groups = np.ravel_multi_index(codes, shape)
+        sums = {}
+        for name in names:
+            sums[name] = np.zeros(int(np.prod(shape)))
+            sums[name][groups] = frame[name].to_numpy()
+        self._groups[(dims, names)] = sums
+
+    def advance(self, spec):
+        """View of another FilterSpec, updated from this one by the changed cells only"""
+        if spec == self.spec:
+            return self
+        mask = self.cube.cell_mask(spec)
+        changed = mask ^ self.mask
+        n_changed = int(changed.sum())
+        view = IncrementalView(self.cube, mask, spec)
+        if 2 * n_changed >= len(view.cells):
+            # Recomputing is cheaper than two delta passes this large
+            return view
+
+        if self._totals is None and not self._groups:
+            # Nothing was aggregated in this state: there is nothing to update
+            return view
+
+        added = np.flatnonzero(changed & mask)
+        removed = np.flatnonzero(changed & self.mask)
+        if self._totals is not None:
+            view._totals = self._totals + self._cell_sums(added) - self._cell_sums(removed)
+        for (dims, names), sums in self._groups.items():
+            plus = self.cube.group_arrays(added, dims, names)
+            minus = self.cube.group_arrays(removed, dims, names)
+            view._groups[(dims, names)] = {name: sums[name] + plus[name] - minus[name] for name in names}
+        view.stats = {'mode': 'delta', 'changed_cells': n_changed}
+        return view
+
+    def _cell_sums(self, cells):
+        return pd.Series({name: values[cells].sum() for name, values in self.cube.measures.items()})
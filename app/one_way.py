@@ -0,0 +1,193 @@
+"""
+One-way factor analysis over every rating factor at once
+
+For each rating factor (the GLM's categorical factors and the continuous
+ones, binned) the one-way table gives exposure, claims, frequency, severity,
+observed vs predicted pure premium and the actual/expected ratio per level.
+
+Bins are fixed per binning ('quantile' or 'log') and bin count, and the bin
+code of every policy for every factor is computed once into one stacked
+array of global bin ids, each factor's codes offset past the previous
+factor's bins. A filter then gathers that array and the measures once, and
+the bincounts of every factor add into one array of sums per measure, from
+which one table of every factor's levels is derived. Claim counts and
+amounts only count the policies with a claim.
+"""
+
+import numpy as np
+import pandas as pd
+
+import glm
+
+CATEGORY_FACTORS = glm.FACTORS
+CONTINUOUS_FACTORS = glm.CONTINUOUS_TERMS + ('Density',)
+FACTORS = CATEGORY_FACTORS + CONTINUOUS_FACTORS
+BINNINGS = ('quantile', 'log')
+DEFAULT_BINS = 10
+SPARSE_FRACTION = 4
+
+
+def _format_edge(value):
+    return f'{value:,.0f}' if float(value).is_integer() else f'{value:,.3g}'
+
+
+def continuous_edges(values, binning='quantile', n_bins=DEFAULT_BINS):
+    """Inner bin edges of a continuous factor, or None when each distinct value gets its own bin
+
+    'quantile' cuts at the quantiles of the values (edges shared by ties are
+    merged); 'log' cuts at equal ratios of value + 1, for skewed factors such
+    as Density.
+    """
+    values = np.asarray(values)
+    distinct = np.unique(values)
+    if len(distinct) <= n_bins:
+        return None
+    low, high = distinct[0], distinct[-1]
+    if binning == 'quantile':
+        edges = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+    elif binning == 'log':
+        edges = np.geomspace(low + 1, high + 1, n_bins + 1)[1:-1] - 1
+        if np.issubdtype(values.dtype, np.integer):
+            edges = np.ceil(edges)
+    else:
+        raise ValueError(f'binning must be one of {BINNINGS}, not {binning!r}')
+    # Ties (e.g. half the book at BonusMalus 50) make repeated edges and edges at the minimum
+    edges = np.unique(edges)
+    return edges[(edges > low) & (edges <= high)]
+
+
+class FactorBins:
+    """Levels of one factor and the code of each value: categories, distinct values or edge bins"""
+
+    def __init__(self, name, labels, edges=None, values=None):
+        self.name = name
+        self.labels = labels
+        self.edges = edges          # inner edges of a binned continuous factor: bin i is [edges[i-1], edges[i])
+        self.values = values        # distinct values of an unbinned continuous factor
+
+    @classmethod
+    def from_column(cls, name, column, binning='quantile', n_bins=DEFAULT_BINS):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return cls(name, list(column.cat.categories))
+        values = column.to_numpy()
+        edges = continuous_edges(values, binning, n_bins)
+        if edges is None:
+            distinct = np.unique(values)
+            return cls(name, [_format_edge(value) for value in distinct], values=distinct)
+        low, high = values.min(), values.max()
+        bounds = [low, *edges, high]
+        labels = [f'[{_format_edge(lo)}, {_format_edge(hi)})' for lo, hi in zip(bounds[:-2], bounds[1:-1])]
+        labels.append(f'[{_format_edge(bounds[-2])}, {_format_edge(high)}]')
+        return cls(name, labels, edges=edges)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def codes(self, column):
+        """Bin code of every value of column"""
+        if self.edges is None and self.values is None:
+            return np.asarray(column.array.codes)
+        values = column.to_numpy()
+        if self.edges is not None:
+            return np.searchsorted(self.edges, values, side='right')
+        return np.searchsorted(self.values, values)
+
+
+class OneWayCodes:
+    """Stacked global bin ids (factor x row) of every factor, for one binning"""
+
+    def __init__(self, bins, codes):
+        self.bins = bins            # factor -> FactorBins
+        self.codes = codes          # (n_factors, n_rows) global bin ids
+        sizes = [len(factor_bins) for factor_bins in bins.values()]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.n_bins = int(self.offsets[-1])
+
+    @classmethod
+    def from_frame(cls, df, binning='quantile', n_bins=DEFAULT_BINS, factors=FACTORS):
+        bins = {factor: FactorBins.from_column(factor, df[factor], binning, n_bins) for factor in factors}
+        dtype = np.int16 if sum(len(factor_bins) for factor_bins in bins.values()) < 2 ** 15 else np.int32
+        codes = np.empty((len(bins), len(df)), dtype=dtype)
+        offset = 0
+        for i, (factor, factor_bins) in enumerate(bins.items()):
+            codes[i] = factor_bins.codes(df[factor]) + offset
+            offset += len(factor_bins)
+        return cls(bins, codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def sums(self, measures, rows=None):
+        """Policies and measure sums per global bin of the selected rows
+
+        measures maps names to values of the selected rows (aligned with rows,
+        or with every row when rows is None). Factors occupy disjoint ranges of
+        global bin ids, so the bincounts of every factor add into one array
+        per measure.
+        """
+        codes = self.codes if rows is None else self.codes[:, rows]
+        # bincount works on intp codes; converting once beats a cast in every call
+        codes = codes.astype(np.intp)
+        sums = {'policies': self._bincounts(codes)}
+        for name, values in measures.items():
+            values = np.asarray(values, dtype=np.float64)
+            # Claim measures are zero for most policies: count only the rows that add to them
+            nonzero = np.flatnonzero(values)
+            if len(nonzero) < len(values) // SPARSE_FRACTION:
+                sums[name] = self._bincounts(codes[:, nonzero], values[nonzero])
+            else:
+                sums[name] = self._bincounts(codes, values)
+        return sums
+
+    def _bincounts(self, codes, weights=None):
+        """Sums of weights per global bin over the stacked codes of every factor"""
+        sums = np.zeros(self.n_bins)
+        for factor_codes in codes:
+            sums += np.bincount(factor_codes, weights=weights, minlength=self.n_bins)
+        return sums
+
+    def table(self, sums):
+        """One-way table of every factor (a Factor and a Level column) from the per-bin sums
+
+        Levels without policies are dropped.
+        """
+        factors = np.repeat(list(self.bins), [len(factor_bins) for factor_bins in self.bins.values()])
+        levels = [label for factor_bins in self.bins.values() for label in factor_bins.labels]
+        table = one_way_table(levels, sums)
+        table.insert(0, 'Factor', factors)
+        # Exposure share within each factor
+        exposure_totals = np.repeat(np.add.reduceat(sums['exposure'], self.offsets[:-1]), np.diff(self.offsets))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['Exposure Share'] = sums['exposure'] / exposure_totals
+        return table[table['Policies'] > 0].reset_index(drop=True)
+
+
+def one_way_table(labels, sums):
+    """Exposure, claims, frequency, severity, observed/predicted pure premium and A/E per level"""
+    table = pd.DataFrame({
+        'Level': labels,
+        'Policies': sums['policies'],
+        'Exposure': sums['exposure'],
+        'Claims': sums['claims'],
+        'ClaimAmount': sums['claim_amount'],
+        'Expected': sums['expected'],
+    })
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['Frequency'] = table['Claims'] / table['Exposure']
+        table['Severity'] = table['ClaimAmount'] / table['Claims']
+        table['Observed PP'] = table['ClaimAmount'] / table['Exposure']
+        table['Predicted PP'] = table['Expected'] / table['Exposure']
+        table['A/E'] = table['ClaimAmount'] / table['Expected']
+    return table
+
+
+def measure_values(frame):
+    """Measures of a one-way analysis from the rows of a frame (Exposure, ClaimNb, ClaimAmount, Pred_GLMs)"""
+    exposure = frame['Exposure'].to_numpy()
+    return {
+        'exposure': exposure,
+        'claims': frame['ClaimNb'].to_numpy(),
+        'claim_amount': frame['ClaimAmount'].to_numpy(),
+        'expected': frame['Pred_GLMs'].to_numpy() * exposure,
+    }
@@ -0,0 +1,102 @@
+"""
+Paged, sorted and searched rows of a selection
+
+The Data Explorer shows one page of the filtered rows at a time instead of
+the first hundred. A SortIndex holds the argsort of one column over every
+row, computed once per column and shared by all sessions. A page of the
+selection in that order is found by walking the sorted positions in blocks,
+keeping those the filter selects and stopping as soon as the page is full:
+the first pages (the largest claims of a region, say) cost a block or two,
+not a pass over the book. An IdIndex sorts IDpol once and finds policies by
+binary search. Both return row positions only; the caller gathers the rows
+of the visible page and nothing else.
+"""
+
+import numpy as np
+import pandas as pd
+
+SCAN_BLOCK = 65_536
+
+
+def _positions(order):
+    """Row positions in the smallest integer type that holds them"""
+    return order.astype(np.int32) if len(order) < 2 ** 31 else order
+
+
+def sort_values(column):
+    """Values a column is sorted by: categoricals by their category order"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.array.codes
+    return column.to_numpy()
+
+
+class SortIndex:
+    """Positions of every row in ascending order of one column"""
+
+    def __init__(self, values):
+        self.order = _positions(np.argsort(values, kind='stable'))
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes
+
+    def rows(self, start, stop, mask=None, descending=False):
+        """Positions of the selected rows ranked [start, stop) in the column's order
+
+        mask is a boolean mask over all rows (None selects every row).
+        """
+        order = self.order[::-1] if descending else self.order
+        if mask is None:
+            return order[start:stop]
+        pieces, seen, needed = [], 0, stop - start
+        for block_start in range(0, len(order), SCAN_BLOCK):
+            block = order[block_start:block_start + SCAN_BLOCK]
+            block = block[mask[block]]
+            skip = max(start - seen, 0)
+            seen += len(block)
+            if seen > start:
+                pieces.append(block[skip:skip + needed])
+                needed -= len(pieces[-1])
+                if needed <= 0:
+                    break
+        return np.concatenate(pieces) if pieces else order[:0]
+
+
+def file_order_rows(rows, n_rows, start, stop):
+    """Positions of the selected rows [start, stop) in file order (rows None selects all n_rows)"""
+    if rows is None:
+        return np.arange(start, min(stop, n_rows))
+    return rows[start:stop]
+
+
+class IdIndex:
+    """Policy ids sorted once, for finding policies by binary search"""
+
+    def __init__(self, ids):
+        ids = np.asarray(ids)
+        self.order = _positions(np.argsort(ids, kind='stable'))
+        self.ids = ids[self.order]
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.ids.nbytes
+
+    def find(self, ids):
+        """Row positions of the given ids, in the order asked; ids not in the book are left out"""
+        ids = np.asarray(ids, dtype=np.int64)
+        left = np.searchsorted(self.ids, ids, side='left')
+        right = np.searchsorted(self.ids, ids, side='right')
+        if not len(ids):
+            return self.order[:0]
+        return np.concatenate([self.order[start:stop] for start, stop in zip(left, right)])
+
+
+def parse_ids(text):
+    """Integer ids in free text separated by commas or whitespace; (ids, invalid tokens)"""
+    ids, invalid = [], []
+    for token in text.replace(',', ' ').split():
+        try:
+            ids.append(int(token))
+        except ValueError:
+            invalid.append(token)
+    return ids, invalid
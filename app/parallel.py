@@ -0,0 +1,200 @@
+"""
+Parallel aggregation over row shards
+
+ParallelExecutor splits the rows into one contiguous shard per worker and
+runs the row scans of the dashboard (filter masks, pivot group sums, value
+counts, histogram ranges and bin counts and the partial cells of the
+aggregation cube) on every shard in a
+thread or process pool, then merges the partials. Threads share the frame
+directly; NumPy releases the GIL in the comparisons, gathers and reductions
+that dominate these scans. Process workers open the columnar store
+themselves, so every process maps the same page cache instead of receiving a
+pickled copy of the data.
+
+Configured with DASHBOARD_WORKERS (default: all cores) and DASHBOARD_POOL
+('thread' or 'process').
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import columnar
+import cube
+import pivot
+
+POOL_KINDS = ('thread', 'process')
+
+
+def default_workers():
+    return int(os.environ.get('DASHBOARD_WORKERS', os.cpu_count() or 1))
+
+
+def default_pool():
+    kind = os.environ.get('DASHBOARD_POOL', 'thread')
+    if kind not in POOL_KINDS:
+        raise ValueError(f'DASHBOARD_POOL must be one of {POOL_KINDS}, not {kind!r}')
+    return kind
+
+
+def shard_bounds(n_rows, n_shards):
+    """(start, stop) of n_shards contiguous row ranges covering n_rows"""
+    edges = np.linspace(0, n_rows, max(n_shards, 1) + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+# Shard tasks: each takes the rows [start, stop) of the frame and returns a partial
+
+def _shard_rows(frame, start, stop, spec):
+    """Positions of the matching rows of the shard (in frame coordinates)"""
+    return np.flatnonzero(spec.row_mask(frame.iloc[start:stop])) + start
+
+
+def _shard_ranges(frame, start, stop, dims):
+    shard = frame.iloc[start:stop]
+    return {dim: (int(shard[dim].min()), int(shard[dim].max())) for dim in dims}
+
+
+def _shard_group_sums(frame, start, stop, spec, dims, labels, names):
+    """Dense per-group measure sums of the matching rows of the shard"""
+    shard = frame.iloc[start:stop]
+    shard = shard[spec.row_mask(shard)]
+    codes = [cube.dimension_codes(shard, dim, labels[i])[0] for i, dim in enumerate(dims)]
+    measures = {name: cube.measure_values(shard, name) for name in names}
+    return cube.grouped_arrays(codes, labels, measures)
+
+
+def _shard_bincount(frame, start, stop, spec, column):
+    shard = frame.iloc[start:stop]
+    return np.bincount(shard[column].to_numpy()[spec.row_mask(shard)].astype(np.intp))
+
+
+def _shard_value_range(frame, start, stop, spec, column):
+    """(min, max) of the finite matching values of the shard, or None without any"""
+    shard = frame.iloc[start:stop]
+    values = shard[column].to_numpy()[spec.row_mask(shard)].astype(np.float64)
+    values = values[np.isfinite(values)]
+    return (values.min(), values.max()) if len(values) else None
+
+
+def _shard_histogram(frame, start, stop, spec, column, edges):
+    shard = frame.iloc[start:stop]
+    values = shard[column].to_numpy()[spec.row_mask(shard)]
+    return np.histogram(values, bins=edges)[0]
+
+
+def _shard_cells(frame, start, stop, labels, spec=None):
+    shard = frame.iloc[start:stop]
+    if spec is not None:
+        shard = shard[spec.row_mask(shard)]
+    return cube.partial_cells(shard, labels)
+
+
+# Process workers open the store once and keep its memory-mapped frame
+_worker_frame = None
+
+
+def _init_worker(store_path, columns):
+    global _worker_frame
+    _worker_frame = columnar.ColumnStore(store_path).frame(columns)
+
+
+def _in_worker(task, start, stop, *args):
+    return task(_worker_frame, start, stop, *args)
+
+
+class ParallelExecutor:
+    """Runs row scans of a frame shard by shard in a worker pool
+
+    store_path (the columnar store the frame was read from) is required for a
+    process pool; thread pools work on the frame itself.
+    """
+
+    def __init__(self, frame, workers=None, kind=None, store_path=None):
+        self.frame = frame
+        self.workers = workers or default_workers()
+        self.kind = kind or default_pool()
+        if self.kind == 'process':
+            if store_path is None:
+                raise ValueError('A process pool needs the columnar store to map the data in each worker')
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                            initargs=(str(store_path), list(frame.columns)))
+        else:
+            self.pool = ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def map_shards(self, task, *args):
+        """Partial results of task over every row shard, in row order"""
+        shards = shard_bounds(len(self.frame), self.workers)
+        if self.pool is None:
+            return [task(self.frame, start, stop, *args) for start, stop in shards]
+        if self.kind == 'process':
+            futures = [self.pool.submit(_in_worker, task, start, stop, *args) for start, stop in shards]
+        else:
+            futures = [self.pool.submit(task, self.frame, start, stop, *args) for start, stop in shards]
+        return [future.result() for future in futures]
+
+    def select(self, spec):
+        """Row positions matching a FilterSpec"""
+        return np.concatenate(self.map_shards(_shard_rows, spec))
+
+    def dimension_labels(self, dims):
+        """Labels of each dimension over all rows (integer ranges merged from the shards)"""
+        labels = {dim: cube.band_labels(dim) for dim in dims if dim in cube.BANDS}
+        integer_dims = [dim for dim in dims if dim not in cube.CATEGORY_DIMENSIONS and dim not in labels]
+        if integer_dims:
+            ranges = self.map_shards(_shard_ranges, integer_dims)
+            for dim in integer_dims:
+                low = min(shard[dim][0] for shard in ranges)
+                high = max(shard[dim][1] for shard in ranges)
+                labels[dim] = list(range(low, high + 1))
+        for dim in dims:
+            if dim not in labels:
+                labels[dim] = list(self.frame[dim].cat.categories)
+        return labels
+
+    def group_sums(self, spec, dims, measures=None):
+        """Measure sums of the matching rows per combination of dims, like CubeView.group_by"""
+        measures = measures or list(cube.MEASURES) + list(cube.COUNT_MEASURES)
+        names = ['policies'] + [m for m in measures if m != 'policies']
+        labels = self.dimension_labels(dims)
+        dim_labels = [labels[dim] for dim in dims]
+        partials = self.map_shards(_shard_group_sums, spec, tuple(dims), dim_labels, names)
+        sums = {name: np.sum([partial[name] for partial in partials], axis=0) for name in names}
+        return cube.grouped_frame(sums, dim_labels, dims)
+
+    def pivot(self, spec, rows, columns=(), metrics=tuple(pivot.PIVOT_METRICS), margins=False):
+        sums = self.group_sums(spec, list(rows) + list(columns), pivot.PIVOT_MEASURES)
+        return pivot.pivot_table(sums, list(rows), list(columns), metrics, margins=margins)
+
+    def histogram(self, spec, column, edges):
+        """Bin counts of the matching values of column over fixed edges"""
+        return np.sum(self.map_shards(_shard_histogram, spec, column, np.asarray(edges)), axis=0)
+
+    def bincount(self, spec, column):
+        """Number of matching rows per value of a non-negative integer column"""
+        partials = self.map_shards(_shard_bincount, spec, column)
+        counts = np.zeros(max(len(partial) for partial in partials), dtype=np.int64)
+        for partial in partials:
+            counts[:len(partial)] += partial
+        return counts
+
+    def binned(self, spec, column, nbins=50):
+        """charts.histogram() bins of the matching values of column: a range pass, then a bin count pass"""
+        ranges = [bounds for bounds in self.map_shards(_shard_value_range, spec, column) if bounds is not None]
+        if not ranges:
+            return {'edges': np.zeros(0), 'counts': np.zeros(0)}
+        low, high = min(low for low, _ in ranges), max(high for _, high in ranges)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        edges = np.linspace(low, high, nbins + 1)
+        return {'edges': edges, 'counts': self.histogram(spec, column, edges)}
+
+    def build_cube(self, spec=None, labels=None):
+        """Aggregation cube merged from the partial cells of every shard (of its rows matching spec, if given)"""
+        labels = labels or self.dimension_labels(cube.DIMENSIONS)
+        return cube.cube_from_cells(labels, *cube.merge_cells(self.map_shards(_shard_cells, labels, spec)))
@@ -0,0 +1,114 @@
+"""
+Vectorized pivot engine
+
+Every pivot metric is a ratio of additive sums (see PIVOT_METRICS), so a pivot
+is computed from one table of group sums: one np.bincount per measure over the
+raveled categorical codes of the row and column dimensions. Subtotals and
+margins are re-aggregations of that small table, never of the rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+import cube
+
+MARGIN_LABEL = 'All'
+
+# Metric -> (numerator measure, denominator measure or None for a plain sum)
+PIVOT_METRICS = {
+    'Frequency': ('claims', 'exposure'),
+    'AvgClaimAmount': ('claim_amount', 'claims'),
+    'AvgPremium': ('pred_premium', 'policies'),
+    'TotalExposure': ('exposure', None),
+    'TotalClaims': ('claims', None),
+    'TotalClaimAmount': ('claim_amount', None),
+    'PolicyCount': ('policies', None),
+    'ClaimRate': ('policies_with_claims', 'policies'),
+}
+PIVOT_MEASURES = ('policies', 'claims', 'exposure', 'claim_amount', 'pred_premium', 'policies_with_claims')
+
+
+def group_sums(df, dims, measures=PIVOT_MEASURES):
+    """Sums of the pivot measures per combination of dims, in one pass over the rows of df"""
+    codes, labels = [], []
+    for dim in dims:
+        dim_codes, dim_labels = cube.dimension_codes(df, dim)
+        codes.append(dim_codes)
+        labels.append(dim_labels)
+    measure_arrays = {name: cube.measure_values(df, name) for name in measures}
+    return cube.grouped_sums(codes, labels, dims, measure_arrays)
+
+
+def metric_values(sums, metric):
+    """One metric for every row of a group sums table; empty denominators give 0"""
+    numerator, denominator = PIVOT_METRICS[metric]
+    values = sums[numerator].to_numpy(dtype=np.float64)
+    if denominator is None:
+        return values
+    denominators = sums[denominator].to_numpy(dtype=np.float64)
+    return np.divide(values, denominators, out=np.zeros_like(values), where=denominators > 0)
+
+
+def _with_margin_levels(sums, dims):
+    """Index levels as categoricals with the margin label sorted last"""
+    sums = sums.reset_index()
+    for dim in dims:
+        labels = [label for label in pd.unique(sums[dim]) if label != MARGIN_LABEL]
+        categories = sorted(labels) + [MARGIN_LABEL]
+        sums[dim] = pd.Categorical(sums[dim].astype(object), categories=categories)
+    return sums.set_index(list(dims)).sort_index()
+
+
+def add_margins(sums, rows, columns=()):
+    """Append subtotal rows for each row-dimension prefix and total columns
+
+    Subtotals of the outer row dimensions (and the grand total) are labelled
+    MARGIN_LABEL on the levels they aggregate over, like Excel's subtotals;
+    when there are column dimensions, a MARGIN_LABEL column total is added too.
+    """
+    rows, columns = list(rows), list(columns)
+    dims = rows + columns
+    sums = sums.reset_index()
+    for dim in dims:
+        sums[dim] = sums[dim].astype(object)
+
+    column_sets = [columns, []] if columns else [columns]
+    parts = []
+    for n_rows in range(len(rows), -1, -1):
+        for column_set in column_sets:
+            keys = rows[:n_rows] + column_set
+            if keys == dims:
+                part = sums
+            elif keys:
+                part = sums.groupby(keys, sort=False)[list(PIVOT_MEASURES)].sum().reset_index()
+            else:
+                part = sums[list(PIVOT_MEASURES)].sum().to_frame().T
+            for dim in dims:
+                if dim not in keys:
+                    part[dim] = MARGIN_LABEL
+            parts.append(part[dims + list(PIVOT_MEASURES)])
+    return _with_margin_levels(pd.concat(parts, ignore_index=True), dims)
+
+
+def pivot_table(sums, rows, columns=(), metrics=tuple(PIVOT_METRICS), margins=False):
+    """Pivot of the metrics from a group sums table indexed by rows + columns
+
+    Without column dimensions the result has one column per metric; with them
+    its columns are (metric, column label...) tuples.
+    """
+    rows, columns = list(rows), list(columns)
+    sums = sums[list(PIVOT_MEASURES)]
+    if margins:
+        sums = add_margins(sums, rows, columns)
+
+    result = pd.DataFrame({metric: metric_values(sums, metric) for metric in metrics}, index=sums.index)
+    if not columns:
+        return result
+    result = result.unstack(columns, fill_value=0)
+    return result
+
+
+def pivot(df, rows, columns=(), metrics=tuple(PIVOT_METRICS), margins=False):
+    """Pivot of the rows of df: group_sums + pivot_table"""
+    sums = group_sums(df, list(rows) + list(columns))
+    return pivot_table(sums, rows, columns, metrics, margins)
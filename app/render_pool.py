@@ -0,0 +1,99 @@
+"""
+Concurrent figure construction
+
+A tab with several charts describes each one as a build function (reduce the
+filtered rows, build the Plotly figure) and submits them all to a
+FigureBatch before laying any of them out. The builds run in a bounded
+thread pool shared by every session, so their NumPy reductions and figure
+construction overlap, and the batch hands the figures back in layout order.
+Workers also serialize each figure once to size its payload, which takes
+that off the script thread as well.
+
+Only the script thread creates Streamlit elements. Builders may read session
+state and cached resources (a batch can attach the submitting session's
+context to the worker first) but must not draw.
+
+Configured with DASHBOARD_RENDER_WORKERS (default: up to 4 cores). With one
+worker every figure is built on the script thread when it is shown, as
+without the pool.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import charts
+
+MAX_DEFAULT_WORKERS = 4
+
+
+def default_workers():
+    return int(os.environ.get('DASHBOARD_RENDER_WORKERS', min(MAX_DEFAULT_WORKERS, os.cpu_count() or 1)))
+
+
+def _timed_build(build, attach=None):
+    """Build and size a figure; returns (figure, payload bytes, build ms, serialize ms)"""
+    if attach is not None:
+        attach()
+    start = time.perf_counter()
+    fig = build()
+    built = time.perf_counter()
+    payload_bytes = charts.payload_bytes(fig)
+    return fig, payload_bytes, (built - start) * 1000, (time.perf_counter() - built) * 1000
+
+
+class RenderPool:
+    """Bounded pool of figure-building threads"""
+
+    def __init__(self, workers=None):
+        self.workers = max(1, default_workers() if workers is None else workers)
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='dashboard-figure')
+
+    def close(self):
+        """Shut the threads down once the figures already submitted are built"""
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def batch(self, attach=None):
+        """A FigureBatch whose builds each call attach() first in their worker thread"""
+        return FigureBatch(self._executor, attach)
+
+
+class FigureBatch:
+    """Figures of one layout, built concurrently and collected in layout order
+
+    result(name) waits for one figure; timings lists, per collected figure,
+    its build and serialize time in the worker and how long the script
+    thread waited for it.
+    """
+
+    def __init__(self, executor=None, attach=None):
+        self._executor = executor
+        self._attach = attach
+        self._pending = {}
+        self.timings = []
+
+    def submit(self, name, build):
+        """Start building a figure (build() returns it); name is used to collect it"""
+        if name in self._pending:
+            raise ValueError(f'Figure {name!r} was already submitted to this batch')
+        if self._executor is None:
+            self._pending[name] = build
+        else:
+            self._pending[name] = self._executor.submit(_timed_build, build, self._attach)
+
+    def result(self, name):
+        """(figure, payload bytes) of a submitted figure, once built"""
+        pending = self._pending.pop(name)
+        start = time.perf_counter()
+        if self._executor is None:
+            fig, payload_bytes, build_ms, serialize_ms = _timed_build(pending)
+            wait_ms = build_ms + serialize_ms
+        else:
+            fig, payload_bytes, build_ms, serialize_ms = pending.result()
+            wait_ms = (time.perf_counter() - start) * 1000
+        self.timings.append({'figure': name, 'build_ms': build_ms, 'serialize_ms': serialize_ms,
+                             'wait_ms': wait_ms})
+        return fig, payload_bytes
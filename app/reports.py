@@ -0,0 +1,224 @@
+"""
+Headless batch reports on the dashboard's aggregation engine
+
+Evaluates a list of views (summary metrics, pivots, frequency tables) for
+each of a list of filter specs, without Streamlit, and writes one table per
+view with a Filter column naming the spec each row came from. Every view is
+answered from the aggregation cube (mapped from the snapshot, or built once
+from the store), so a spec costs a cell mask and a few group sums whatever
+the size of the book. With more than one worker the specs are spread over a
+process pool whose workers each map the cube themselves.
+
+A job is a JSON file:
+
+    {
+      "filters": [{"name": "young drivers", "DrivAge": [0, 35]}, {"name": "all"}],
+      "expand": "Region",
+      "views": [
+        {"name": "metrics", "kind": "metrics"},
+        {"name": "region_brand", "kind": "pivot", "rows": ["Region", "VehBrand"],
+         "columns": ["DataMajor"], "metrics": ["Frequency", "AvgPremium"], "margins": true},
+        {"name": "age_bands", "kind": "frequency", "by": ["DrivAge"]}
+      ]
+    }
+
+Each filter maps cube dimensions to values (categoricals) or [low, high]
+(DrivAge, VehPower), as FilterSpec.to_dict() writes them; ranges must start
+and end at the bounds of the cube's bands. "expand" repeats every filter
+once per level of a dimension (e.g. the 22 regions, or the age bands). Usage:
+
+    python reports.py job.json [--out reports/] [--format CSV|Parquet] [--workers N] [--data-dir DIR]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import columnar
+import cube
+import export
+import pivot
+import snapshot
+from filters import FilterSpec
+
+VIEW_KINDS = ('metrics', 'pivot', 'frequency')
+OUTPUT_FORMATS = {'CSV': '.csv', 'Parquet': '.parquet'}
+
+
+def load_cube(data_dir):
+    """Cube of the dataset in data_dir: mapped from its snapshot, or built from the store
+
+    The store is opened read-only: reports never convert the NPZ files.
+    """
+    try:
+        store = columnar.open_store(data_dir, build=False)
+    except OSError as error:
+        raise FileNotFoundError(f'No current columnar store in {Path(data_dir) / columnar.STORE_DIRNAME}; '
+                                f'build it first with python snapshot.py {data_dir}') from error
+    data_cube = snapshot.load_cube(store)
+    if data_cube is None:
+        data_cube = cube.build_cube(store.frame([col for col in store.columns
+                                                 if not columnar.is_design_column(col)]))
+    return data_cube
+
+
+def parse_filter(filter_dict):
+    """(name, FilterSpec) of one job filter: {column: values or [low, high], 'name': ...}"""
+    filter_dict = dict(filter_dict)
+    name = filter_dict.pop('name', None)
+    unknown = set(filter_dict) - set(cube.DIMENSIONS)
+    if unknown:
+        raise ValueError(f'Filters can only restrict the cube dimensions {cube.DIMENSIONS}, not {sorted(unknown)}')
+    categories = {col: values for col, values in filter_dict.items() if col in cube.CATEGORY_DIMENSIONS}
+    ranges = {col: bounds for col, bounds in filter_dict.items() if col in cube.BANDED_DIMENSIONS}
+    spec = FilterSpec.from_selection(categories, ranges)
+    split = [col for col, low, high in spec.ranges if cube.band_mask(col, low, high) is None]
+    if split:
+        raise ValueError(f'The {split} ranges of a filter must start and end at the bounds of the bands {cube.BANDS}')
+    if name is None:
+        name = json.dumps(spec.to_dict(), sort_keys=True) if spec.to_dict() else 'all'
+    return name, spec
+
+
+def expand(filters, dim, labels):
+    """Every (name, FilterSpec) restricted in turn to each label of dim"""
+    expanded = []
+    for name, spec in filters:
+        for label in labels:
+            restriction = list(cube.band_range(dim, label, label)) if dim in cube.BANDS else [label]
+            spec_dict = dict(spec.to_dict(), **{dim: restriction})
+            expanded.append((f'{name} / {label}', parse_filter(spec_dict)[1]))
+    return expanded
+
+
+def _flat_columns(table):
+    """Pivot with single-level columns ('Frequency | 01_Train') and its row dims as columns"""
+    if isinstance(table.columns, pd.MultiIndex):
+        table = table.copy()
+        table.columns = [' | '.join(str(level) for level in col) for col in table.columns]
+    return table.reset_index()
+
+
+def evaluate_view(view, spec):
+    """DataFrame of one job view over a CubeView"""
+    kind = spec.get('kind')
+    if kind == 'metrics':
+        return pd.DataFrame([cube.summary_metrics(view.totals())])
+    if kind == 'pivot':
+        rows, columns = list(spec['rows']), list(spec.get('columns', []))
+        sums = view.group_by(*(rows + columns), measures=pivot.PIVOT_MEASURES)
+        table = pivot.pivot_table(sums, rows, columns, spec.get('metrics', list(pivot.PIVOT_METRICS)),
+                                  margins=spec.get('margins', False))
+        return _flat_columns(table)
+    if kind == 'frequency':
+        return cube.frequency_table(view, *spec['by'])
+    raise ValueError(f'View kind must be one of {VIEW_KINDS}, not {kind!r}')
+
+
+def evaluate(data_cube, filter_spec, views):
+    """{view name: DataFrame} of every view over the cells matching filter_spec"""
+    view = data_cube.query(filter_spec)
+    return {view_spec['name']: evaluate_view(view, view_spec) for view_spec in views}
+
+
+# Process workers map the cube once and evaluate whole filter specs
+_worker_cube = None
+
+
+def _init_worker(data_dir):
+    global _worker_cube
+    _worker_cube = load_cube(data_dir)
+
+
+def _evaluate_in_worker(filter_spec, views):
+    return evaluate(_worker_cube, filter_spec, views)
+
+
+def run_batch(data_dir, filters, views, workers=1, data_cube=None):
+    """{view name: DataFrame} of every view over every (name, FilterSpec), tagged with a Filter column
+
+    Workers map the cube of data_dir themselves; in process the given
+    data_cube is used (loaded from data_dir when None).
+    """
+    names = [name for name, _ in filters]
+    if workers > 1 and len(filters) > 1:
+        with ProcessPoolExecutor(min(workers, len(filters)), initializer=_init_worker,
+                                 initargs=(str(data_dir),)) as pool:
+            results = list(pool.map(_evaluate_in_worker, [spec for _, spec in filters],
+                                    [views] * len(filters), chunksize=max(1, len(filters) // (4 * workers))))
+    else:
+        if data_cube is None:
+            data_cube = load_cube(data_dir)
+        results = [evaluate(data_cube, spec, views) for _, spec in filters]
+    return {
+        view_spec['name']: pd.concat([result[view_spec['name']].assign(Filter=name)
+                                      for name, result in zip(names, results)], ignore_index=True)
+        for view_spec in views
+    }
+
+
+def write_results(tables, out_dir, fmt='CSV'):
+    """Write one file per view into out_dir; returns their paths"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = out_dir / f'{name}{OUTPUT_FORMATS[fmt]}'
+        # The Filter column first, so files read like one report per filter
+        table = table[['Filter'] + [col for col in table.columns if col != 'Filter']]
+        if fmt == 'Parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def load_job(path, data_cube=None):
+    """(filters, views) of a job file, with "expand" applied using the cube's labels"""
+    job = columnar.read_json(path)
+    views = job.get('views', [])
+    if not views:
+        raise ValueError('A job needs at least one view')
+    for view_spec in views:
+        if 'name' not in view_spec or view_spec.get('kind') not in VIEW_KINDS:
+            raise ValueError(f'Every view needs a name and a kind in {VIEW_KINDS}: {view_spec}')
+    filters = [parse_filter(filter_dict) for filter_dict in job.get('filters', [{'name': 'all'}])]
+    if job.get('expand'):
+        filters = expand(filters, job['expand'], data_cube.labels[job['expand']])
+    return filters, views
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('job', help='JSON job file with filters, expand and views')
+    parser.add_argument('--data-dir', type=Path, default=Path(__file__).resolve().parent)
+    parser.add_argument('--out', type=Path, default=Path('reports'))
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='CSV')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    if args.format == 'Parquet' and not export.parquet_available():
+        parser.error('Parquet output needs the optional pyarrow package')
+
+    start = time.perf_counter()
+    try:
+        data_cube = load_cube(args.data_dir)
+    except FileNotFoundError as error:
+        parser.error(str(error))
+    filters, views = load_job(args.job, data_cube)
+    tables = run_batch(args.data_dir, filters, views, args.workers, data_cube)
+    paths = write_results(tables, args.out, args.format)
+    elapsed = time.perf_counter() - start
+    print(f'{len(filters)} filters x {len(views)} views in {elapsed:.2f}s ({args.workers} workers):')
+    for path in paths:
+        print(f'  {path}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
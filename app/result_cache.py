@@ -0,0 +1,148 @@
+"""
+Filter-fingerprint result cache
+
+Results are keyed by a computation kind ('totals', 'group_by', 'pivot',
+'chart', ...), the dataset version and the fingerprint of the normalized
+filter state plus whatever else identifies the result (dimensions, metrics,
+bins). Nothing is hashed from DataFrames. Entries live in one LRU shared by
+all sessions under a byte budget; hits, misses and evictions are counted per
+kind.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET_BYTES = 256 * 1024 ** 2
+
+
+def result_nbytes(value):
+    """Approximate memory held by a cached result"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_nbytes(k) + result_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU of computed results with a byte budget"""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()    # (kind, key) -> (value, nbytes)
+        self._stats = {}                 # kind -> {'hits', 'misses', 'evictions'}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, kind, event):
+        counters = self._stats.setdefault(kind, {'hits': 0, 'misses': 0, 'evictions': 0})
+        counters[event] += 1
+
+    def get_or_compute(self, kind, key, compute):
+        """Cached result of kind for key, calling compute() on a miss
+
+        compute runs outside the lock, so two sessions missing the same key at
+        once may both compute it; the second result simply replaces the first.
+        """
+        entry_key = (kind, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+                self._count(kind, 'hits')
+                return entry[0]
+            self._count(kind, 'misses')
+
+        value = compute()
+        self.put(kind, key, value)
+        return value
+
+    def put(self, kind, key, value):
+        nbytes = result_nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        entry_key = (kind, key)
+        with self._lock:
+            previous = self._entries.pop(entry_key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[entry_key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                (evicted_kind, _), (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_bytes
+                self._count(evicted_kind, 'evictions')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def counters(self):
+        """Snapshot of the hit/miss/eviction counts per kind"""
+        with self._lock:
+            return {kind: dict(counters) for kind, counters in self._stats.items()}
+
+    def stats(self):
+        """Hit/miss/eviction counts, hit rate, entries and bytes per kind"""
+        with self._lock:
+            entries, sizes = {}, {}
+            for (kind, _), (_, nbytes) in self._entries.items():
+                entries[kind] = entries.get(kind, 0) + 1
+                sizes[kind] = sizes.get(kind, 0) + nbytes
+            rows = []
+            for kind, counters in sorted(self._stats.items()):
+                lookups = counters['hits'] + counters['misses']
+                rows.append({
+                    'Kind': kind, **{name.title(): count for name, count in counters.items()},
+                    'Hit Rate': counters['hits'] / lookups if lookups else np.nan,
+                    'Entries': entries.get(kind, 0), 'Bytes': sizes.get(kind, 0),
+                })
+        return pd.DataFrame(rows, columns=['Kind', 'Hits', 'Misses', 'Evictions', 'Hit Rate', 'Entries', 'Bytes'])
+
+
+class CachedView:
+    """Cube view whose totals and group-bys go through a ResultCache
+
+    prefix identifies the view (dataset version, filter fingerprint and
+    anything else the cube values depend on); the wrapped view only computes
+    results the cache does not hold yet. Results are handed back to the
+    wrapped view (remember()), so an incremental view holds the same
+    aggregates whether they were computed or served.
+    """
+
+    def __init__(self, view, cache, prefix):
+        self.view = view
+        self.cache = cache
+        self.prefix = tuple(prefix)
+
+    def __getattr__(self, name):
+        return getattr(self.view, name)
+
+    def cached(self, kind, key, compute):
+        """compute() through the cache, keyed by this view and key"""
+        return self.cache.get_or_compute(kind, self.prefix + tuple(key), compute)
+
+    def totals(self):
+        totals = self.cache.get_or_compute('totals', self.prefix, self.view.totals)
+        self.view.remember(totals=totals)
+        return totals
+
+    def group_by(self, *dims, measures=None):
+        key = self.prefix + (dims, None if measures is None else tuple(measures))
+        frame = self.cache.get_or_compute('group_by', key, lambda: self.view.group_by(*dims, measures=measures))
+        self.view.remember(group_by=(dims, measures, frame))
+        return frame
@@ -0,0 +1,68 @@
+"""
+Dtype schema for the dashboard frame
+
+data_metadata.json declares int64/float64 for every numeric column, but most of
+them hold small integers or 0/1 dummies. This module picks the smallest dtype
+that represents every value exactly and reports what that saves. Compacted
+columns stay numeric: a 0/1 column becomes int8, which takes the same byte
+per value as bool but still exports as 0/1 rather than True/False.
+"""
+
+import numpy as np
+import pandas as pd
+
+INTEGER_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def compact_dtype(values):
+    """Smallest dtype that holds every value of a numeric column exactly
+
+    Integral columns (including integral floats) become the narrowest signed
+    integer covering their range. Bool columns and columns with fractional or
+    non-finite values keep their dtype.
+    """
+    values = np.asarray(values)
+    if values.dtype == bool or len(values) == 0:
+        return values.dtype
+    if values.dtype.kind == 'f':
+        if not np.isfinite(values).all() or not np.array_equal(values, np.trunc(values)):
+            return values.dtype
+    elif values.dtype.kind not in 'iu':
+        return values.dtype
+
+    low, high = values.min(), values.max()
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return values.dtype
+
+
+def downcast(values):
+    """Values converted to their compact dtype (no copy when already compact)"""
+    return np.asarray(values).astype(compact_dtype(values), copy=False)
+
+
+def declared_nbytes(n_rows, dtype_name):
+    """Bytes a column takes with its data_metadata.json dtype
+
+    Object columns are counted at one pointer per row, which understates their
+    real footprint (the string objects themselves are not counted).
+    """
+    if dtype_name == 'object':
+        return n_rows * np.dtype(object).itemsize
+    return n_rows * np.dtype(dtype_name).itemsize
+
+
+def memory_report(df, declared_dtypes):
+    """Per-column bytes of the frame next to the bytes of the declared dtypes"""
+    n_rows = len(df)
+    nbytes = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'Column': df.columns,
+        'Dtype': [str(dtype) for dtype in df.dtypes],
+        'Declared Dtype': [declared_dtypes.get(col, '') for col in df.columns],
+        'Bytes': nbytes.values,
+        'Declared Bytes': [declared_nbytes(n_rows, declared_dtypes.get(col, 'float64')) for col in df.columns],
+    })
+    return report
@@ -0,0 +1,157 @@
+"""
+Shared-memory dataset host
+
+The columnar store is memory-mapped, so processes reading the same store
+directory already share its pages. Replicas on one node usually do not: each
+container has its own copy of the repository and builds its own store. This
+module publishes the store (with its snapshot of derived indexes) into a
+directory on a tmpfs such as /dev/shm, where every app process on the node
+maps the same pages read-only instead of holding a copy:
+
+    <root>/versions/<dataset version>/   the store files and snapshot
+    <root>/CURRENT                        name of the version to attach
+
+Publishing copies a version in under a temporary name, renames it into
+place and then replaces CURRENT, all under an exclusive lock, so readers see
+either the previous version or the new one, never a partial copy. Old
+versions are removed once later ones replace them (KEEP_VERSIONS), except
+while a process still uses them: every attached store holds a shared lock on
+its version's readers file, so columns and snapshot files it maps lazily
+never disappear under it.
+
+Enable it in the app with DASHBOARD_SHARED_DATA=/dev/shm/motor_dashboard
+(POSIX only: the lock uses flock, so the setting is ignored on Windows). The
+first process publishes the local dataset if nothing is current yet; swap in
+a new dataset on a running node with:
+
+    python shared_data.py [data_dir] [root]
+"""
+
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import columnar
+import snapshot
+
+SHARED_ROOT = os.environ.get('DASHBOARD_SHARED_DATA', '') if os.name == 'posix' else ''
+CURRENT_NAME = 'CURRENT'
+LOCK_NAME = '.lock'
+READERS_NAME = '.readers'
+VERSIONS_DIRNAME = 'versions'
+KEEP_VERSIONS = 2
+
+
+@contextmanager
+def _locked(root, shared=False):
+    """Lock on the shared root: exclusive while a version is published, shared while one is attached"""
+    # Imported here so the module (and the app) still imports where fcntl does not exist
+    import fcntl
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / LOCK_NAME, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _in_use(version_dir):
+    """Whether an attached store still holds the readers lock of a version"""
+    import fcntl
+    with open(version_dir / READERS_NAME, 'a') as readers:
+        try:
+            fcntl.flock(readers, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(readers, fcntl.LOCK_UN)
+        return False
+
+
+def current_version(root=SHARED_ROOT):
+    """Name of the version readers should attach, or None when nothing is published"""
+    try:
+        return (Path(root) / CURRENT_NAME).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _replace_text(path, text):
+    tmp_path = path.with_name(f'{path.name}.tmp-{os.getpid()}')
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+def _prune(versions_dir, current, keep=KEEP_VERSIONS):
+    """Remove all but the keep most recently published versions
+
+    The current one always stays, and so does every version an attached
+    store still uses; those go at a later publish, once released.
+    """
+    published = sorted((path for path in versions_dir.iterdir() if '.tmp-' not in path.name),
+                       key=lambda path: path.stat().st_mtime_ns, reverse=True)
+    for path in published[keep:]:
+        if path.name != current and not _in_use(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def publish(data_dir, root=SHARED_ROOT, make_current=True):
+    """Copy the store of data_dir (built, with its snapshot, if needed) into the shared root
+
+    With make_current=False the version only becomes current when nothing
+    else is. Returns the name of the current version.
+    """
+    root = Path(root)
+    with _locked(root):
+        current = current_version(root)
+        if current is not None and not make_current:
+            return current
+        store = columnar.open_store(data_dir)
+        if snapshot.read_manifest(store) is None:
+            snapshot.build(data_dir)
+        version = columnar.dataset_version(data_dir)
+        versions_dir = root / VERSIONS_DIRNAME
+        target = versions_dir / version
+        if not target.exists():
+            tmp_dir = versions_dir / f'{version}.tmp-{os.getpid()}'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            shutil.copytree(store.path, tmp_dir)
+            os.replace(tmp_dir, target)
+        if version != current:
+            _replace_text(root / CURRENT_NAME, version)
+        _prune(versions_dir, version)
+        return version
+
+
+def attach(root=SHARED_ROOT, version=None):
+    """Read-only ColumnStore over a published version (default: the current one)
+
+    The store keeps a shared lock on the version's readers file until it is
+    garbage collected, so the version is not pruned while in use.
+    """
+    import fcntl
+    root = Path(root)
+    # Under the root lock, so a publish cannot prune the version before it is locked
+    with _locked(root, shared=True):
+        version = version or current_version(root)
+        if version is None:
+            raise FileNotFoundError(2, 'No dataset published', str(root / CURRENT_NAME))
+        store = columnar.ColumnStore(root / VERSIONS_DIRNAME / version)
+        store.readers = open(store.path / READERS_NAME, 'a')
+        fcntl.flock(store.readers, fcntl.LOCK_SH)
+    return store
+
+
+def attach_or_publish(data_dir, root=SHARED_ROOT):
+    """The current shared store, publishing data_dir first when nothing is published yet"""
+    if current_version(root) is None:
+        publish(data_dir, root, make_current=False)
+    return attach(root)
+
+
+if __name__ == '__main__':
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent
+    root = sys.argv[2] if len(sys.argv) > 2 else SHARED_ROOT or '/dev/shm/motor_dashboard'
+    print(f'Published version {publish(data_dir, root)} to {root}')
@@ -0,0 +1,184 @@
+"""
+Mergeable summaries of streamed values
+
+QuantileSketch is a DDSketch-style quantile sketch: values are counted in
+logarithmic buckets whose width grows with the value, so any quantile is
+returned with a relative error of at most relative_accuracy, and two
+sketches of disjoint row blocks merge by adding their bucket counts. Its
+size depends on the spread of the values, not on how many there are.
+ColumnSummary adds the sum of squares for the standard deviation.
+"""
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class _Buckets:
+    """Dense counts of integer bucket indexes, grown as new indexes arrive"""
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _cover(self, low, high):
+        if len(self.counts) == 0:
+            self.offset, self.counts = low, np.zeros(high - low + 1, dtype=np.int64)
+            return
+        new_low, new_high = min(low, self.offset), max(high, self.offset + len(self.counts) - 1)
+        if new_low == self.offset and new_high == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        counts[self.offset - new_low:self.offset - new_low + len(self.counts)] = self.counts
+        self.offset, self.counts = new_low, counts
+
+    def add(self, indexes, counts=None):
+        """Count each index once, or counts[i] times"""
+        if len(indexes) == 0:
+            return
+        low, high = int(indexes.min()), int(indexes.max())
+        self._cover(low, high)
+        added = np.bincount(indexes - self.offset, weights=counts, minlength=len(self.counts))
+        self.counts += added.astype(np.int64, copy=False)
+
+    def merge(self, other):
+        if len(other.counts) == 0:
+            return
+        self._cover(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+
+class QuantileSketch:
+    """Relative-error quantiles, count, sum, min and max of a stream of values"""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive = _Buckets()
+        self.negative = _Buckets()     # buckets of -value
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def index(self, values):
+        """Bucket index of each (positive) value"""
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def value(self, index):
+        """Representative value of a bucket, within relative_accuracy of every value it counts"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return self
+        self.positive.add(self.index(values[values > 0]))
+        self.negative.add(self.index(-values[values < 0]))
+        self.zero_count += int((values == 0).sum())
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same relative accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracies')
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else np.nan
+
+    def quantile(self, q):
+        """Value at quantile q (0..1), within relative_accuracy of the exact order statistic"""
+        if self.count == 0:
+            return np.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+
+        negative = np.cumsum(self.negative.counts[::-1])
+        if len(negative) and rank < negative[-1]:
+            index = self.negative.offset + len(self.negative.counts) - 1 - np.searchsorted(negative, rank, 'right')
+            return max(-self.value(index), self.min)
+        rank -= negative[-1] if len(negative) else 0
+        if rank < self.zero_count:
+            return 0.0
+        rank -= self.zero_count
+        positive = np.cumsum(self.positive.counts)
+        index = self.positive.offset + min(np.searchsorted(positive, rank, 'right'), len(positive) - 1)
+        return min(self.value(index), self.max)
+
+    def quantiles(self, qs):
+        return np.array([self.quantile(q) for q in qs])
+
+    def bucket_values(self):
+        """Representative values (ascending) and counts of the non-empty buckets"""
+        negative = self.negative.offset + np.arange(len(self.negative.counts))
+        positive = self.positive.offset + np.arange(len(self.positive.counts))
+        values = np.concatenate([-self.value(negative[::-1]), [0.0], self.value(positive)])
+        counts = np.concatenate([self.negative.counts[::-1], [self.zero_count], self.positive.counts])
+        nonempty = counts > 0
+        return values[nonempty], counts[nonempty]
+
+
+class ColumnSummary:
+    """Mergeable count, mean, std, min, max and quantile sketch of one column"""
+
+    def __init__(self, sketch=None, sum_squares=0.0):
+        self.sketch = sketch if sketch is not None else QuantileSketch()
+        self.sum_squares = sum_squares
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.sketch.add(values)
+        self.sum_squares += float(np.square(values[np.isfinite(values)]).sum())
+        return self
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.sum_squares += other.sum_squares
+        return self
+
+    @property
+    def count(self):
+        return self.sketch.count
+
+    @property
+    def mean(self):
+        return self.sketch.mean
+
+    @property
+    def std(self):
+        """Sample standard deviation"""
+        n = self.count
+        if n < 2:
+            return np.nan
+        return float(np.sqrt(max(self.sum_squares - n * self.mean ** 2, 0) / (n - 1)))
+
+    @property
+    def min(self):
+        return self.sketch.min if self.count else np.nan
+
+    @property
+    def max(self):
+        return self.sketch.max if self.count else np.nan
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
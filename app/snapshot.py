@@ -0,0 +1,122 @@
+"""
+Prebuilt snapshot of the derived indexes
+
+The columnar store already holds the final frame ready to memory-map. The
+snapshot adds what the dashboard derives from it on startup: the aggregation
+cube (cell codes and measure sums) and the bitmap filter index (one packed
+bitset per filter value), written as ``.npy`` files in ``columns/snapshot``.
+Loading them memory-maps a few MB instead of scanning every row, so a fresh
+replica serves its first session without building anything. The snapshot
+records the sources of the store it was built from and is ignored once the
+store is rebuilt.
+
+Build the store and the snapshot offline (e.g. in the container image) with:
+
+    python snapshot.py [data_dir]
+"""
+
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import columnar
+import cube
+from filter_index import FilterIndex
+
+SNAPSHOT_DIRNAME = 'snapshot'
+SNAPSHOT_FORMAT_VERSION = 3
+
+
+def snapshot_dir(store):
+    return store.path / SNAPSHOT_DIRNAME
+
+
+def write_snapshot(store, data_cube, filter_index):
+    """Write the cube and filter index of a store's frame next to its columns"""
+    out_dir = snapshot_dir(store)
+    tmp_dir = out_dir.with_name(f'{out_dir.name}.tmp-{os.getpid()}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    for dim, codes in data_cube.codes.items():
+        np.save(tmp_dir / f'cube-code-{dim}.npy', codes)
+    for name, sums in data_cube.measures.items():
+        np.save(tmp_dir / f'cube-measure-{name}.npy', sums)
+    for col, bits in filter_index.value_bits.items():
+        np.save(tmp_dir / f'index-value-{col}.npy', np.stack(list(bits.values())))
+    for col, (_, cumulative) in filter_index.range_bits.items():
+        np.save(tmp_dir / f'index-range-{col}.npy', np.stack(cumulative))
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'store_source': store.manifest['source'],
+        'n_rows': filter_index.n_rows,
+        'cube': {'labels': data_cube.labels, 'dimensions': list(data_cube.codes),
+                 'measures': list(data_cube.measures)},
+        'index': {'values': {col: list(bits) for col, bits in filter_index.value_bits.items()},
+                  'ranges': {col: low for col, (low, _) in filter_index.range_bits.items()}},
+    }
+    with open(tmp_dir / columnar.MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+def read_manifest(store):
+    """Manifest of the store's snapshot, or None when it is missing or was built from other sources"""
+    path = snapshot_dir(store) / columnar.MANIFEST_NAME
+    if not path.exists():
+        return None
+    manifest = columnar.read_json(path)
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    if manifest['store_source'] != store.manifest['source'] or manifest['n_rows'] != store.n_rows:
+        return None
+    return manifest
+
+
+def _load(store, file_name):
+    return np.load(snapshot_dir(store) / file_name, mmap_mode='r')
+
+
+def load_cube(store):
+    """Memory-mapped cube of the snapshot, or None without a current snapshot"""
+    manifest = read_manifest(store)
+    if manifest is None:
+        return None
+    info = manifest['cube']
+    codes = {dim: _load(store, f'cube-code-{dim}.npy') for dim in info['dimensions']}
+    measures = {name: _load(store, f'cube-measure-{name}.npy') for name in info['measures']}
+    return cube.Cube(info['labels'], codes, measures)
+
+
+def load_filter_index(store, df):
+    """Memory-mapped filter index of the snapshot over df, or None without a current snapshot"""
+    manifest = read_manifest(store)
+    if manifest is None:
+        return None
+    info = manifest['index']
+    value_bits = {}
+    for col, labels in info['values'].items():
+        bits = _load(store, f'index-value-{col}.npy')
+        value_bits[col] = dict(zip(labels, bits))
+    range_bits = {col: (low, list(_load(store, f'index-range-{col}.npy'))) for col, low in info['ranges'].items()}
+    return FilterIndex.from_bitsets(df, value_bits, range_bits)
+
+
+def build(data_dir):
+    """Build (or refresh) the store of data_dir and its snapshot"""
+    store = columnar.open_store(data_dir)
+    df = store.frame([col for col in store.columns if not columnar.is_design_column(col)])
+    return write_snapshot(store, cube.build_cube(df), FilterIndex(df))
+
+
+if __name__ == '__main__':
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent
+    print(f'Wrote snapshot to {build(target)}')
@@ -0,0 +1,232 @@
+"""
+Mergeable per-cell summaries for non-additive statistics
+
+Medians, quartiles, standard deviations, maxima and correlations cannot be
+summed like the measures of the aggregation cube. CellSummaries keeps them
+per summary cell, one per occupied combination of the cube's dimensions,
+the DrivAge and VehPower bands included (SUMMARY_DIMENSIONS):
+
+- for Pred_GLMs and PurePremium, the bucket counts of a QuantileSketch plus
+  the sum, sum of squares, min and max of the values;
+- for the correlation columns, their sums and cross-products.
+
+The number of summary cells is bounded by the cube's (about 95k for the
+bundled data, 40 MB) and the sketch buckets per cell by the range of the
+values, so the memory does not grow with the number of policies. A filter
+the cube answers from its cells, band-aligned ranges included, selects whole
+summary cells, and its summary merges them. A range splitting a band is
+answered from a cube of the selected rows, whose cells are not these: the
+caller then computes the statistic from the filtered rows instead.
+
+Error bounds: quantiles (median, quartiles, box whiskers and outliers) are
+within SKETCH_ACCURACY (1%) relative error of the exact order statistic, as
+for the sketch of the rows themselves; merging cells loses nothing. Count,
+mean, std, min, max and correlations are exact up to floating-point
+rounding.
+"""
+
+import numpy as np
+import pandas as pd
+
+import cube
+from sketches import ColumnSummary, QuantileSketch
+
+SUMMARY_DIMENSIONS = cube.DIMENSIONS
+SKETCH_COLUMNS = ('Pred_GLMs', 'PurePremium')
+CORRELATION_COLUMNS = ('VehPower', 'VehAge', 'DrivAge', 'BonusMalus', 'Density', 'ClaimNb', 'Pred_GLMs')
+SKETCH_ACCURACY = 0.01
+
+
+def _take(values, cells):
+    """values at the given (sorted, distinct) cells, without a copy when that is every cell"""
+    return values if len(cells) == len(values) else values[cells]
+
+
+class _ColumnCells:
+    """Sketch bucket counts, sum of squares, min and max of one column per cell"""
+
+    def __init__(self, n_cells, relative_accuracy=SKETCH_ACCURACY):
+        self.n_cells = n_cells
+        self.relative_accuracy = relative_accuracy
+        self.template = QuantileSketch(relative_accuracy)
+        # Bucket indexes of every finite float64 fit in index_bits, packed with the cell into one key
+        max_index = int(np.ceil(750 / np.log(self.template.gamma)))
+        self.index_bits = int(max_index * 2 + 1).bit_length()
+        self.sum_squares = np.zeros(n_cells)
+        self.min = np.full(n_cells, np.inf)
+        self.max = np.full(n_cells, -np.inf)
+        self.zero = np.zeros(n_cells, dtype=np.int32)
+        # sign -> (cell, bucket index, count) of the occupied buckets, sorted by cell and index
+        empty = np.zeros(0, dtype=np.int32)
+        self.buckets = {sign: (empty, empty, empty) for sign in (1, -1)}
+
+    @property
+    def nbytes(self):
+        dense = self.sum_squares.nbytes + self.min.nbytes + self.max.nbytes + self.zero.nbytes
+        return dense + sum(array.nbytes for buckets in self.buckets.values() for array in buckets)
+
+    def add(self, cells, values):
+        finite = np.isfinite(values)
+        cells, values = cells[finite], values[finite]
+        self.sum_squares += np.bincount(cells, weights=values * values, minlength=self.n_cells)
+        np.minimum.at(self.min, cells, values)
+        np.maximum.at(self.max, cells, values)
+        self.zero += np.bincount(cells[values == 0], minlength=self.n_cells).astype(np.int32)
+        offset = 1 << (self.index_bits - 1)
+        for sign in (1, -1):
+            side = values * sign > 0
+            bucket_cells, indexes, counts = self.buckets[sign]
+            keys = np.concatenate([
+                (bucket_cells.astype(np.int64) << self.index_bits) + indexes + offset,
+                (cells[side].astype(np.int64) << self.index_bits) + self.template.index(values[side] * sign) + offset,
+            ])
+            keys, positions = np.unique(keys, return_inverse=True)
+            counts = np.bincount(positions, weights=np.concatenate([counts, np.ones(side.sum())]))
+            self.buckets[sign] = ((keys >> self.index_bits).astype(np.int32),
+                                  ((keys & ((1 << self.index_bits) - 1)) - offset).astype(np.int32),
+                                  counts.astype(np.int32))
+
+    def summaries(self, cells, groups, n_groups, counts, sums):
+        """One ColumnSummary per group, merged from the given cells
+
+        groups gives the group of each of cells; counts and sums give the
+        number of policies and the sum of the column in every cell.
+        """
+        cell_groups = np.full(self.n_cells, -1, dtype=np.intp)
+        cell_groups[cells] = groups
+        sketches = [QuantileSketch(self.relative_accuracy) for _ in range(n_groups)]
+        for sign in (1, -1):
+            bucket_cells, indexes, bucket_counts = self.buckets[sign]
+            bucket_groups = cell_groups[bucket_cells]
+            kept = np.flatnonzero(bucket_groups >= 0)
+            if len(kept) == 0:
+                continue
+            bucket_groups, indexes = bucket_groups[kept], indexes[kept]
+            low = int(indexes.min())
+            span = int(indexes.max()) - low + 1
+            dense = np.bincount(bucket_groups * span + (indexes - low), weights=bucket_counts[kept],
+                                minlength=n_groups * span).reshape(n_groups, span)
+            for sketch, group_counts in zip(sketches, dense):
+                nonempty = np.flatnonzero(group_counts)
+                buckets = sketch.positive if sign == 1 else sketch.negative
+                buckets.add(nonempty + low, group_counts[nonempty])
+
+        def per_group(values):
+            return np.bincount(groups, weights=_take(values, cells), minlength=n_groups)
+        zero, count, total, sum_squares = (per_group(self.zero), per_group(counts),
+                                           per_group(sums), per_group(self.sum_squares))
+        low, high = np.full(n_groups, np.inf), np.full(n_groups, -np.inf)
+        np.minimum.at(low, groups, _take(self.min, cells))
+        np.maximum.at(high, groups, _take(self.max, cells))
+
+        summaries = []
+        for g, sketch in enumerate(sketches):
+            sketch.zero_count, sketch.count, sketch.sum = int(zero[g]), int(count[g]), float(total[g])
+            sketch.min, sketch.max = float(low[g]), float(high[g])
+            summaries.append(ColumnSummary(sketch, float(sum_squares[g])))
+        return summaries
+
+
+class CellSummaries:
+    """Quantile sketches and moment sums per summary cell (combination of the dimensions of a cube)"""
+
+    def __init__(self, data_cube, sketch_columns=SKETCH_COLUMNS, correlation_columns=CORRELATION_COLUMNS,
+                 dims=SUMMARY_DIMENSIONS):
+        self.cube = data_cube
+        self.dims = list(dims)
+        self.shape = tuple(len(data_cube.labels[dim]) for dim in self.dims)
+        cube_keys = np.ravel_multi_index([data_cube.codes[dim] for dim in self.dims], self.shape)
+        # Summary cell keys, and the summary cell of every cube cell
+        self.keys, self.cube_cells = np.unique(cube_keys, return_inverse=True)
+        self.n_cells = len(self.keys)
+        self.codes = dict(zip(self.dims, np.unravel_index(self.keys, self.shape)))
+        self.policies = np.bincount(self.cube_cells, weights=data_cube.measures['policies'], minlength=self.n_cells)
+
+        self.columns = {col: _ColumnCells(self.n_cells) for col in sketch_columns}
+        self.correlation_columns = list(correlation_columns)
+        n_columns = len(self.correlation_columns)
+        self.pairs = [(i, j) for i in range(n_columns) for j in range(i, n_columns)]
+        self.sums = {col: np.zeros(self.n_cells) for col in dict.fromkeys(list(self.columns) + self.correlation_columns)}
+        self.products = np.zeros((self.n_cells, len(self.pairs)))
+
+    @property
+    def columns_needed(self):
+        """Columns a block passed to add() must hold"""
+        return self.dims + [col for col in self.sums if col not in self.dims]
+
+    @property
+    def nbytes(self):
+        return (self.keys.nbytes + self.cube_cells.nbytes + self.policies.nbytes
+                + sum(column.nbytes for column in self.columns.values())
+                + sum(sums.nbytes for sums in self.sums.values()) + self.products.nbytes)
+
+    def cells_of(self, cube_cells):
+        """Summary cells holding exactly the policies of the given cube cells, or None when they split one"""
+        cells = np.unique(self.cube_cells[cube_cells])
+        if self.policies[cells].sum() != self.cube.measures['policies'][cube_cells].sum():
+            return None
+        return cells
+
+    def add(self, block):
+        """Add the rows of block to their summary cells"""
+        row_codes = [cube.dimension_codes(block, dim, self.cube.labels[dim])[0] for dim in self.dims]
+        cells = np.searchsorted(self.keys, np.ravel_multi_index(row_codes, self.shape))
+        for col, column_cells in self.columns.items():
+            column_cells.add(cells, block[col].to_numpy().astype(np.float64))
+        for col, sums in self.sums.items():
+            sums += np.bincount(cells, weights=block[col].to_numpy(), minlength=self.n_cells)
+        values = [block[col].to_numpy().astype(np.float64) for col in self.correlation_columns]
+        for k, (i, j) in enumerate(self.pairs):
+            self.products[:, k] += np.bincount(cells, weights=values[i] * values[j], minlength=self.n_cells)
+        return self
+
+    def summary(self, column, cells):
+        """ColumnSummary (count, mean, std, min, max, quantiles) of column over the given summary cells"""
+        cells = np.asarray(cells)
+        return self.columns[column].summaries(cells, np.zeros(len(cells), dtype=np.intp), 1,
+                                              self.policies, self.sums[column])[0]
+
+    def group_summaries(self, column, cells, dim):
+        """{label: ColumnSummary} of column over the given summary cells, per label of one of their dimensions"""
+        cells = np.asarray(cells)
+        labels = self.cube.labels[dim]
+        groups = _take(self.codes[dim], cells).astype(np.intp)
+        summaries = self.columns[column].summaries(cells, groups, len(labels), self.policies, self.sums[column])
+        return {label: summary for label, summary in zip(labels, summaries) if summary.count}
+
+    def correlation(self, cells):
+        """Correlation matrix of the correlation columns over the given summary cells"""
+        cells = np.asarray(cells)
+        sums = np.array([_take(self.sums[col], cells).sum() for col in self.correlation_columns])
+        cross = np.zeros((len(self.correlation_columns),) * 2)
+        for (i, j), total in zip(self.pairs, _take(self.products, cells).sum(axis=0)):
+            cross[i, j] = cross[j, i] = total
+        return correlation_matrix(_take(self.policies, cells).sum(), sums, cross, self.correlation_columns)
+
+
+def correlation_matrix(n, sums, cross, columns):
+    """Correlation matrix of columns from their count, sums and matrix of cross-product sums"""
+    covariance = cross / n - np.outer(sums, sums) / n ** 2
+    scale = np.sqrt(np.diag(covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = covariance / np.outer(scale, scale)
+    return pd.DataFrame(corr, index=list(columns), columns=list(columns))
+
+
+def block_correlation(blocks, columns=CORRELATION_COLUMNS):
+    """Correlation matrix of columns over row blocks, from their running sums and cross-products"""
+    n, sums, cross = 0, np.zeros(len(columns)), np.zeros((len(columns),) * 2)
+    for block in blocks:
+        values = block[list(columns)].to_numpy(dtype=np.float64)
+        n += len(values)
+        sums += values.sum(axis=0)
+        cross += values.T @ values
+    return correlation_matrix(n, sums, cross, columns)
+
+
+def build_summaries(data_cube, blocks):
+    """CellSummaries of the rows of blocks (frames, or row blocks streamed from disk)"""
+    summaries = CellSummaries(data_cube)
+    for block in blocks:
+        summaries.add(block)
+    return summaries
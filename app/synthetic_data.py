@@ -0,0 +1,238 @@
+"""
+Synthetic French Motor Insurance data generator
+
+Writes data_numeric.npz / data_categorical.npz that follow data_metadata.json
+and category_mappings.json, so the dashboard and the benchmarks can run
+without the real dataset and at any scale. Columns are derived from the
+schema: categorical columns from the mappings, treatment dummies from their
+'Factor[T.level]' names, capped continuous terms from their '.1' names, and
+Pred_GLMs from a log-linear rating structure over those terms, so the stored
+design matrix reproduces the prediction exactly.
+
+Rows are generated and written block by block into the NPZ members, so 10M
+rows need no more memory than one block.
+
+Usage:
+    python synthetic_data.py --out DIR [--rows N] [--seed S] [--reuse-categorical] [--force]
+
+Existing dataset files in DIR are only replaced with --force, so the app's
+own dataset is never overwritten by accident.
+"""
+
+import argparse
+import json
+import shutil
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parent
+BLOCK_ROWS = 500_000
+DATASET_FILES = ('data_numeric.npz', 'data_categorical.npz', 'data_metadata.json', 'category_mappings.json')
+
+# Caps applied to the raw columns before they enter the design matrix as '<column>.1'
+TERM_CAPS = {'VehPower': 9, 'VehAge': 20, 'DrivAge': 90, 'BonusMalus': 150}
+# Slopes of the continuous terms in the rating structure (BonusMalus relative to 50)
+TERM_SLOPES = {'VehPower': 0.02, 'VehAge': -0.01, 'DrivAge': -0.004, 'BonusMalus': 0.012}
+BASE_LOG_PREMIUM = 4.2
+
+
+def read_schema(data_dir=DATA_DIR):
+    with open(Path(data_dir) / 'data_metadata.json', 'r') as f:
+        metadata = json.load(f)
+    with open(Path(data_dir) / 'category_mappings.json', 'r') as f:
+        category_mappings = json.load(f)
+    return metadata, category_mappings
+
+
+def _categorical_weights(n_categories, rng):
+    """Skewed category frequencies so a few values dominate, like the real book"""
+    weights = rng.gamma(0.8, size=n_categories) + 0.05
+    return weights / weights.sum()
+
+
+def dummy_terms(metadata):
+    """(column, factor, level) of every treatment dummy column of the schema"""
+    terms = []
+    for col in metadata['numeric_columns']:
+        if '[T.' in col:
+            factor, level = col[:-1].split('[T.')
+            terms.append((col, factor, level))
+    return terms
+
+
+def continuous_terms(metadata):
+    """Raw columns that enter the design matrix as '<column>.1'"""
+    return [col[:-2] for col in metadata['numeric_columns'] if col.endswith('.1')]
+
+
+def rating_structure(metadata, category_mappings, seed=42):
+    """Category frequencies and log relativities (base level 0), drawn once per seed"""
+    rng = np.random.default_rng([seed, 0])
+    weights, relativities = {}, {}
+    for col in metadata['categorical_columns']:
+        n_categories = len(category_mappings[col])
+        if col == 'DataMajor':
+            split = np.array([0.6, 0.2, 0.2])[:n_categories]
+            weights[col] = split / split.sum()
+        else:
+            weights[col] = _categorical_weights(n_categories, rng)
+    for factor in sorted({factor for _, factor, _ in dummy_terms(metadata)}):
+        coefs = rng.normal(0, 0.15, size=len(category_mappings[factor]))
+        coefs[0] = 0.0
+        relativities[factor] = coefs
+    return {'weights': weights, 'relativities': relativities}
+
+
+def generate_block(n_rows, first_id, metadata, category_mappings, structure, rng, categorical_codes=None):
+    """Numeric and categorical matrices of n_rows policies with IDpol from first_id
+
+    When categorical_codes (rows of an existing data_categorical.npz matrix) is
+    given, its codes are reused so only the numeric columns are synthesized.
+    """
+    categorical = {}
+    for col_idx, col in enumerate(metadata['categorical_columns']):
+        if categorical_codes is not None:
+            categorical[col] = categorical_codes[:, col_idx].astype(np.int32)
+        else:
+            weights = structure['weights'][col]
+            categorical[col] = rng.choice(len(weights), size=n_rows, p=weights).astype(np.int32)
+
+    values = {}
+    values['IDpol'] = np.arange(first_id, first_id + n_rows, dtype=np.float64)
+    values['Exposure'] = np.clip(rng.beta(1.2, 0.8, size=n_rows), 0.0027, 1.0)
+    values['VehPower'] = np.clip(rng.poisson(6.5, size=n_rows), 4, 15).astype(np.float64)
+    values['VehAge'] = np.clip(rng.gamma(1.6, 4.5, size=n_rows), 0, 100).round()
+    values['DrivAge'] = np.clip(rng.normal(46, 14, size=n_rows), 18, 100).round()
+    young = values['DrivAge'] < 30
+    bonus = 50 + rng.geometric(0.25, size=n_rows) - 1 + np.where(young, rng.integers(0, 40, n_rows), 0)
+    values['BonusMalus'] = np.clip(bonus, 50, 230).astype(np.float64)
+    # Density follows Area: A is rural, F is dense urban
+    log_density = 2.5 + 1.1 * categorical['Area'] + rng.normal(0, 0.6, size=n_rows)
+    values['Density'] = np.clip(np.exp(log_density), 1, 27000).round()
+
+    # Rating structure: log-linear relativities per category plus capped continuous terms
+    eta = np.full(n_rows, BASE_LOG_PREMIUM)
+    for factor, coefs in structure['relativities'].items():
+        eta += coefs[categorical[factor]]
+    for source in continuous_terms(metadata):
+        term = np.minimum(values[source], TERM_CAPS.get(source, np.inf))
+        values[f'{source}.1'] = term
+        offset = 50 if source == 'BonusMalus' else 0
+        eta += TERM_SLOPES.get(source, 0.0) * (term - offset)
+    pred = np.exp(eta)
+
+    frequency_rate = 0.07 * np.exp(eta - BASE_LOG_PREMIUM)
+    claim_nb = rng.poisson(frequency_rate * values['Exposure'])
+    severity = rng.lognormal(7.2, 1.1, size=n_rows)
+    claim_amount = np.where(claim_nb > 0, claim_nb * severity, 0.0).round(2)
+
+    values['ClaimNb'] = claim_nb.astype(np.float64)
+    values['ClaimAmount'] = claim_amount
+    values['PurePremium'] = claim_amount / values['Exposure']
+    values['Frequency'] = claim_nb / values['Exposure']
+    values['AvgClaimAmount'] = np.divide(claim_amount, claim_nb, out=np.zeros(n_rows), where=claim_nb > 0)
+    values['Intercept'] = np.ones(n_rows)
+    values['log_Exposure'] = np.log(values['Exposure'])
+    values['cnt'] = np.ones(n_rows)
+    values['Pred_GLMs'] = pred
+    values['Pred_GLMs_e'] = pred * values['Exposure']
+
+    # Treatment-coded dummies, e.g. Region[T.R21]
+    for col, factor, level in dummy_terms(metadata):
+        code = category_mappings[factor].index(level)
+        values[col] = (categorical[factor] == code).astype(np.float64)
+
+    missing = [col for col in metadata['numeric_columns'] if col not in values]
+    if missing:
+        raise ValueError(f'No generator for numeric columns {missing}')
+    numeric = np.column_stack([values[col] for col in metadata['numeric_columns']])
+    categorical_matrix = np.column_stack([categorical[col] for col in metadata['categorical_columns']])
+    return numeric, categorical_matrix
+
+
+def generate(n_rows, metadata, category_mappings, seed=42, categorical_codes=None):
+    """Numeric and categorical matrices of n_rows policies, in memory"""
+    structure = rating_structure(metadata, category_mappings, seed)
+    rng = np.random.default_rng([seed, 1])
+    if categorical_codes is not None:
+        n_rows = len(categorical_codes)
+    return generate_block(n_rows, 1, metadata, category_mappings, structure, rng, categorical_codes)
+
+
+class _NpzWriter:
+    """Writes one array into an NPZ file row block by row block"""
+
+    def __init__(self, path, shape, dtype):
+        self.archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.member = self.archive.open('data.npy', 'w', force_zip64=True)
+        header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False,
+                  'shape': tuple(shape)}
+        np.lib.format.write_array_header_1_0(self.member, header)
+        self.dtype = np.dtype(dtype)
+
+    def write(self, rows):
+        self.member.write(np.ascontiguousarray(rows, dtype=self.dtype).tobytes())
+
+    def close(self):
+        self.member.close()
+        self.archive.close()
+
+
+def write_dataset(out_dir, n_rows, seed=42, block_rows=BLOCK_ROWS, categorical_codes=None, schema_dir=DATA_DIR):
+    """Generate n_rows policies block by block into out_dir, with the schema files next to them"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    metadata, category_mappings = read_schema(schema_dir)
+    if categorical_codes is not None:
+        n_rows = len(categorical_codes)
+    structure = rating_structure(metadata, category_mappings, seed)
+
+    numeric = _NpzWriter(out_dir / 'data_numeric.npz', (n_rows, len(metadata['numeric_columns'])), np.float64)
+    categorical = _NpzWriter(out_dir / 'data_categorical.npz',
+                             (n_rows, len(metadata['categorical_columns'])), np.int32)
+    try:
+        for block, start in enumerate(range(0, n_rows, block_rows)):
+            stop = min(start + block_rows, n_rows)
+            rng = np.random.default_rng([seed, 1, block])
+            codes = None if categorical_codes is None else categorical_codes[start:stop]
+            numeric_rows, categorical_rows = generate_block(stop - start, start + 1, metadata, category_mappings,
+                                                            structure, rng, codes)
+            numeric.write(numeric_rows)
+            categorical.write(categorical_rows)
+    finally:
+        numeric.close()
+        categorical.close()
+
+    if out_dir.resolve() != Path(schema_dir).resolve():
+        shutil.copy(Path(schema_dir) / 'category_mappings.json', out_dir)
+        with open(out_dir / 'data_metadata.json', 'w') as f:
+            json.dump(dict(metadata, shape=[n_rows, len(metadata['columns'])]), f, indent=2)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic dashboard data')
+    parser.add_argument('--rows', type=int, default=678013)
+    parser.add_argument('--out', type=Path, required=True, help='directory to write the dataset into')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS)
+    parser.add_argument('--reuse-categorical', action='store_true',
+                        help='keep the codes of the existing data_categorical.npz and synthesize only the numeric columns')
+    parser.add_argument('--force', action='store_true', help='replace dataset files already in --out')
+    args = parser.parse_args()
+    existing = [name for name in DATASET_FILES if (args.out / name).exists()]
+    if existing and not args.force:
+        parser.error(f'{args.out} already holds {", ".join(existing)}; pass --force to replace them')
+
+    categorical_codes = None
+    if args.reuse_categorical:
+        categorical_codes = np.load(DATA_DIR / 'data_categorical.npz')['data']
+    write_dataset(args.out, args.rows, args.seed, args.block_rows, categorical_codes)
+    n_rows = args.rows if categorical_codes is None else len(categorical_codes)
+    print(f'Wrote {n_rows:,} rows to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Shared fixtures: a small seeded book with the columns of the dashboard dataset"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_data
+
+N_ROWS = 20_000
+DATASET_ROWS = 6_000
+
+
+def _categorical(rng, labels, n_rows):
+    return pd.Categorical.from_codes(rng.integers(0, len(labels), n_rows), categories=labels)
+
+
+@pytest.fixture(scope='session')
+def book():
+    rng = np.random.default_rng(7)
+    n = N_ROWS
+    claims = rng.poisson(0.1, n)
+    amount = np.where(claims > 0, rng.lognormal(7, 1.2, n) * claims, 0.0)
+    exposure = rng.uniform(0.05, 1.0, n)
+    df = pd.DataFrame({
+        'IDpol': rng.permutation(np.arange(1, n + 1) * 3),
+        'DataMajor': _categorical(rng, ['Test', 'Train'], n),
+        'Region': _categorical(rng, ['R11', 'R21', 'R24', 'R52', 'R82', 'R93'], n),
+        'Area': _categorical(rng, list('ABCDEF'), n),
+        'VehBrand': _categorical(rng, ['B1', 'B10', 'B12', 'B2', 'B5'], n),
+        'VehGas': _categorical(rng, ['Diesel', 'Regular'], n),
+        'DrivAge': rng.integers(18, 91, n),
+        'VehPower': rng.integers(4, 16, n),
+        'VehAge': rng.integers(0, 21, n),
+        'BonusMalus': np.where(rng.random(n) < 0.5, 50, rng.integers(50, 231, n)),
+        'Density': rng.lognormal(6, 1.8, n).round(),
+        'ClaimNb': claims,
+        'Exposure': exposure,
+        'ClaimAmount': amount,
+        'Pred_GLMs': rng.lognormal(5, 0.6, n),
+    })
+    df['PurePremium'] = df['ClaimAmount'] / df['Exposure']
+    return df
+
+
+@pytest.fixture(scope='session')
+def dataset_dir(tmp_path_factory):
+    """A small synthetic dataset (NPZ files and schema, as shipped with the app) in a temporary directory"""
+    return synthetic_data.write_dataset(tmp_path_factory.mktemp('dataset'), DATASET_ROWS, block_rows=2_500)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import charts
+from sketches import ColumnSummary
+
+
+def test_histogram_counts_every_finite_value():
+    values = np.random.default_rng(4).lognormal(4, 1, 10_000)
+    hist = charts.histogram(np.append(values, [np.nan, np.inf]), 40)
+    assert len(hist['edges']) == 41 and hist['counts'].sum() == len(values)
+    assert (hist['edges'][0], hist['edges'][-1]) == (values.min(), values.max())
+
+
+def test_weighted_histogram_equals_expanded_rows():
+    values, weights = np.arange(18, 91), np.random.default_rng(5).integers(0, 50, 73)
+    weighted = charts.histogram(values, 10, weights)
+    expanded = charts.histogram(np.repeat(values, weights), 10)
+    np.testing.assert_allclose(weighted['counts'], expanded['counts'])
+
+
+def test_histogram_of_constant_and_empty_values():
+    assert charts.histogram(np.full(5, 3.0), 4)['counts'].sum() == 5
+    assert len(charts.histogram(np.zeros(0))['counts']) == 0
+
+
+def test_box_stats_match_numpy_and_bound_outliers():
+    values = np.random.default_rng(6).lognormal(5, 1, 20_000)
+    stats = charts.box_stats(values, max_outliers=50)
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    assert (stats['q1'], stats['median'], stats['q3']) == (q1, median, q3)
+    assert stats['upperfence'] == values[values <= q3 + 1.5 * (q3 - q1)].max()
+    assert len(stats['outliers']) == 50 and stats['outliers'][-1] == values.max()
+    assert charts.box_stats([np.nan]) is None
+
+
+def test_sketch_box_stats_within_sketch_accuracy():
+    values = np.random.default_rng(7).lognormal(5, 1, 20_000)
+    exact, sketched = charts.box_stats(values), charts.sketch_box_stats(ColumnSummary().add(values))
+    for key in ('q1', 'median', 'q3'):
+        assert sketched[key] == pytest.approx(exact[key], rel=0.02)
+    assert sketched['mean'] == pytest.approx(exact['mean'])
+    assert sketched['outliers'].max() == values.max()
+    assert charts.sketch_box_stats(ColumnSummary()) is None
+
+
+def test_density_grid_bins_every_positive_pair():
+    rng = np.random.default_rng(8)
+    x = rng.lognormal(6, 1, 30_000)
+    y = x * rng.lognormal(0, 0.5, 30_000)
+    grid = charts.density_grid(np.append(x, [0.0, -1.0]), np.append(y, [5.0, 5.0]), nbins=40)
+    assert grid['n'] == len(x) and grid['counts'].sum() == len(x)
+    assert 0 < len(grid['outlier_x']) <= charts.MAX_OUTLIER_POINTS
+    # Sparse points are the pairs themselves, not bin centers
+    distance = np.abs(x[:, None] / grid['outlier_x'] - 1).min(axis=0)
+    assert distance.max() < 1e-9
+    assert charts.density_grid([0.0], [1.0]) is None
+
+
+def test_stratified_sample_keeps_the_tail():
+    values = np.random.default_rng(9).lognormal(5, 1.5, 100_000)
+    positions = charts.stratified_sample(values, 2_000)
+    assert len(positions) == 2_000 and len(np.unique(positions)) == 2_000
+    top = values >= np.quantile(values, 0.95)
+    assert top[positions].sum() == 2_000 // charts.SCATTER_STRATA
+    np.testing.assert_array_equal(charts.stratified_sample(values[:500], 2_000), np.arange(500))
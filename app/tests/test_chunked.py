@@ -0,0 +1,75 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import chunked
+import columnar
+import cube
+from filters import FilterSpec
+
+COLUMNS = ['IDpol', 'Region', 'Area', 'DrivAge', 'Exposure', 'ClaimNb', 'PurePremium', 'Pred_GLMs']
+SPEC = FilterSpec.from_selection({'Area': ['A', 'C', 'D']}, {'DrivAge': (26, 55)})
+
+
+@pytest.fixture(scope='module', params=['store', 'npz'])
+def source(request, dataset_dir, tmp_path_factory):
+    """BlockSource over the columnar store, or over the NPZ files alone"""
+    if request.param == 'store':
+        columnar.open_store(dataset_dir)
+        return chunked.BlockSource(dataset_dir, block_rows=1_000)
+    npz_dir = tmp_path_factory.mktemp('npz')
+    for name in columnar.SOURCE_FILES:
+        shutil.copy(dataset_dir / name, npz_dir)
+    source = chunked.BlockSource(npz_dir, block_rows=1_000)
+    assert source.store is None
+    return source
+
+
+@pytest.fixture(scope='module')
+def frame(dataset_dir):
+    return columnar.load_npz_frame(dataset_dir)
+
+
+def test_blocks_concatenate_to_the_frame(source, frame):
+    blocks = list(source.blocks(COLUMNS))
+    assert len(blocks) == -(-len(frame) // 1_000)
+    whole = pd.concat(blocks, ignore_index=True)
+    for col in COLUMNS:
+        np.testing.assert_array_equal(np.asarray(whole[col]), np.asarray(frame[col]))
+
+
+def test_block_cube_equals_the_frame_cube(source, frame):
+    expected = cube.build_cube(frame).query(SPEC).group_by('Region', measures=['claims', 'exposure'])
+    result = chunked.build_cube(source).query(SPEC).group_by('Region', measures=['claims', 'exposure'])
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+
+
+def test_selection_matches_the_filtered_frame(source, frame):
+    rows = frame[SPEC.row_mask(frame)].reset_index(drop=True)
+    selection = chunked.ChunkedSelection(source, SPEC, len(rows))
+    np.testing.assert_array_equal(selection.frame(['IDpol'])['IDpol'], rows['IDpol'])
+    assert selection.head(7, ['IDpol'])['IDpol'].tolist() == rows['IDpol'].head(7).tolist()
+
+    summary = selection.summary('Pred_GLMs')
+    assert summary.count == len(rows)
+    assert summary.mean == pytest.approx(rows['Pred_GLMs'].mean())
+    assert summary.max == rows['Pred_GLMs'].max()
+    groups = selection.group_summaries('Pred_GLMs', 'Area')
+    assert {area: s.count for area, s in groups.items()} == rows['Area'].value_counts().loc[list(groups)].to_dict()
+
+    hist = selection.histogram(['Pred_GLMs'], lambda block: block['Pred_GLMs'].to_numpy(), 20)
+    np.testing.assert_array_equal(hist['counts'], np.histogram(rows['Pred_GLMs'], bins=hist['edges'])[0])
+
+    sample = selection.sample(['IDpol', 'ClaimNb'], 100, keep=lambda block: block['ClaimNb'].to_numpy() > 0)
+    assert len(sample) == min(100, (rows['ClaimNb'] > 0).sum())
+    assert sample['IDpol'].isin(rows.loc[rows['ClaimNb'] > 0, 'IDpol']).all()
+
+
+def test_empty_selection_keeps_the_columns(source):
+    spec = FilterSpec.from_selection(ranges={'DrivAge': (300, 400)})
+    selection = chunked.ChunkedSelection(source, spec, 0)
+    assert list(selection.frame(['IDpol', 'Region']).columns) == ['IDpol', 'Region']
+    assert selection.summary('Pred_GLMs').count == 0
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cube
+from filters import FilterSpec
+
+SPECS = [
+    FilterSpec(),
+    FilterSpec.from_selection({'Region': ['R11', 'R52'], 'Area': ['A', 'C', 'F']}),
+    FilterSpec.from_selection({'DataMajor': 'Train'}, {'DrivAge': (26, 55), 'VehPower': (6, 9)}),
+    FilterSpec.from_selection({'VehBrand': ['B12']}, {'DrivAge': (66, 999)}),
+]
+
+
+@pytest.fixture(scope='module')
+def data_cube(book):
+    return cube.build_cube(book)
+
+
+def test_band_labels_and_ranges():
+    assert cube.band_labels('DrivAge') == ['<25', '25-35', '35-45', '45-55', '55-65', '65+']
+    assert cube.band_labels('VehPower') == ['<6', '6-7', '8-9', '10-11', '12+']
+    assert cube.band_range('DrivAge', '25-35', '45-55') == (26, 55)
+    assert cube.band_range('VehPower', '<6', '12+') == (0, cube.BAND_END)
+
+
+def test_band_mask_of_split_band_is_none(data_cube):
+    assert cube.band_mask('DrivAge', 26, 55).tolist() == [False, True, True, True, False, False]
+    assert cube.band_mask('DrivAge', 30, 55) is None
+    assert data_cube.covers(SPECS[2])
+    assert not data_cube.covers(FilterSpec.from_selection({}, {'DrivAge': (30, 55)}))
+    assert data_cube.cell_mask(FilterSpec.from_selection({}, {'DrivAge': (30, 55)})) is None
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_totals_match_row_mask(book, data_cube, spec):
+    rows = book[spec.row_mask(book)]
+    totals = data_cube.query(spec).totals()
+    assert totals['policies'] == len(rows)
+    for name, column in cube.MEASURES.items():
+        if column is not None:
+            assert totals[name] == pytest.approx(rows[column].sum())
+    assert totals['policies_with_claims'] == (rows['ClaimNb'] > 0).sum()
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_group_by_matches_pandas_groupby(book, data_cube, spec):
+    rows = book[spec.row_mask(book)]
+    result = data_cube.query(spec).group_by('Region', 'Area', measures=['claims', 'exposure'])
+    expected = rows.groupby(['Region', 'Area'], observed=True).agg(
+        policies=('ClaimNb', 'size'), claims=('ClaimNb', 'sum'), exposure=('Exposure', 'sum'))
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result[list(expected.columns)].to_numpy(), expected.to_numpy())
+
+
+def test_age_bands_match_the_age_groups(book, data_cube):
+    bands = pd.cut(book['DrivAge'], bins=[0, 25, 35, 45, 55, 65, 100],
+                   labels=['<25', '25-35', '35-45', '45-55', '55-65', '65+'])
+    expected = book.groupby(bands, observed=True)['Exposure'].sum()
+    result = data_cube.query(FilterSpec()).group_by('DrivAge', measures=['exposure'])['exposure']
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+    assert list(result.index) == list(expected.index)
+
+
+def test_merged_block_cells_equal_whole_cube(book, data_cube):
+    labels = data_cube.labels
+    parts = [cube.partial_cells(book.iloc[start:start + 7_000], labels) for start in range(0, len(book), 7_000)]
+    merged = cube.cube_from_cells(labels, *cube.merge_cells(parts))
+    assert merged.n_cells == data_cube.n_cells
+    for name, values in data_cube.measures.items():
+        np.testing.assert_allclose(merged.measures[name], values)
+
+
+def test_frequency_table_matches_groupby(book, data_cube):
+    table = cube.frequency_table(data_cube.query(SPECS[2]), 'Area')
+    rows = book[SPECS[2].row_mask(book)]
+    grouped = rows.groupby('Area', observed=True).agg(claims=('ClaimNb', 'sum'), exposure=('Exposure', 'sum'),
+                                                      policies=('ClaimNb', 'size'))
+    assert table['Area'].tolist() == list(grouped.index)
+    np.testing.assert_allclose(table['Frequency'], grouped['claims'] / grouped['exposure'])
+    np.testing.assert_allclose(table['Share'], grouped['policies'] / len(rows))
+
+
+def test_split_range_is_answered_by_a_cube_of_the_rows(book, data_cube):
+    spec = FilterSpec.from_selection({'Area': ['B', 'E']}, {'DrivAge': (30, 47), 'VehPower': (5, 9)})
+    with pytest.raises(ValueError, match='split a band'):
+        data_cube.query(spec)
+    rows = book[spec.row_mask(book)]
+    blocks = [rows.iloc[start:start + 1_000] for start in range(0, len(rows), 1_000)]
+    totals = cube.build_blocks(blocks, data_cube.labels).query(FilterSpec()).totals()
+    assert totals['policies'] == len(rows)
+    assert totals['exposure'] == pytest.approx(rows['Exposure'].sum())
+    assert cube.build_blocks([], data_cube.labels).n_cells == 0
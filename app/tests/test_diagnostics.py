@@ -0,0 +1,31 @@
+import diagnostics
+
+
+def test_log_is_rotated_at_its_size_cap(tmp_path):
+    path = tmp_path / 'diagnostics.jsonl'
+    for i in range(6):
+        path.write_text(f'{i}\n' * 10)
+        diagnostics.rotate_log(path, max_bytes=20, backups=3)
+    assert not path.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f'diagnostics.jsonl.{i}' for i in (1, 2, 3)]
+    assert (tmp_path / 'diagnostics.jsonl.1').read_text().startswith('5')
+    assert (tmp_path / 'diagnostics.jsonl.3').read_text().startswith('3')
+
+
+def test_small_log_is_kept(tmp_path):
+    path = tmp_path / 'diagnostics.jsonl'
+    path.write_text('{}\n')
+    diagnostics.rotate_log(path, max_bytes=1024)
+    assert path.read_text() == '{}\n'
+
+
+def test_rerun_records_nested_stages(tmp_path):
+    rerun = diagnostics.Rerun('session')
+    with rerun.stage('tabs'), rerun.stage('Overview'):
+        pass
+    path = tmp_path / 'log.jsonl'
+    rerun.finish({}, {})
+    rerun.write_log(path)
+    rerun.write_log(path)
+    assert [record['stage'] for record in rerun.stages] == ['tabs/Overview', 'tabs']
+    assert len(path.read_text().splitlines()) == 2
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+
+COLUMNS = ['IDpol', 'Region', 'DrivAge', 'Exposure', 'Pred_GLMs']
+
+
+def _read(path, fmt):
+    if fmt == 'Parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path, compression='gzip' if fmt == 'CSV (gzip)' else None)
+
+
+@pytest.mark.parametrize('fmt', export.available_formats())
+def test_round_trip_of_selected_rows(book, tmp_path, fmt):
+    frame = book[COLUMNS]
+    rows = np.flatnonzero(book['Area'].isin(['A', 'F']).to_numpy())
+    path = tmp_path / f'export{export.EXPORT_FORMATS[fmt][0]}'
+    export.write_export(path, frame, rows, fmt, chunk_rows=3_000)
+    result = _read(path, fmt)
+    expected = frame.take(rows).reset_index(drop=True)
+    assert list(result.columns) == COLUMNS
+    assert result['IDpol'].tolist() == expected['IDpol'].tolist()
+    assert result['Region'].astype(str).tolist() == expected['Region'].astype(str).tolist()
+    np.testing.assert_allclose(result['Pred_GLMs'], expected['Pred_GLMs'])
+
+
+def test_empty_selection_keeps_the_header(book, tmp_path):
+    path = tmp_path / 'empty.csv'
+    export.write_export(path, book[COLUMNS], np.zeros(0, dtype=np.intp))
+    result = pd.read_csv(path)
+    assert list(result.columns) == COLUMNS and len(result) == 0
+
+
+def test_cached_export_writes_once_per_key(book, tmp_path, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_DIR', tmp_path)
+    writes = []
+
+    def write(path):
+        writes.append(path)
+        export.write_export(path, book[COLUMNS].head(10))
+
+    key = export.export_key('v1', 'fingerprint', COLUMNS, 'CSV')
+    first = export.cached_export(key, 'CSV', write)
+    second = export.cached_export(key, 'CSV', write)
+    assert first == second and len(writes) == 1
+    assert len(pd.read_csv(first)) == 10
+    assert not list(tmp_path.glob('tmp-*'))
+    assert export.export_key('v2', 'fingerprint', COLUMNS, 'CSV') != key
+
+
+def test_old_exports_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_DIR', tmp_path)
+    monkeypatch.setattr(export, 'MAX_CACHED_EXPORTS', 2)
+    for i in range(4):
+        export.cached_export(export.export_key(i), 'CSV', lambda path: path.write_text('a\n1\n'))
+    assert len(list(tmp_path.glob('export-*'))) == 2
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from filter_index import FilterIndex
+from filters import FilterSpec
+
+SPECS = [
+    FilterSpec.from_selection({'Region': ['R21', 'R93']}),
+    FilterSpec.from_selection({'DataMajor': 'Test', 'VehBrand': ['B1', 'B5']}, {'DrivAge': (30, 47)}),
+    FilterSpec.from_selection({'Area': ['B']}, {'DrivAge': (18, 40), 'VehPower': (7, 7)}),
+    FilterSpec.from_selection(ranges={'VehPower': (3, 9)}),
+    FilterSpec.from_selection(ranges={'DrivAge': (100, 120)}),
+    FilterSpec.from_selection({'Region': ['R99']}),
+]
+
+
+@pytest.fixture(scope='module')
+def index(book):
+    return FilterIndex(book)
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_selected_rows_match_boolean_mask(book, index, spec):
+    selection = index.select(spec)
+    expected = np.flatnonzero(spec.row_mask(book))
+    np.testing.assert_array_equal(selection.rows, expected)
+    assert len(selection) == len(expected)
+    np.testing.assert_array_equal(selection.mask, spec.row_mask(book))
+
+
+def test_unrestricted_spec_selects_every_row(book, index):
+    selection = index.select(FilterSpec.from_selection({'Region': 'All'}, {'DrivAge': (0, 999)}))
+    assert selection.rows is None
+    assert len(selection) == len(book)
+
+
+def test_selection_gathers_columns(book, index):
+    spec = SPECS[1]
+    selection = index.select(spec)
+    expected = book.loc[spec.row_mask(book), ['ClaimAmount', 'Region']].reset_index(drop=True)
+    frame = selection.frame(['ClaimAmount', 'Region']).reset_index(drop=True)
+    assert frame.equals(expected)
+    chunks = list(selection.chunks(['ClaimAmount'], chunk_rows=500))
+    np.testing.assert_array_equal(np.concatenate([chunk['ClaimAmount'] for chunk in chunks]),
+                                  expected['ClaimAmount'])
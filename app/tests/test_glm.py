@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import glm
+
+
+@pytest.fixture(scope='module')
+def scored_book(book):
+    """The book with a GLM prediction of known coefficients and its dummy design columns"""
+    rng = np.random.default_rng(11)
+    frame = book.copy()
+    eta = np.full(len(frame), 3.6)
+    coefficients = {}
+    for factor in glm.FACTORS:
+        levels = frame[factor].cat.categories
+        for level in levels[1:]:
+            coefficients[f'{factor}[T.{level}]'] = rng.normal(0, 0.3)
+            frame[f'{factor}[T.{level}]'] = (frame[factor] == level).astype(np.int8)
+        table = np.array([0.0] + [coefficients[f'{factor}[T.{level}]'] for level in levels[1:]])
+        eta += table[frame[factor].cat.codes.to_numpy()]
+    for term, slope in zip(glm.CONTINUOUS_TERMS, (0.02, -0.01, -0.004, 0.012)):
+        frame[f'{term}.1'] = frame[term]
+        coefficients[f'{term}.1'] = slope
+        eta += slope * frame[term].to_numpy()
+    frame['Intercept'] = np.int8(1)
+    frame['Pred_GLMs'] = np.exp(eta)
+    return frame, coefficients
+
+
+def test_fit_recovers_the_coefficients(scored_book):
+    frame, coefficients = scored_book
+    model = glm.fit_model(frame[glm.model_columns(frame.columns)], glm.level_terms(frame.columns), fit_rows=5_000)
+    assert model.fit_error < 1e-10
+    assert model.intercept == pytest.approx(3.6)
+    for factor in glm.FACTORS:
+        for level, coefficient in model.relativities[factor].items():
+            assert coefficient == pytest.approx(coefficients.get(f'{factor}[T.{level}]', 0.0), abs=1e-10)
+    for term, slope in model.slopes.items():
+        assert slope == pytest.approx(coefficients[term], abs=1e-10)
+
+
+def test_normal_equations_match_the_dense_design():
+    rng = np.random.default_rng(5)
+    codes = rng.integers(0, 4, 500)
+    other = rng.integers(0, 3, 500)
+    continuous = rng.normal(size=(500, 2))
+    blocks = [(np.zeros(500, dtype=np.intp), 1, [0]), (codes, 4, [1, 2, 3]), (other, 3, [0, 2])]
+    dense = np.column_stack([np.ones(500)] + [codes == level for level in (1, 2, 3)]
+                            + [other == level for level in (0, 2)] + [continuous]).astype(np.float64)
+    z = rng.normal(size=500)
+    np.testing.assert_allclose(glm.gram_matrix(blocks, continuous), dense.T @ dense)
+    np.testing.assert_allclose(glm.design_dot(blocks, continuous, z), dense.T @ z)
+    b = rng.normal(size=dense.shape[1])
+    np.testing.assert_allclose(glm.design_times(blocks, continuous, b), dense @ b)
+
+
+def test_adjustments_scale_single_levels(scored_book):
+    frame, _ = scored_book
+    model = glm.fit_model(frame, fit_rows=5_000)
+    scorer = glm.GLMScorer(model, frame)
+    adjustments = glm.normalize_adjustments({'Area': {'C': 1.5, 'D': 1.0}})
+    ratio = scorer.score(adjustments) / scorer.score()
+    expected = np.where(frame['Area'] == 'C', 1.5, 1.0)
+    np.testing.assert_allclose(ratio, expected)
+    assert isinstance(model.relativity_frame(), pd.DataFrame)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import cube
+from filters import FilterSpec
+from incremental import IncrementalView
+
+# A session nudging the sidebar one step at a time
+STEPS = [
+    FilterSpec.from_selection({'Region': ['R11']}),
+    FilterSpec.from_selection({'Region': ['R11', 'R24']}),
+    FilterSpec.from_selection({'Region': ['R11', 'R24']}, {'DrivAge': (26, 999)}),
+    FilterSpec.from_selection({'Region': ['R11', 'R24'], 'Area': ['A', 'B', 'C', 'D', 'E']}, {'DrivAge': (26, 999)}),
+    FilterSpec.from_selection({'Region': ['R24'], 'Area': ['A', 'B', 'C', 'D', 'E']}, {'DrivAge': (26, 999)}),
+    FilterSpec(),
+]
+
+
+@pytest.fixture(scope='module')
+def data_cube(book):
+    return cube.build_cube(book)
+
+
+def test_advanced_views_match_fresh_queries(data_cube):
+    first = STEPS[0]
+    view = IncrementalView(data_cube, data_cube.cell_mask(first), first)
+    modes = []
+    for spec in STEPS:
+        view.totals()
+        view.group_by('Area', measures=['claims'])
+        view = view.advance(spec)
+        modes.append(view.stats['mode'])
+        fresh = data_cube.query(spec)
+        np.testing.assert_allclose(view.totals().to_numpy(), fresh.totals().to_numpy())
+        result = view.group_by('Area', measures=['claims'])
+        expected = fresh.group_by('Area', measures=['claims'])
+        assert list(result.index) == list(expected.index)
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+    assert 'delta' in modes
+
+
+def test_same_spec_returns_the_view(data_cube):
+    spec = STEPS[1]
+    view = IncrementalView(data_cube, data_cube.cell_mask(spec), spec)
+    assert view.advance(spec) is view
+
+
+def test_large_change_is_recomputed(data_cube):
+    spec = STEPS[0]
+    view = IncrementalView(data_cube, data_cube.cell_mask(spec), spec)
+    view.totals()
+    advanced = view.advance(FilterSpec())
+    assert advanced.stats['mode'] == 'full'
+    np.testing.assert_allclose(advanced.totals().to_numpy(), data_cube.query(FilterSpec()).totals().to_numpy())
+
+
+def test_remembered_results_are_updated_like_computed_ones(data_cube):
+    first, second = STEPS[1], STEPS[2]
+    served = IncrementalView(data_cube, data_cube.cell_mask(first), first)
+    fresh = data_cube.query(first)
+    served.remember(totals=fresh.totals(),
+                    group_by=(('Region', 'DrivAge'), ['claims'], fresh.group_by('Region', 'DrivAge', measures=['claims'])))
+    advanced = served.advance(second)
+    assert advanced.stats['mode'] == 'delta'
+    expected = data_cube.query(second)
+    np.testing.assert_allclose(advanced.totals().to_numpy(), expected.totals().to_numpy())
+    result = advanced.group_by('Region', 'DrivAge', measures=['claims'])
+    np.testing.assert_allclose(result.to_numpy(), expected.group_by('Region', 'DrivAge', measures=['claims']).to_numpy())
+
+
+def test_nothing_aggregated_is_recomputed(data_cube):
+    view = IncrementalView(data_cube, data_cube.cell_mask(STEPS[1]), STEPS[1])
+    assert view.advance(STEPS[2]).stats['mode'] == 'full'
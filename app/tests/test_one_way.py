@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import one_way
+
+
+@pytest.fixture(scope='module')
+def codes(book):
+    return one_way.OneWayCodes.from_frame(book)
+
+
+@pytest.mark.parametrize('factor', ['Area', 'Region', 'VehPower', 'BonusMalus', 'Density'])
+def test_factor_table_matches_groupby(book, codes, factor):
+    mask = (book['DataMajor'] == 'Train').to_numpy()
+    rows = np.flatnonzero(mask)
+    table = codes.table(codes.sums(one_way.measure_values(book.iloc[rows]), rows))
+    table = table[table['Factor'] == factor]
+
+    selected = book.iloc[rows]
+    factor_bins = codes.bins[factor]
+    levels = np.asarray(factor_bins.labels)[factor_bins.codes(selected[factor])]
+    expected = selected.assign(Level=levels, Expected=selected['Pred_GLMs'] * selected['Exposure']).groupby(
+        'Level', sort=False).agg(Policies=('ClaimNb', 'size'), Exposure=('Exposure', 'sum'),
+                                 Claims=('ClaimNb', 'sum'), ClaimAmount=('ClaimAmount', 'sum'),
+                                 Expected=('Expected', 'sum'))
+    expected = expected.loc[table['Level']]
+    for column in expected.columns:
+        np.testing.assert_allclose(table[column].to_numpy(), expected[column].to_numpy())
+    np.testing.assert_allclose(table['Frequency'], expected['Claims'] / expected['Exposure'])
+    assert table['Exposure Share'].sum() == pytest.approx(1)
+
+
+def test_every_policy_counted_once_per_factor(book, codes):
+    table = codes.table(codes.sums(one_way.measure_values(book)))
+    policies = table.groupby('Factor', sort=False)['Policies'].sum()
+    assert (policies == len(book)).all()
+    assert list(policies.index) == list(one_way.FACTORS)
+
+
+def test_quantile_edges_cut_at_quantiles():
+    values = np.arange(1, 101)
+    edges = one_way.continuous_edges(values, 'quantile', 4)
+    np.testing.assert_allclose(edges, np.quantile(values, [0.25, 0.5, 0.75]))
+    assert one_way.continuous_edges(np.array([1, 2, 2, 3]), 'quantile', 10) is None
+    with pytest.raises(ValueError):
+        one_way.continuous_edges(values, 'cubic', 4)
+
+
+def test_binned_codes_follow_edges():
+    column = pd.Series(np.arange(0, 1000))
+    factor_bins = one_way.FactorBins.from_column('Density', column, 'log', 5)
+    codes = factor_bins.codes(column)
+    assert codes.min() == 0 and codes.max() == len(factor_bins) - 1
+    assert (np.diff(codes) >= 0).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import paging
+
+
+@pytest.fixture(scope='module')
+def claim_index(book):
+    return paging.SortIndex(paging.sort_values(book['ClaimAmount']))
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('start, stop', [(0, 50), (120, 170), (3_000, 3_100)])
+def test_sorted_page_matches_pandas(book, claim_index, start, stop, descending, monkeypatch):
+    # Small scan blocks so pages span several of them
+    monkeypatch.setattr(paging, 'SCAN_BLOCK', 1_000)
+    mask = (book['Region'] == 'R21').to_numpy()
+    rows = claim_index.rows(start, stop, mask, descending)
+    order = np.argsort(book['ClaimAmount'].to_numpy(), kind='stable')
+    order = order[::-1] if descending else order
+    expected = order[mask[order]][start:stop]
+    np.testing.assert_array_equal(rows, expected)
+
+
+def test_page_past_the_selection_is_empty(book, claim_index):
+    mask = (book['Region'] == 'R21').to_numpy()
+    assert len(claim_index.rows(int(mask.sum()), int(mask.sum()) + 10, mask)) == 0
+
+
+def test_categorical_sorts_by_category_order(book):
+    index = paging.SortIndex(paging.sort_values(book['VehBrand']))
+    codes = book['VehBrand'].cat.codes.to_numpy()[index.rows(0, len(book))]
+    assert (np.diff(codes) >= 0).all()
+
+
+def test_id_index_finds_rows(book):
+    index = paging.IdIndex(book['IDpol'])
+    ids = [int(book['IDpol'].iloc[17]), 1, int(book['IDpol'].iloc[4])]
+    rows = index.find(ids)
+    assert rows.tolist() == [17, 4]
+    assert len(index.find([])) == 0
+
+
+def test_parse_ids():
+    assert paging.parse_ids('12, 7 x9  30') == ([12, 7, 30], ['x9'])
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import charts
+import columnar
+import cube
+import pivot
+from filters import FilterSpec
+from parallel import ParallelExecutor, shard_bounds
+
+SPEC = FilterSpec.from_selection({'Region': ['R11', 'R24', 'R93'], 'VehGas': ['Diesel']}, {'DrivAge': (30, 62)})
+
+
+@pytest.fixture(scope='module')
+def executor(book):
+    executor = ParallelExecutor(book, workers=3, kind='thread')
+    yield executor
+    executor.close()
+
+
+def test_shards_cover_every_row_once():
+    bounds = shard_bounds(10, 4)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 10
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds[:-1], bounds[1:]))
+    assert shard_bounds(2, 8) == [(0, 1), (1, 2)]
+
+
+def test_select_matches_the_row_mask(book, executor):
+    np.testing.assert_array_equal(executor.select(SPEC), np.flatnonzero(SPEC.row_mask(book)))
+
+
+def test_group_sums_and_pivot_match_the_cube(book, executor):
+    spec = FilterSpec.from_selection({'Area': ['B', 'C']}, {'DrivAge': (26, 55)})
+    view = cube.build_cube(book).query(spec)
+    expected = view.group_by('Region', 'DrivAge', measures=['claims', 'exposure'])
+    result = executor.group_sums(spec, ['Region', 'DrivAge'], ['claims', 'exposure'])
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result[list(expected.columns)].to_numpy(), expected.to_numpy())
+
+    table = executor.pivot(spec, ['Area'], ['VehGas'], margins=True)
+    sums = view.group_by('Area', 'VehGas', measures=pivot.PIVOT_MEASURES)
+    np.testing.assert_allclose(table.to_numpy(), pivot.pivot_table(sums, ['Area'], ['VehGas'], margins=True).to_numpy())
+
+
+def test_histograms_and_counts_match_the_rows(book, executor):
+    rows = book[SPEC.row_mask(book)]
+    expected = charts.histogram(rows['Pred_GLMs'].to_numpy(), 30)
+    binned = executor.binned(SPEC, 'Pred_GLMs', 30)
+    np.testing.assert_allclose(binned['edges'], expected['edges'])
+    np.testing.assert_array_equal(binned['counts'], expected['counts'])
+    np.testing.assert_array_equal(executor.bincount(SPEC, 'VehPower'), np.bincount(rows['VehPower']))
+    empty = FilterSpec.from_selection(ranges={'DrivAge': (200, 300)})
+    assert len(executor.binned(empty, 'Pred_GLMs')['counts']) == 0
+
+
+def test_cube_from_shards_equals_the_frame_cube(book, executor):
+    data_cube = cube.build_cube(book)
+    merged = executor.build_cube()
+    assert merged.n_cells == data_cube.n_cells
+    for name, values in data_cube.measures.items():
+        np.testing.assert_allclose(merged.measures[name], values)
+    # A range splitting a band: the cube of the matching rows, under the same labels
+    selected = executor.build_cube(SPEC, merged.labels).query(FilterSpec()).totals()
+    rows = book[SPEC.row_mask(book)]
+    assert selected['policies'] == len(rows)
+    assert selected['exposure'] == pytest.approx(rows['Exposure'].sum())
+
+
+def test_process_pool_maps_the_store(dataset_dir):
+    store = columnar.open_store(dataset_dir)
+    frame = store.frame(['Region', 'VehGas', 'DrivAge', 'VehPower', 'Pred_GLMs'])
+    executor = ParallelExecutor(frame, workers=2, kind='process', store_path=store.path)
+    try:
+        np.testing.assert_array_equal(executor.select(SPEC), np.flatnonzero(SPEC.row_mask(frame)))
+        np.testing.assert_array_equal(executor.bincount(SPEC, 'VehPower'),
+                                      np.bincount(frame.loc[SPEC.row_mask(frame), 'VehPower']))
+    finally:
+        executor.close()
+    with pytest.raises(ValueError, match='columnar store'):
+        ParallelExecutor(frame, workers=2, kind='process')
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pivot
+
+
+def _pivot_table(book, rows, columns, values, aggfunc, margins=False):
+    return pd.pivot_table(book, index=rows, columns=columns or None, values=values, aggfunc=aggfunc,
+                          observed=True, margins=margins, margins_name=pivot.MARGIN_LABEL)
+
+
+def test_group_sums_match_groupby(book):
+    sums = pivot.group_sums(book, ['Area', 'VehGas'])
+    expected = book.groupby(['Area', 'VehGas'], observed=True).agg(
+        policies=('ClaimNb', 'size'), claims=('ClaimNb', 'sum'), claim_amount=('ClaimAmount', 'sum'))
+    assert list(sums.index) == list(expected.index)
+    np.testing.assert_allclose(sums[list(expected.columns)].to_numpy(), expected.to_numpy())
+
+
+def test_sum_metrics_match_pivot_table(book):
+    result = pivot.pivot(book, ['Region'], ['Area'], metrics=['TotalClaims'])['TotalClaims']
+    expected = _pivot_table(book, 'Region', 'Area', 'ClaimNb', 'sum')
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+
+
+def test_ratio_metrics_match_pivot_table(book):
+    result = pivot.pivot(book, ['Region', 'VehGas'], metrics=['Frequency', 'AvgPremium'])
+    grouped = _pivot_table(book, ['Region', 'VehGas'], None, ['ClaimNb', 'Exposure', 'Pred_GLMs'], 'sum')
+    np.testing.assert_allclose(result['Frequency'], grouped['ClaimNb'] / grouped['Exposure'])
+    mean_premium = _pivot_table(book, ['Region', 'VehGas'], None, 'Pred_GLMs', 'mean')
+    np.testing.assert_allclose(result['AvgPremium'], mean_premium['Pred_GLMs'])
+
+
+def test_margins_match_pivot_table(book):
+    result = pivot.pivot(book, ['Area'], ['VehGas'], metrics=['TotalExposure'], margins=True)['TotalExposure']
+    expected = _pivot_table(book, 'Area', 'VehGas', 'Exposure', 'sum', margins=True)
+    assert list(result.index) == list(expected.index)
+    assert list(result.columns) == list(expected.columns)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+
+
+def test_empty_denominator_gives_zero():
+    frame = pd.DataFrame({
+        'Area': pd.Categorical(['A', 'B']), 'ClaimNb': [0, 0], 'Exposure': [1.0, 1.0],
+        'ClaimAmount': [0.0, 0.0], 'Pred_GLMs': [1.0, 1.0],
+    })
+    result = pivot.pivot(frame, ['Area'], metrics=['AvgClaimAmount'])
+    assert result['AvgClaimAmount'].tolist() == pytest.approx([0.0, 0.0])
@@ -0,0 +1,62 @@
+import threading
+
+import plotly.graph_objects as go
+import pytest
+
+import charts
+from render_pool import RenderPool
+
+
+def _figure(n):
+    return go.Figure(go.Bar(x=list(range(n)), y=list(range(n))))
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(workers=2)
+    yield pool
+    pool.close()
+
+
+def test_builds_overlap_in_the_pool(pool):
+    # Each build waits for the other: the batch only completes if they run at once
+    barrier = threading.Barrier(2, timeout=10)
+
+    def build(n):
+        barrier.wait()
+        return _figure(n)
+
+    batch = pool.batch()
+    batch.submit('a', lambda: build(3))
+    batch.submit('b', lambda: build(5))
+    fig_b, bytes_b = batch.result('b')
+    fig_a, bytes_a = batch.result('a')
+    assert len(fig_a.data[0].x) == 3 and len(fig_b.data[0].x) == 5
+    assert bytes_b == charts.payload_bytes(fig_b)
+    assert [timing['figure'] for timing in batch.timings] == ['b', 'a']
+
+
+def test_attach_runs_in_the_worker_thread(pool):
+    threads = []
+    batch = pool.batch(attach=lambda: threads.append(threading.current_thread().name))
+    batch.submit('a', lambda: _figure(2))
+    batch.result('a')
+    assert threads and threads[0].startswith('dashboard-figure')
+
+
+def test_single_worker_builds_when_shown():
+    built = []
+    batch = RenderPool(workers=1).batch()
+    batch.submit('a', lambda: built.append('a') or _figure(1))
+    assert built == []
+    batch.result('a')
+    assert built == ['a'] and batch.timings[0]['wait_ms'] >= batch.timings[0]['build_ms']
+
+
+def test_errors_and_duplicates_surface_on_the_script_thread(pool):
+    batch = pool.batch()
+    batch.submit('bad', lambda: 1 / 0)
+    with pytest.raises(ValueError, match='already submitted'):
+        batch.submit('bad', lambda: _figure(1))
+    with pytest.raises(ZeroDivisionError):
+        batch.result('bad')
@@ -0,0 +1,83 @@
+import json
+import shutil
+
+import pandas as pd
+import pytest
+
+import columnar
+import reports
+import snapshot
+
+VIEWS = [
+    {'name': 'metrics', 'kind': 'metrics'},
+    {'name': 'region_gas', 'kind': 'pivot', 'rows': ['Region'], 'columns': ['VehGas'],
+     'metrics': ['Frequency', 'AvgPremium'], 'margins': True},
+    {'name': 'age_bands', 'kind': 'frequency', 'by': ['DrivAge']},
+]
+
+
+@pytest.fixture(scope='module')
+def data_dir(dataset_dir, tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('reports')
+    for name in columnar.SOURCE_FILES:
+        shutil.copy(dataset_dir / name, data_dir)
+    snapshot.build(data_dir)
+    return data_dir
+
+
+@pytest.fixture(scope='module')
+def frame(data_dir):
+    store = columnar.open_store(data_dir, build=False)
+    return store.frame([col for col in store.columns if not columnar.is_design_column(col)])
+
+
+def test_parse_filter_names_and_validates(frame):
+    name, spec = reports.parse_filter({'Area': ['A', 'B'], 'DrivAge': [0, 35]})
+    assert json.loads(name) == {'Area': ['A', 'B'], 'DrivAge': [0, 35]}
+    assert reports.parse_filter({'name': 'all'}) == ('all', reports.FilterSpec())
+    with pytest.raises(ValueError, match='cube dimensions'):
+        reports.parse_filter({'BonusMalus': [50, 60]})
+    with pytest.raises(ValueError, match='bounds of the bands'):
+        reports.parse_filter({'DrivAge': [0, 34]})
+
+
+def test_batch_matches_the_filtered_rows(data_dir, frame):
+    filters = reports.expand([reports.parse_filter({'name': 'young', 'DrivAge': [0, 35]})], 'Area',
+                             ['A', 'C', 'F'])
+    tables = reports.run_batch(data_dir, filters, VIEWS)
+    assert tables['metrics']['Filter'].tolist() == ['young / A', 'young / C', 'young / F']
+    for (name, spec), (_, row) in zip(filters, tables['metrics'].iterrows()):
+        rows = frame[spec.row_mask(frame)]
+        assert row['total_policies'] == len(rows)
+        assert row['avg_predicted_premium'] == pytest.approx(rows['Pred_GLMs'].mean())
+    pivot_table = tables['region_gas']
+    assert 'Frequency | Diesel' in pivot_table.columns and set(pivot_table['Filter']) == {name for name, _ in filters}
+    ages = tables['age_bands']
+    assert set(ages['DrivAge']) <= {'<25', '25-35'}
+
+
+def test_process_workers_give_the_same_tables(data_dir):
+    data_cube = reports.load_cube(data_dir)
+    filters = reports.expand([reports.parse_filter({'name': 'all'})], 'DrivAge', data_cube.labels['DrivAge'])
+    assert filters[1][1].ranges == (('DrivAge', 26, 35),)
+    serial = reports.run_batch(data_dir, filters, VIEWS, workers=1, data_cube=data_cube)
+    parallel = reports.run_batch(data_dir, filters, VIEWS, workers=2)
+    for name, table in serial.items():
+        pd.testing.assert_frame_equal(parallel[name], table)
+
+
+def test_main_writes_one_file_per_view(data_dir, tmp_path, capsys):
+    job = tmp_path / 'job.json'
+    job.write_text(json.dumps({'filters': [{'name': 'south', 'Region': ['R93', 'R94']}, {'name': 'all'}],
+                               'views': VIEWS}))
+    reports.main([str(job), '--data-dir', str(data_dir), '--out', str(tmp_path / 'out'), '--workers', '1'])
+    written = sorted(path.name for path in (tmp_path / 'out').iterdir())
+    assert written == ['age_bands.csv', 'metrics.csv', 'region_gas.csv']
+    metrics = pd.read_csv(tmp_path / 'out' / 'metrics.csv')
+    assert metrics.columns[0] == 'Filter' and metrics['Filter'].tolist() == ['south', 'all']
+    assert '2 filters x 3 views' in capsys.readouterr().out
+
+
+def test_missing_store_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError, match='python snapshot.py'):
+        reports.load_cube(tmp_path)
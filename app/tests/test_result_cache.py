@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cube
+from filters import FilterSpec
+from result_cache import CachedView, ResultCache, result_nbytes
+
+
+def test_hits_and_misses_per_kind():
+    cache = ResultCache()
+    calls = []
+    compute = lambda: calls.append(1) or np.arange(10)
+    for _ in range(3):
+        np.testing.assert_array_equal(cache.get_or_compute('chart', ('v1', 'a'), compute), np.arange(10))
+    cache.get_or_compute('pivot', ('v1', 'a'), compute)
+    assert len(calls) == 2
+    assert cache.counters() == {'chart': {'hits': 2, 'misses': 1, 'evictions': 0},
+                                'pivot': {'hits': 0, 'misses': 1, 'evictions': 0}}
+    stats = cache.stats().set_index('Kind')
+    assert stats.loc['chart', 'Hit Rate'] == pytest.approx(2 / 3)
+    assert stats.loc['chart', 'Bytes'] == np.arange(10).nbytes
+
+
+def test_least_recently_used_entries_are_evicted_under_the_budget():
+    entry = np.zeros(100)
+    cache = ResultCache(max_bytes=3 * entry.nbytes)
+    for key in 'abc':
+        cache.put('chart', key, entry.copy())
+    cache.get_or_compute('chart', 'a', lambda: pytest.fail('a is cached'))
+    cache.put('chart', 'd', entry.copy())
+    assert len(cache) == 3 and cache.nbytes == 3 * entry.nbytes
+    assert cache.counters()['chart']['evictions'] == 1
+    # b was the least recently used
+    recomputed = []
+    cache.get_or_compute('chart', 'b', lambda: recomputed.append('b') or entry.copy())
+    assert recomputed == ['b']
+
+
+def test_results_larger_than_the_budget_are_not_kept():
+    cache = ResultCache(max_bytes=100)
+    assert len(cache.get_or_compute('chart', 'big', lambda: np.zeros(1_000))) == 1_000
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_result_nbytes_of_frames_and_nested_results():
+    frame = pd.DataFrame({'a': np.zeros(1_000)})
+    assert result_nbytes(frame) >= 8_000
+    assert result_nbytes({'edges': np.zeros(51), 'counts': np.zeros(50)}) > 101 * 8
+
+
+def test_cached_view_serves_a_second_view_of_the_same_state(book):
+    data_cube = cube.build_cube(book)
+    spec = FilterSpec.from_selection({'Region': ['R11', 'R82']})
+    cache = ResultCache()
+    prefix = ('v1', spec.fingerprint(), ())
+    first = CachedView(data_cube.query(spec), cache, prefix)
+    totals, by_area = first.totals(), first.group_by('Area')
+    second = CachedView(data_cube.query(spec), cache, prefix)
+    assert second.totals() is totals and second.group_by('Area') is by_area
+    assert cache.counters()['totals'] == {'hits': 1, 'misses': 1, 'evictions': 0}
+    # Another dataset version is another entry
+    CachedView(data_cube.query(spec), cache, ('v2',) + prefix[1:]).totals()
+    assert cache.counters()['totals']['misses'] == 2
+
+
+def test_equivalent_filter_states_share_a_fingerprint():
+    assert (FilterSpec.from_sidebar('All', ['R24', 'R11'], ['All'], ['All'], (0, 999), (0, 999)).fingerprint()
+            == FilterSpec.from_selection({'Region': ['R11', 'R24', 'R11']},
+                                         {'VehPower': (0, 999), 'DrivAge': (0, 999)}).fingerprint())
+    assert FilterSpec.from_selection({'Region': ['R11']}).fingerprint() != FilterSpec().fingerprint()
@@ -0,0 +1,24 @@
+import numpy as np
+
+import schema
+
+
+def test_flags_stay_numeric():
+    assert schema.compact_dtype(np.array([0.0, 1.0, 1.0])) == np.int8
+    assert schema.compact_dtype(np.array([True, False])) == bool
+
+
+def test_narrowest_integer_holding_the_range():
+    assert schema.compact_dtype(np.array([0, 127])) == np.int8
+    assert schema.compact_dtype(np.array([-1, 200])) == np.int16
+    assert schema.compact_dtype(np.array([0.0, 70_000.0])) == np.int32
+
+
+def test_fractional_and_non_finite_values_keep_their_dtype():
+    assert schema.compact_dtype(np.array([0.5, 1.0])) == np.float64
+    assert schema.compact_dtype(np.array([1.0, np.nan])) == np.float64
+
+
+def test_downcast_is_exact():
+    values = np.array([3.0, -4.0, 12.0])
+    np.testing.assert_array_equal(schema.downcast(values), values)
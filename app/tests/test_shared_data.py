@@ -0,0 +1,46 @@
+import gc
+
+import numpy as np
+import pytest
+
+import columnar
+import shared_data
+import synthetic_data
+
+pytestmark = pytest.mark.skipif(shared_data.os.name != 'posix', reason='the shared root is locked with flock')
+
+
+def _dataset(tmp_path, seed):
+    return synthetic_data.write_dataset(tmp_path / f'dataset-{seed}', 1_000, seed=seed)
+
+
+def _versions(root):
+    return sorted(path.name for path in (root / shared_data.VERSIONS_DIRNAME).iterdir())
+
+
+def test_attached_store_matches_the_local_one(dataset_dir, tmp_path):
+    root = tmp_path / 'shared'
+    store = shared_data.attach_or_publish(dataset_dir, root)
+    assert store.path.name == shared_data.current_version(root) == columnar.dataset_version(dataset_dir)
+    local = columnar.open_store(dataset_dir)
+    for col in ('IDpol', 'Region', 'Pred_GLMs'):
+        np.testing.assert_array_equal(store.array(col), local.array(col))
+    # Publishing without make_current leaves the current version alone
+    assert shared_data.publish(_dataset(tmp_path, 1), root, make_current=False) == store.path.name
+
+
+def test_prune_skips_versions_in_use(tmp_path):
+    root = tmp_path / 'shared'
+    first, second, third = (columnar.dataset_version(_dataset(tmp_path, seed)) for seed in (1, 2, 3))
+    shared_data.publish(tmp_path / 'dataset-1', root)
+    store = shared_data.attach(root)
+    shared_data.publish(tmp_path / 'dataset-2', root)
+    shared_data.publish(tmp_path / 'dataset-3', root)
+    assert shared_data.current_version(root) == third
+    assert _versions(root) == sorted([first, second, third])
+    assert len(store.array('IDpol')) == 1_000
+
+    del store
+    gc.collect()
+    shared_data.publish(tmp_path / 'dataset-3', root)
+    assert _versions(root) == sorted([second, third])
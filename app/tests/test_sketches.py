@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from sketches import ColumnSummary, QuantileSketch
+
+QUANTILES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def _exact(values, q):
+    """Order statistic at rank q * (n - 1), rounded down as the sketch ranks"""
+    return np.sort(values)[int(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_quantiles_within_relative_accuracy(accuracy):
+    values = np.random.default_rng(1).lognormal(5, 2, 50_000)
+    sketch = QuantileSketch(accuracy).add(values)
+    for q in QUANTILES:
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= accuracy * exact * (1 + 1e-9)
+
+
+def test_signed_values_and_zeros():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([-rng.exponential(10, 5_000), np.zeros(3_000), rng.exponential(100, 12_000)])
+    sketch = QuantileSketch().add(values)
+    for q in QUANTILES:
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact) * (1 + 1e-9)
+    assert sketch.quantile(0) == values.min()
+    assert sketch.quantile(1) == values.max()
+
+
+def test_merged_blocks_equal_one_sketch():
+    values = np.random.default_rng(3).gamma(2, 300, 30_000)
+    whole = ColumnSummary().add(values)
+    merged = ColumnSummary()
+    for block in np.array_split(values, 7):
+        merged.merge(ColumnSummary().add(block))
+    assert merged.count == whole.count == len(values)
+    np.testing.assert_array_equal(merged.sketch.quantiles(QUANTILES), whole.sketch.quantiles(QUANTILES))
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.std == pytest.approx(values.std(ddof=1))
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_non_finite_values_are_ignored():
+    summary = ColumnSummary().add([1.0, np.nan, 3.0, np.inf])
+    assert summary.count == 2
+    assert summary.mean == 2.0
+
+
+def test_empty_summary():
+    summary = ColumnSummary()
+    assert summary.count == 0
+    assert np.isnan(summary.mean) and np.isnan(summary.std)
+    assert np.isnan(summary.min) and np.isnan(summary.max)
+    assert np.isnan(summary.quantile(0.5))
@@ -0,0 +1,55 @@
+import shutil
+
+import numpy as np
+import pytest
+
+import columnar
+import cube
+import snapshot
+import synthetic_data
+from filter_index import FilterIndex
+from filters import FilterSpec
+
+SPEC = FilterSpec.from_selection({'Region': ['R11', 'R24'], 'DataMajor': ['01_Train']}, {'VehPower': (6, 11)})
+
+
+@pytest.fixture
+def data_dir(dataset_dir, tmp_path):
+    for name in columnar.SOURCE_FILES:
+        shutil.copy(dataset_dir / name, tmp_path)
+    return tmp_path
+
+
+def _frame(store):
+    return store.frame([col for col in store.columns if not columnar.is_design_column(col)])
+
+
+def test_snapshot_maps_the_cube_and_filter_index(data_dir):
+    snapshot.build(data_dir)
+    store = columnar.open_store(data_dir, build=False)
+    df = _frame(store)
+    built, mapped = cube.build_cube(df), snapshot.load_cube(store)
+    assert mapped.labels == built.labels
+    for name, values in built.measures.items():
+        assert isinstance(mapped.measures[name], np.memmap)
+        np.testing.assert_array_equal(mapped.measures[name], values)
+    np.testing.assert_array_equal(mapped.query(SPEC).totals(), built.query(SPEC).totals())
+
+    index = snapshot.load_filter_index(store, df)
+    assert len(index.select(SPEC)) == SPEC.row_mask(df).sum()
+    np.testing.assert_array_equal(index.select(SPEC).rows, FilterIndex(df).select(SPEC).rows)
+
+
+def test_snapshot_of_other_sources_or_format_is_ignored(data_dir, monkeypatch):
+    snapshot.build(data_dir)
+    store = columnar.open_store(data_dir, build=False)
+    assert snapshot.read_manifest(store) is not None
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_FORMAT_VERSION', snapshot.SNAPSHOT_FORMAT_VERSION + 1)
+    assert snapshot.load_cube(store) is None
+    monkeypatch.undo()
+
+    # New data: the store is rebuilt and its old snapshot no longer applies
+    synthetic_data.write_dataset(data_dir, 2_000, seed=5)
+    store = columnar.open_store(data_dir)
+    assert store.n_rows == 2_000
+    assert snapshot.load_cube(store) is None and snapshot.load_filter_index(store, _frame(store)) is None
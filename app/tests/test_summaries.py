@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import cube
+import summaries
+from filters import FilterSpec
+
+SPECS = [
+    FilterSpec.from_selection({'Region': ['R21', 'R93']}),
+    FilterSpec.from_selection({'Area': ['A', 'D']}, {'DrivAge': (26, 45), 'VehPower': (8, 999)}),
+]
+
+
+@pytest.fixture(scope='module')
+def data_cube(book):
+    return cube.build_cube(book)
+
+
+@pytest.fixture(scope='module')
+def cell_summaries(book, data_cube):
+    blocks = [book.iloc[start:start + 6_000] for start in range(0, len(book), 6_000)]
+    return summaries.build_summaries(data_cube, blocks)
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_summary_of_cells_matches_rows(book, data_cube, cell_summaries, spec):
+    values = book.loc[spec.row_mask(book), 'Pred_GLMs'].to_numpy()
+    cells = cell_summaries.cells_of(data_cube.query(spec).cells)
+    assert cells is not None
+    summary = cell_summaries.summary('Pred_GLMs', cells)
+    assert summary.count == len(values)
+    assert summary.mean == pytest.approx(values.mean())
+    assert summary.std == pytest.approx(values.std(ddof=1))
+    assert (summary.min, summary.max) == (values.min(), values.max())
+    exact = np.sort(values)[(len(values) - 1) // 2]
+    assert abs(summary.quantile(0.5) - exact) <= summaries.SKETCH_ACCURACY * exact * (1 + 1e-9)
+
+
+def test_correlation_of_cells_matches_rows(book, data_cube, cell_summaries):
+    spec = SPECS[1]
+    cells = cell_summaries.cells_of(data_cube.query(spec).cells)
+    rows = book.loc[spec.row_mask(book), list(summaries.CORRELATION_COLUMNS)].astype(np.float64)
+    np.testing.assert_allclose(cell_summaries.correlation(cells).to_numpy(), rows.corr().to_numpy(), atol=1e-9)
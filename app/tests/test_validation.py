@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from validation import ValidationBook
+
+
+def _gini(predicted_rate, exposure, loss):
+    """Gini index by the trapezoid rule on the Lorenz curve of loss against exposure, sorted by prediction"""
+    order = np.argsort(predicted_rate, kind='stable')
+    x = np.concatenate([[0], np.cumsum(exposure[order]) / exposure.sum()])
+    y = np.concatenate([[0], np.cumsum(loss[order]) / loss.sum()])
+    return 1 - 2 * np.sum((x[1:] - x[:-1]) * (y[1:] + y[:-1]) / 2)
+
+
+@pytest.fixture(scope='module')
+def validation_book(book):
+    return ValidationBook(book['Pred_GLMs'], book['Exposure'], book['ClaimAmount'], book['DataMajor'].array)
+
+
+@pytest.mark.parametrize('region', [None, 'R52'])
+def test_gini_matches_lorenz_area(book, validation_book, region):
+    mask = None if region is None else (book['Region'] == region).to_numpy()
+    rows = book if mask is None else book[mask]
+    report = validation_book.report(mask)
+    prediction, exposure = rows['Pred_GLMs'].to_numpy(), rows['Exposure'].to_numpy()
+    assert report['gini'] == pytest.approx(_gini(prediction, exposure, rows['ClaimAmount'].to_numpy()))
+    assert report['predicted_gini'] == pytest.approx(_gini(prediction, exposure, prediction * exposure))
+
+
+def test_lift_deciles_partition_the_selection(book, validation_book):
+    mask = (book['Area'] == 'C').to_numpy()
+    rows = book[mask]
+    lift = validation_book.report(mask)['lift']
+    assert lift['Policies'].sum() == len(rows)
+    assert lift['Exposure'].sum() == pytest.approx(rows['Exposure'].sum())
+    assert lift['Actual'].sum() == pytest.approx(rows['ClaimAmount'].sum())
+    # Deciles are consecutive in prediction order with about a tenth of the exposure each
+    assert lift['Predicted Rate'].is_monotonic_increasing
+    np.testing.assert_allclose(lift['Exposure'] / rows['Exposure'].sum(), 0.1, atol=0.01)
+
+
+def test_calibration_matches_groupby(book, validation_book):
+    calibration = validation_book.report()['calibration'].set_index('Split')
+    predicted = book['Pred_GLMs'] * book['Exposure']
+    expected = pd.DataFrame({'Predicted': predicted, 'Actual': book['ClaimAmount'], 'Split': book['DataMajor']})
+    expected = expected.groupby('Split', observed=True).sum()
+    np.testing.assert_allclose(calibration.loc[expected.index, 'Predicted'], expected['Predicted'])
+    np.testing.assert_allclose(calibration.loc[expected.index, 'A/E'], expected['Actual'] / expected['Predicted'])
+
+
+def test_double_lift_of_identical_challenger_is_flat(book, validation_book):
+    challenger = book['Pred_GLMs'].to_numpy() * 1.2
+    table = validation_book.double_lift(challenger, validation_book.challenger_ranking(challenger))
+    np.testing.assert_allclose(table['Challenger'], table['Base'])
+    assert table['Policies'].sum() == len(book)
@@ -0,0 +1,211 @@
+"""
+Model validation analytics
+
+Exposure-weighted lift by decile, double lift against a challenger
+prediction, the Lorenz curve and Gini index, and actual-to-expected
+calibration per DataMajor split, over every policy (including the majority
+without a claim).
+
+The policies are sorted once by Pred_GLMs, overall and within each split,
+and the columns the analytics sum are kept in that order. A filter is then
+one compress of those arrays, and every statistic is read off their
+cumulative sums: decile totals are differences of the sums at the decile
+boundaries (found by binary search on cumulative exposure), the Gini index
+is two dot products. That is O(n) per filter state after the one-time
+O(n log n) sort. The double lift ranks policies by challenger / Pred_GLMs
+instead, which is sorted once per challenger.
+"""
+
+import numpy as np
+import pandas as pd
+
+N_BINS = 10
+LORENZ_POINTS = 201
+
+
+class Ranking:
+    """Row positions in ascending order of a score, sorted once and restricted to any filter in O(n)"""
+
+    def __init__(self, scores):
+        self.order = np.argsort(scores, kind='stable')
+
+    def rows(self, mask=None):
+        """Ranked positions of the rows selected by a boolean mask (all rows for None)"""
+        return self.order if mask is None else self.order[mask[self.order]]
+
+
+def _running(values):
+    """Cumulative sums of values with a leading 0, so sums over [i, j) are running[j] - running[i]"""
+    running = np.zeros(len(values) + 1)
+    np.cumsum(values, out=running[1:])
+    return running
+
+
+class Cumulative:
+    """Running sums of exposure and losses over ranked rows"""
+
+    def __init__(self, exposure, losses):
+        self.exposure = exposure
+        self.losses = losses            # name -> loss of every ranked row
+        self.running = {name: _running(values) for name, values in [('exposure', exposure), *losses.items()]}
+
+    def __len__(self):
+        return len(self.exposure)
+
+    def total(self, name):
+        return self.running[name][-1]
+
+    def bounds(self, n_bins=N_BINS):
+        """First ranked row of each exposure decile (and the row count), by the midpoint of each row's exposure"""
+        total = self.total('exposure')
+        if len(self) == 0 or total <= 0:
+            return np.array([0] * n_bins + [len(self)])
+        midpoints = self.running['exposure'][1:] - self.exposure / 2
+        bounds = np.searchsorted(midpoints, total * np.arange(n_bins + 1) / n_bins)
+        bounds[-1] = len(self)
+        return bounds
+
+    def bin_sums(self, name, bounds):
+        return np.diff(self.running[name][bounds])
+
+    def gini(self, name):
+        """1 - 2 x area under the Lorenz curve of a loss against exposure"""
+        exposure_total, loss_total = self.total('exposure'), self.total(name)
+        if exposure_total <= 0 or loss_total <= 0:
+            return np.nan
+        loss = self.losses[name]
+        area = (self.running[name][1:] @ self.exposure - loss @ self.exposure / 2) / (exposure_total * loss_total)
+        return 1 - 2 * area
+
+    def lorenz(self, name, shares):
+        """Cumulative share of a loss at the given cumulative shares of exposure"""
+        exposure_total, loss_total = self.total('exposure'), self.total(name)
+        if exposure_total <= 0 or loss_total <= 0:
+            return np.full(len(shares), np.nan)
+        return np.interp(shares, self.running['exposure'] / exposure_total, self.running[name] / loss_total)
+
+    def lift_table(self, n_bins=N_BINS):
+        """Policies, exposure, predicted and actual loss per exposure decile"""
+        bounds = self.bounds(n_bins)
+        table = pd.DataFrame({
+            'Decile': np.arange(1, n_bins + 1),
+            'Policies': np.diff(bounds),
+            'Exposure': self.bin_sums('exposure', bounds),
+            'Predicted': self.bin_sums('predicted', bounds),
+            'Actual': self.bin_sums('actual', bounds),
+        })
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['Predicted Rate'] = table['Predicted'] / table['Exposure']
+            table['Actual Rate'] = table['Actual'] / table['Exposure']
+            table['A/E'] = table['Actual'] / table['Predicted']
+        return table[table['Policies'] > 0].reset_index(drop=True)
+
+
+class _RankedRows:
+    """Exposure and losses of some rows in ascending order of the prediction"""
+
+    def __init__(self, order, exposure, predicted, actual):
+        self.order = order
+        self.exposure = exposure[order]
+        self.losses = {'predicted': predicted[order], 'actual': actual[order]}
+        self._all = None
+
+    @property
+    def nbytes(self):
+        arrays = [self.order, self.exposure, *self.losses.values()]
+        if self._all is not None:
+            arrays += list(self._all.running.values())
+        return sum(values.nbytes for values in arrays)
+
+    def cumulative(self, mask=None):
+        """Cumulative sums over the rows selected by a boolean mask over all rows"""
+        if mask is None:
+            # Every row: the running sums are kept for the unfiltered book
+            if self._all is None:
+                self._all = Cumulative(self.exposure, self.losses)
+            return self._all
+        keep = mask[self.order]
+        return Cumulative(self.exposure[keep], {name: values[keep] for name, values in self.losses.items()})
+
+
+class ValidationBook:
+    """Policies ranked by their prediction, overall and within each split
+
+    prediction and challenger scores are premium rates (per unit of
+    exposure); predicted losses are rate x exposure.
+    """
+
+    def __init__(self, prediction, exposure, actual_loss, splits):
+        self.prediction = np.asarray(prediction, dtype=np.float64)
+        self.exposure = np.asarray(exposure, dtype=np.float64)
+        self.actual_loss = np.asarray(actual_loss, dtype=np.float64)
+        predicted_loss = self.prediction * self.exposure
+        ranking = Ranking(self.prediction)
+        self.overall = _RankedRows(ranking.order, self.exposure, predicted_loss, self.actual_loss)
+        # The stable split of the overall order keeps each split ranked by the prediction
+        split_codes = np.asarray(splits.codes)[ranking.order]
+        self.splits = {
+            split: _RankedRows(ranking.order[split_codes == code], self.exposure, predicted_loss, self.actual_loss)
+            for code, split in enumerate(splits.categories)
+        }
+
+    @property
+    def nbytes(self):
+        rows = self.overall.nbytes + sum(split.nbytes for split in self.splits.values())
+        return rows + self.prediction.nbytes + self.exposure.nbytes + self.actual_loss.nbytes
+
+    def report(self, mask=None, n_bins=N_BINS, points=LORENZ_POINTS):
+        """Lift table, Lorenz curves with Gini indexes, and calibration per split of the selected rows"""
+        overall = self.overall.cumulative(mask)
+        shares = np.linspace(0, 1, points)
+        totals, deciles = [], []
+        for split, rows in self.splits.items():
+            cumulative = rows.cumulative(mask)
+            if len(cumulative) == 0:
+                continue
+            predicted, actual = cumulative.total('predicted'), cumulative.total('actual')
+            totals.append({'Split': split, 'Policies': len(cumulative), 'Exposure': cumulative.total('exposure'),
+                           'Predicted': predicted, 'Actual': actual,
+                           'A/E': actual / predicted if predicted > 0 else np.nan,
+                           'Gini': cumulative.gini('actual')})
+            deciles.append(cumulative.lift_table(n_bins).assign(Split=split))
+        return {
+            'lift': overall.lift_table(n_bins),
+            'lorenz': pd.DataFrame({'Exposure Share': shares, 'Actual': overall.lorenz('actual', shares),
+                                    'Predicted': overall.lorenz('predicted', shares)}),
+            'gini': overall.gini('actual'),
+            'predicted_gini': overall.gini('predicted'),
+            'calibration': pd.DataFrame(totals, columns=['Split', 'Policies', 'Exposure', 'Predicted',
+                                                         'Actual', 'A/E', 'Gini']),
+            'calibration_deciles': pd.concat(deciles, ignore_index=True) if deciles else pd.DataFrame(),
+        }
+
+    def challenger_ranking(self, challenger):
+        """Ranking of the rows by challenger / prediction, the sort order of a double lift"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return Ranking(np.asarray(challenger, dtype=np.float64) / self.prediction)
+
+    def double_lift(self, challenger, ranking, mask=None, n_bins=N_BINS):
+        """Actual, base and challenger loss per exposure decile of challenger / prediction
+
+        Each is a rate relative to its own average over the selection, so the
+        better model is the one whose line follows the actual one.
+        """
+        rows = ranking.rows(mask)
+        exposure = self.exposure[rows]
+        losses = {
+            'Actual': self.actual_loss[rows],
+            'Base': self.prediction[rows] * exposure,
+            'Challenger': np.asarray(challenger, dtype=np.float64)[rows] * exposure,
+        }
+        cumulative = Cumulative(exposure, losses)
+        bounds = cumulative.bounds(n_bins)
+        bin_exposure = cumulative.bin_sums('exposure', bounds)
+        table = pd.DataFrame({'Decile': np.arange(1, n_bins + 1), 'Policies': np.diff(bounds),
+                              'Exposure': bin_exposure})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average_exposure = cumulative.total('exposure')
+            for name in losses:
+                table[name] = (cumulative.bin_sums(name, bounds) / bin_exposure
+                               / (cumulative.total(name) / average_exposure))
+        return table[table['Policies'] > 0].reset_index(drop=True)